@@ -0,0 +1,103 @@
+"""
+External clients, constructed on first use.
+
+Importing the app (a unit test, a script, a cold-starting worker) doesn't import
+or build the Supabase and google-genai SDKs until something actually calls them.
+Tests and tools can inject their own client with the set_* functions.
+"""
+from app.config import (
+    SUPABASE_URL, SUPABASE_KEY, GEMINI_API_KEY, SUPABASE_HTTP2, SUPABASE_MAX_CONNECTIONS, SUPABASE_MAX_KEEPALIVE,
+    SUPABASE_KEEPALIVE_EXPIRY, SUPABASE_MAX_CONCURRENCY, SUPABASE_POOL_TIMEOUT_SECONDS,
+    SUPABASE_CONNECT_TIMEOUT_SECONDS, SUPABASE_TIMEOUT_SECONDS, SUPABASE_RPC_TIMEOUT_SECONDS,
+)
+
+_supabase = None
+_supabase_http = None
+_sync_supabase = None
+_genai = None
+
+
+def _require(name: str, value: str | None) -> str:
+    if not value:
+        raise ValueError(f"{name} is not set")
+    return value
+
+
+def get_supabase():
+    """
+    The async Supabase client for request handlers, so queries don't block the event loop.
+    All its PostgREST calls share one pooled HTTP/2 client (see app/services/http_pool.py).
+    """
+    global _supabase, _supabase_http
+    if _supabase is None:
+        from supabase import AsyncClient, AsyncClientOptions
+        from app.services.http_pool import build_http_client
+
+        url, key = _require("SUPABASE_URL", SUPABASE_URL), _require("SUPABASE_KEY", SUPABASE_KEY)
+        _supabase_http = build_http_client(
+            "supabase",
+            http2=SUPABASE_HTTP2,
+            max_connections=SUPABASE_MAX_CONNECTIONS,
+            max_keepalive=SUPABASE_MAX_KEEPALIVE,
+            keepalive_expiry=SUPABASE_KEEPALIVE_EXPIRY,
+            max_concurrency=SUPABASE_MAX_CONCURRENCY,
+            connect_timeout=SUPABASE_CONNECT_TIMEOUT_SECONDS,
+            timeout=SUPABASE_TIMEOUT_SECONDS,
+            wait_timeout=SUPABASE_POOL_TIMEOUT_SECONDS,
+            route_timeouts={"/rest/v1/rpc/": SUPABASE_RPC_TIMEOUT_SECONDS},
+        )
+        _supabase = AsyncClient(url, key, options=AsyncClientOptions(httpx_client=_supabase_http))
+    return _supabase
+
+
+def get_sync_supabase():
+    """
+    The synchronous Supabase client, for scripts.
+    """
+    global _sync_supabase
+    if _sync_supabase is None:
+        from supabase import create_client
+
+        _sync_supabase = create_client(_require("SUPABASE_URL", SUPABASE_URL), _require("SUPABASE_KEY", SUPABASE_KEY))
+    return _sync_supabase
+
+
+def get_genai_client():
+    """
+    The single genai Client shared by all services (use .aio inside async handlers).
+    """
+    global _genai
+    if _genai is None:
+        from google import genai
+
+        _genai = genai.Client(api_key=_require("GEMINI_API_KEY", GEMINI_API_KEY))
+    return _genai
+
+
+def set_supabase_client(client):
+    global _supabase
+    _supabase = client
+
+
+def set_genai_client(client):
+    global _genai
+    _genai = client
+
+
+def http_pool_stats() -> dict:
+    """
+    Slot and connection counts of the pooled HTTP clients built so far.
+    """
+    if _supabase_http is None:
+        return {}
+    return {"supabase": _supabase_http._transport.stats()}
+
+
+async def close_clients():
+    """
+    Closes the pooled connections (on shutdown).
+    """
+    global _supabase, _supabase_http
+    if _supabase_http is not None:
+        await _supabase_http.aclose()
+        _supabase = _supabase_http = None
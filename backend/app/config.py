@@ -1,22 +1,120 @@
+import json
 import os
+from pathlib import Path
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from google import genai
 
 load_dotenv()
 
+# Required, but only checked when a client is first built (app/clients.py),
+# so tests and scripts that never call Supabase or Gemini don't need them
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-if not SUPABASE_URL:
-    raise ValueError("SUPABASE_URL is not set")
-if not SUPABASE_KEY:
-    raise ValueError("SUPABASE_KEY is not set")
-if not GEMINI_API_KEY:
-    raise ValueError("GEMINI_API_KEY is not set")
+# Supabase HTTP pool: kept-alive HTTP/2 connections shared by every PostgREST call.
+# At most SUPABASE_MAX_CONCURRENCY requests are in flight; others wait up to SUPABASE_POOL_TIMEOUT_SECONDS
+SUPABASE_HTTP2 = os.getenv("SUPABASE_HTTP2", "true").lower() == "true"
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "20"))
+SUPABASE_MAX_KEEPALIVE = int(os.getenv("SUPABASE_MAX_KEEPALIVE", "10"))
+SUPABASE_KEEPALIVE_EXPIRY = float(os.getenv("SUPABASE_KEEPALIVE_EXPIRY", "60"))
+SUPABASE_MAX_CONCURRENCY = int(os.getenv("SUPABASE_MAX_CONCURRENCY", "32"))
+SUPABASE_POOL_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_POOL_TIMEOUT_SECONDS", "2"))
+SUPABASE_CONNECT_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_CONNECT_TIMEOUT_SECONDS", "3"))
+SUPABASE_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_TIMEOUT_SECONDS", "10"))
+# Retrieval RPCs are on the request path, so they get a shorter read timeout than table loads
+SUPABASE_RPC_TIMEOUT_SECONDS = float(os.getenv("SUPABASE_RPC_TIMEOUT_SECONDS", "3"))
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Gemini quotas per model (requests and tokens per minute), enforced by app/services/gemini.py
+GEMINI_RATE_LIMITS = json.loads(os.getenv("GEMINI_RATE_LIMITS", json.dumps({
+    "gemini-2.0-flash": {"rpm": 2000, "tpm": 4000000},
+    "gemini-embedding-001": {"rpm": 100, "tpm": 30000},
+})))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "3"))
+GEMINI_RETRY_BACKOFF = float(os.getenv("GEMINI_RETRY_BACKOFF", "0.5"))
+# Requests that would wait longer than this for quota fail fast instead
+GEMINI_MAX_QUEUE_WAIT = float(os.getenv("GEMINI_MAX_QUEUE_WAIT", "5"))
+GEMINI_BREAKER_THRESHOLD = int(os.getenv("GEMINI_BREAKER_THRESHOLD", "5"))
+GEMINI_BREAKER_RESET_SECONDS = float(os.getenv("GEMINI_BREAKER_RESET_SECONDS", "30"))
 
-# Create a single genai Client for use across all services
-genai_client = genai.Client(api_key=GEMINI_API_KEY)
+# Technique retrieval backend: "local" (in-process NumPy index) or "rpc" (Supabase match_techniques)
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "local")
+TECHNIQUE_INDEX_REFRESH_SECONDS = float(os.getenv("TECHNIQUE_INDEX_REFRESH_SECONDS", "300"))
+# Optional memory-mapped snapshot (scripts/build_technique_snapshot.py), shared by every worker on the host
+TECHNIQUE_SNAPSHOT_DIR = os.getenv("TECHNIQUE_SNAPSHOT_DIR")
+TECHNIQUE_SNAPSHOT_CHECK_SECONDS = float(os.getenv("TECHNIQUE_SNAPSHOT_CHECK_SECONDS", "5"))
+
+# Embedding cache: in-memory LRU byte budget, plus an optional sqlite file shared across workers
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH")
+
+# Crisis resources are cached in memory; the bundled snapshot is served if Supabase is unreachable
+RESOURCE_CACHE_TTL_SECONDS = float(os.getenv("RESOURCE_CACHE_TTL_SECONDS", "600"))
+RESOURCE_SNAPSHOT_PATH = os.getenv("RESOURCE_SNAPSHOT_PATH", str(Path(__file__).resolve().parent.parent / "resources_dump.json"))
+
+# Password hashing: bcrypt work factor, worker threads (0 = min(4, CPU count)) and queue limit
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "0"))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "32"))
+
+# Write-behind chat persistence: flush when this many messages are queued or after this many seconds
+CHAT_WRITE_BATCH_SIZE = int(os.getenv("CHAT_WRITE_BATCH_SIZE", "100"))
+CHAT_WRITE_FLUSH_INTERVAL = float(os.getenv("CHAT_WRITE_FLUSH_INTERVAL", "0.25"))
+CHAT_WRITE_MAX_QUEUE = int(os.getenv("CHAT_WRITE_MAX_QUEUE", "10000"))
+
+# Local severity fast path: settle CRISIS/LOW without Gemini when the lexicons are unambiguous
+SEVERITY_FAST_PATH = os.getenv("SEVERITY_FAST_PATH", "true").lower() == "true"
+SEVERITY_LOW_CONFIDENCE = float(os.getenv("SEVERITY_LOW_CONFIDENCE", "0.85"))
+
+# Semantic retrieval cache: reuse the techniques found for near-duplicate messages (cosine >= threshold)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+
+# Chat LLM mode: "two_call" classifies severity and then generates the response;
+# "single_call" asks Gemini for severity, text and quotes in one structured-output call
+CHAT_LLM_MODE = os.getenv("CHAT_LLM_MODE", "two_call")
+
+# Technique context: each retrieved technique goes into the prompt as a pre-rendered snippet of
+# at most TECHNIQUE_SNIPPET_MAX_TOKENS; snippets are added, most similar first, within the budget
+TECHNIQUE_CONTEXT_TOKEN_BUDGET = int(os.getenv("TECHNIQUE_CONTEXT_TOKEN_BUDGET", "400"))
+TECHNIQUE_SNIPPET_MAX_TOKENS = int(os.getenv("TECHNIQUE_SNIPPET_MAX_TOKENS", "90"))
+
+# Conversation memory: the prompt carries a rolling summary of each session plus its last
+# MEMORY_RECENT_TURNS turns, within MEMORY_TOKEN_BUDGET (estimated) tokens. Turns that fall out
+# of the window are folded into the summary in the background, at least MEMORY_SUMMARIZE_AFTER_TURNS at a time
+MEMORY_ENABLED = os.getenv("MEMORY_ENABLED", "true").lower() == "true"
+MEMORY_RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", "4"))
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "1000"))
+MEMORY_SUMMARY_MAX_TOKENS = int(os.getenv("MEMORY_SUMMARY_MAX_TOKENS", "300"))
+MEMORY_SUMMARIZE_AFTER_TURNS = int(os.getenv("MEMORY_SUMMARIZE_AFTER_TURNS", "2"))
+
+# Logging: JSON lines written by a background thread. LOG_LEVELS overrides single loggers,
+# e.g. "app.services.embeddings=DEBUG,app.services.gemini=WARNING"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Identical DEBUG/INFO messages (same logger and template) beyond this many per second are dropped and counted;
+# warnings and errors are never dropped. 0 = no limit
+LOG_RATE_LIMIT_PER_SECOND = float(os.getenv("LOG_RATE_LIMIT_PER_SECOND", "10"))
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01"))
+# User content (messages, prompts, emails) in log fields is replaced by its length unless this is false
+LOG_REDACT_CONTENT = os.getenv("LOG_REDACT_CONTENT", "true").lower() == "true"
+
+# Access tokens: /auth/login issues HS256-signed JWTs that routes verify in memory.
+# AUTH_SECRET is required and must be the same on every worker. For local development only,
+# AUTH_DEV_EPHEMERAL_SECRET=true lets a worker start without it and sign with a random per-process key
+AUTH_SECRET = os.getenv("AUTH_SECRET")
+AUTH_DEV_EPHEMERAL_SECRET = os.getenv("AUTH_DEV_EPHEMERAL_SECRET", "false").lower() == "true"
+ACCESS_TOKEN_TTL_SECONDS = int(os.getenv("ACCESS_TOKEN_TTL_SECONDS", str(7 * 24 * 3600)))
+# Rollout only: also accept the old, unsigned "Bearer <user_id>" tokens while clients update
+AUTH_ACCEPT_USER_ID_TOKENS = os.getenv("AUTH_ACCEPT_USER_ID_TOKENS", "false").lower() == "true"
+# User records for routes that need one, cached per worker
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+
+# Readiness: /readyz reports ready once every warmup step (MongoDB, clients, technique index,
+# crisis resources) has succeeded; failed steps are retried this often
+READINESS_RETRY_SECONDS = float(os.getenv("READINESS_RETRY_SECONDS", "5"))
+READINESS_STEP_TIMEOUT_SECONDS = float(os.getenv("READINESS_STEP_TIMEOUT_SECONDS", "30"))
@@ -1,51 +1,115 @@
-from mongoengine import connect, Document, StringField, DateTimeField, BooleanField, ReferenceField
-from datetime import datetime, timezone
+from pymongo import AsyncMongoClient, ASCENDING, DESCENDING
+import logging
 import os
 from dotenv import load_dotenv
+from app.services.logging_setup import error_fields
 
 load_dotenv()
 
-# MongoDB connection from environment variable (REQUIRED)
+logger = logging.getLogger(__name__)
+
+# MongoDB connection from environment variable (REQUIRED, checked when the client is first built)
 MONGO_URI = os.getenv("MONGO_URI")
-if not MONGO_URI:
-    raise ValueError("MONGO_URI environment variable is required")
-
-def connect_db():
-    print("Connecting to MongoDB...")
-    try:
-        connect(host=MONGO_URI)
-        print("MongoDB Connected Successfully")
-    except Exception as e:
-        print(f"MongoDB Connection Failed: {e}")
-
-# Define the User schema
-class User(Document):
-    username = StringField(required=True) # Used as Name
-    email = StringField(required=True, unique=True)
-    password = StringField(required=True)  # Storing plain for now as per original code, can upgrade to hash
-    created_at = DateTimeField(default=datetime.now(timezone.utc))
-    
-    # Security Questions for Forgot Password
-    security_question_1 = StringField(required=True)
-    security_answer_1 = StringField(required=True)
-    security_question_2 = StringField(required=True)
-    security_answer_2 = StringField(required=True)
-
-    meta = {'collection': 'users'}
-
-# Define the Chat schema
-class Chat(Document):
-    user = ReferenceField(User, required=True)
-    session_id = StringField(default="default") # For grouping chats
-    role = StringField(required=True, choices=["user", "model"]) # Explicit role
-    message = StringField(required=True) 
-    timestamp = DateTimeField(default=datetime.now(timezone.utc))
-    
-    # Extra fields for bot responses which might have metadata
-    techniques = StringField() 
-    crisis_resources = StringField()
-
-    meta = {
-        'collection': 'chats',
-        'ordering': ['timestamp']
-    }
+
+# Connection pool and timeout settings
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "10000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000"))
+MONGO_READ_PREFERENCE = os.getenv("MONGO_READ_PREFERENCE", "primary")
+
+# Same database mongoengine used when the URI names none
+DEFAULT_DB_NAME = "test"
+
+# Collection schemas (kept as documentation of the stored fields):
+# users: username (used as name), email (unique), password (bcrypt hash), created_at,
+#        security_question_1/2, security_answer_1/2 (bcrypt hashes of the normalized answers)
+# chats: user (ObjectId of the user), session_id, role ("user" | "model"), message, timestamp,
+#        techniques, crisis_resources (bot responses only)
+# conversation_summaries: _id ("<user>:<session_id>"), user, session_id, summary, turns_summarized,
+#        until_timestamp / until_id (the last chat folded into the summary), updated_at
+INDEXES = {
+    "users": [
+        {"keys": [("email", ASCENDING)], "name": "email_1", "unique": True},
+    ],
+    "chats": [
+        # Keyset pagination walks (timestamp, _id) newest-first, per session or across all sessions
+        {"keys": [("user", ASCENDING), ("session_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], "name": "user_session_timestamp"},
+        {"keys": [("user", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)], "name": "user_timestamp"},
+    ],
+    "conversation_summaries": [
+        # Summaries are read by _id; this one serves deleting a user's data
+        {"keys": [("user", ASCENDING)], "name": "user_1"},
+    ],
+}
+
+_client = None
+
+
+def get_client() -> AsyncMongoClient:
+    """
+    Returns the shared async client. Connections are opened lazily by the driver's pool.
+    """
+    global _client
+    if _client is None:
+        if not MONGO_URI:
+            raise ValueError("MONGO_URI environment variable is required")
+        _client = AsyncMongoClient(
+            MONGO_URI,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+            waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            readPreference=MONGO_READ_PREFERENCE,
+            retryWrites=True,
+        )
+    return _client
+
+
+def get_db():
+    return get_client().get_default_database(DEFAULT_DB_NAME)
+
+
+def users_collection():
+    return get_db()["users"]
+
+
+def chats_collection():
+    return get_db()["chats"]
+
+
+def summaries_collection():
+    return get_db()["conversation_summaries"]
+
+
+async def ensure_indexes():
+    for collection_name, indexes in INDEXES.items():
+        collection = get_db()[collection_name]
+        for index in indexes:
+            options = {k: v for k, v in index.items() if k != "keys"}
+            try:
+                await collection.create_index(index["keys"], **options)
+            except Exception as e:
+                logger.error("Failed to create index %s on %s", index["name"], collection_name, extra=error_fields(e))
+
+
+async def connect_db():
+    """
+    Opens the connection pool and ensures indexes. Raises if MongoDB is unreachable;
+    the readiness warmup retries it.
+    """
+    logger.info("Connecting to MongoDB")
+    await get_client().admin.command("ping")
+    await ensure_indexes()
+    logger.info("MongoDB connected")
+
+
+async def close_db():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
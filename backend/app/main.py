@@ -1,7 +1,34 @@
-from fastapi import FastAPI
+import time
+
+_import_started = time.perf_counter()
+
+import asyncio
+import logging
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.routers import chat, auth, resources
-from app.database import connect_db
+from app.database import connect_db, close_db
+from app.config import RETRIEVAL_BACKEND, READINESS_RETRY_SECONDS, READINESS_STEP_TIMEOUT_SECONDS
+from app.clients import get_supabase, http_pool_stats, close_clients
+from app.services import llm
+from app.services.technique_index import technique_index
+from app.services.embeddings import embedding_cache
+from app.services.resource_cache import resource_cache
+from app.services.passwords import password_hasher, PasswordHasherBusy
+from app.services.chat_writer import chat_writer
+from app.services.gemini import gemini
+from app.services.semantic_cache import semantic_cache
+from app.services.memory import conversation_memory
+from app.services.technique_context import technique_context
+from app.services.user_cache import user_cache
+from app.services.metrics import MetricsMiddleware, render_metrics
+from app.services.logging_setup import setup_logging, stop_logging, RequestContextMiddleware
+from app.services.readiness import Readiness
+from app.services.access_tokens import signing_key
+
+setup_logging()
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Mind-Nest Backend")
 
@@ -12,12 +39,55 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Before-Cursor", "X-After-Cursor", "Server-Timing", "X-Request-ID"],
 )
+# Outermost, so the recorded latency includes CORS handling
+app.add_middleware(MetricsMiddleware)
+# Outermost of all, so every log line of a request carries its request id
+app.add_middleware(RequestContextMiddleware)
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    # Shed load instead of queueing more bcrypt work than the pool can absorb
+    return JSONResponse(status_code=503, content={"detail": "Server is busy, please try again"}, headers={"Retry-After": "1"})
+
+async def _build_supabase():
+    await asyncio.to_thread(get_supabase)
+
+async def _build_gemini():
+    # Imports google-genai and builds the client and response schemas off the event loop
+    def build():
+        gemini.client
+        llm.response_schema()
+        llm.turn_schema()
+    await asyncio.to_thread(build)
+
+readiness = Readiness(retry_interval=READINESS_RETRY_SECONDS, step_timeout=READINESS_STEP_TIMEOUT_SECONDS)
+readiness.add("mongo", connect_db)
+readiness.add("supabase", _build_supabase)
+readiness.add("gemini", _build_gemini)
+if RETRIEVAL_BACKEND == "local":
+    readiness.add("technique_index", technique_index.ensure_fresh, after=("supabase",))
+readiness.add("crisis_resources", resource_cache.ensure_fresh, after=("supabase",))
 
-# Connect to MongoDB on startup
+# Warm up in the background: /healthz answers immediately, /readyz once warmup is done
 @app.on_event("startup")
 async def startup_event():
-    connect_db()
+    setup_logging()
+    # Fails the worker's startup when AUTH_SECRET is missing, before it takes traffic
+    signing_key()
+    chat_writer.start()
+    readiness.start()
+
+# Flush queued chat messages before the worker exits
+@app.on_event("shutdown")
+async def shutdown_event():
+    await readiness.stop()
+    await conversation_memory.stop()
+    await chat_writer.stop()
+    await close_db()
+    await close_clients()
+    stop_logging()
 
 app.include_router(auth.router)
 app.include_router(resources.router)
@@ -26,3 +96,49 @@ app.include_router(chat.router)
 @app.get("/")
 async def root():
     return {"message": "Mind-Nest Backend is running"}
+
+@app.get("/healthz")
+async def healthz():
+    """
+    Liveness: the worker is up and serving.
+    """
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """
+    Readiness: 200 once the warmup has finished, 503 with the state of each step before that.
+    """
+    status = readiness.stats()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/stats")
+async def stats():
+    """
+    Cache counters for monitoring.
+    """
+    return {
+        "embedding_cache": embedding_cache.stats(),
+        "resource_cache": resource_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "user_cache": user_cache.stats(),
+        "chat_writer": chat_writer.stats(),
+        "gemini": gemini.stats(),
+        "technique_index": technique_index.stats(),
+        "technique_context": technique_context.stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "conversation_memory": conversation_memory.stats(),
+        "startup": readiness.stats(),
+        "http_pools": http_pool_stats(),
+    }
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus scrape endpoint: request, stage and outbound-call latency histograms,
+    plus fallback and error counters.
+    """
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
+readiness.app_import_ms = round((time.perf_counter() - _import_started) * 1000, 1)
@@ -0,0 +1,71 @@
+from datetime import datetime
+from bson import ObjectId
+from app.database import chats_collection
+
+CHAT_ROLES = ("user", "model")
+HISTORY_PROJECTION = {"message": 1, "role": 1, "timestamp": 1}
+
+
+def new_chat(user_id: ObjectId, role: str, message: str, timestamp: datetime,
+             session_id: str = "default", techniques: str = None, crisis_resources: str = None) -> dict:
+    """
+    Builds a chat document. Bot responses may also carry techniques and crisis_resources.
+    """
+    if role not in CHAT_ROLES:
+        raise ValueError(f"Invalid chat role: {role}")
+    if message is None:
+        raise ValueError("Chat message is required")
+
+    doc = {
+        "user": user_id,
+        "session_id": session_id,
+        "role": role,
+        "message": message,
+        "timestamp": timestamp,
+    }
+    if techniques is not None:
+        doc["techniques"] = techniques
+    if crisis_resources is not None:
+        doc["crisis_resources"] = crisis_resources
+    return doc
+
+
+async def insert_chats(docs: list[dict]):
+    await chats_collection().insert_many(docs, ordered=True)
+
+
+async def find_history_page(user_id: ObjectId, session_id: str = None, before: tuple = None,
+                            after: tuple = None, limit: int = 50) -> list[dict]:
+    """
+    Reads one page of a user's chats, oldest first. `before`/`after` are (timestamp, _id)
+    keyset positions; without either this is the most recent page.
+    """
+    query = {"user": user_id}
+    if session_id:
+        query["session_id"] = session_id
+
+    # Walk backwards from `before` (or from now), or forwards from `after`
+    direction = 1 if after else -1
+    position = after or before
+    if position:
+        timestamp, chat_id = position
+        op = "$gt" if after else "$lt"
+        query["$or"] = [
+            {"timestamp": {op: timestamp}},
+            {"timestamp": timestamp, "_id": {op: chat_id}},
+        ]
+
+    docs = await (
+        chats_collection()
+        .find(query, HISTORY_PROJECTION)
+        .sort([("timestamp", direction), ("_id", direction)])
+        .limit(limit)
+        .to_list()
+    )
+    if direction == -1:
+        docs.reverse()
+    return docs
+
+
+async def delete_user_chats(user_id: ObjectId):
+    await chats_collection().delete_many({"user": user_id})
@@ -0,0 +1,45 @@
+from datetime import datetime, timezone
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from app.database import summaries_collection
+
+
+def summary_key(user_id: ObjectId, session_id: str) -> str:
+    return f"{user_id}:{session_id}"
+
+
+async def find_summary(user_id: ObjectId, session_id: str) -> dict | None:
+    return await summaries_collection().find_one({"_id": summary_key(user_id, session_id)})
+
+
+async def save_summary(user_id: ObjectId, session_id: str, summary: str, until: tuple,
+                       turns_summarized: int, expected_until_id: ObjectId = None) -> bool:
+    """
+    Stores a session summary covering chats up to `until` ((timestamp, _id)).
+    The write only applies if the stored summary still ends at `expected_until_id`,
+    so two workers summarizing the same session can't overwrite each other's newer
+    summary. Returns False when that check fails.
+    """
+    until_timestamp, until_id = until
+    try:
+        await summaries_collection().update_one(
+            {"_id": summary_key(user_id, session_id), "until_id": expected_until_id},
+            {"$set": {
+                "user": user_id,
+                "session_id": session_id,
+                "summary": summary,
+                "turns_summarized": turns_summarized,
+                "until_timestamp": until_timestamp,
+                "until_id": until_id,
+                "updated_at": datetime.now(timezone.utc),
+            }},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # The summary exists but has moved on: the upsert tried to insert a second one
+        return False
+    return True
+
+
+async def delete_user_summaries(user_id: ObjectId):
+    await summaries_collection().delete_many({"user": user_id})
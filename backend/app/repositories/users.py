@@ -0,0 +1,56 @@
+from datetime import datetime, timezone
+from bson import ObjectId
+from app.database import users_collection
+
+
+def to_object_id(user_id) -> ObjectId | None:
+    if isinstance(user_id, ObjectId):
+        return user_id
+    if not user_id or not ObjectId.is_valid(user_id):
+        return None
+    return ObjectId(user_id)
+
+
+async def find_user_by_email(email: str, projection: dict = None) -> dict | None:
+    return await users_collection().find_one({"email": email}, projection)
+
+
+async def find_user_by_id(user_id, projection: dict = None) -> dict | None:
+    oid = to_object_id(user_id)
+    if oid is None:
+        return None
+    return await users_collection().find_one({"_id": oid}, projection)
+
+
+async def create_user(username: str, email: str, password: str,
+                      security_question_1: str, security_answer_1: str,
+                      security_question_2: str, security_answer_2: str) -> ObjectId:
+    """
+    Inserts a user; password and answers must already be hashed. Returns the new user's id.
+    """
+    result = await users_collection().insert_one({
+        "username": username,
+        "email": email,
+        "password": password,
+        "created_at": datetime.now(timezone.utc),
+        "security_question_1": security_question_1,
+        "security_answer_1": security_answer_1,
+        "security_question_2": security_question_2,
+        "security_answer_2": security_answer_2,
+    })
+    return result.inserted_id
+
+
+async def update_user_password(user_id, hashed_password: str, revoke_tokens: bool = True):
+    """
+    Stores a new password hash. Unless `revoke_tokens` is off (a rehash of the same
+    password), the token version goes up, which revokes the user's access tokens.
+    """
+    update = {"$set": {"password": hashed_password}}
+    if revoke_tokens:
+        update["$inc"] = {"token_version": 1}
+    await users_collection().update_one({"_id": to_object_id(user_id)}, update)
+
+
+async def delete_user(user_id):
+    await users_collection().delete_one({"_id": to_object_id(user_id)})
@@ -1,18 +1,22 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from app.database import User
-import bcrypt
+from app.repositories import users, chats, summaries
+from app.services.passwords import password_hasher, PasswordHasherBusy
+from app.services.access_tokens import issue_access_token, get_verified_user_id
+from app.services.user_cache import user_cache
+from app.services.logging_setup import error_fields
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-def verify_password(plain_password, hashed_password):
-    # hashed_password from DB is string, needs to be bytes
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+async def verify_password(plain_password, hashed_password):
+    return await password_hasher.verify(plain_password, hashed_password)
 
-def get_password_hash(password):
-    # Returns bytes, need to decode to utf-8 string for storage
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
 
 class LoginRequest(BaseModel):
     email: str
@@ -42,16 +46,19 @@ class ResetPasswordRequest(BaseModel):
 @router.post("/register")
 async def register(request: SignupRequest):
     # Check if user exists
-    existing_user = User.objects(email=request.email).first()
+    existing_user = await users.find_user_by_email(request.email, {"_id": 1})
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     try:
-        hashed_pw = get_password_hash(request.password)
-        hashed_ans_1 = get_password_hash(request.security_answer_1.lower().strip()) # Hash answers for security
-        hashed_ans_2 = get_password_hash(request.security_answer_2.lower().strip())
+        # Hash answers for security; the three hashes run in parallel on the hashing pool
+        hashed_pw, hashed_ans_1, hashed_ans_2 = await asyncio.gather(
+            get_password_hash(request.password),
+            get_password_hash(request.security_answer_1.lower().strip()),
+            get_password_hash(request.security_answer_2.lower().strip()),
+        )
 
-        user = User(
+        user_id = await users.create_user(
             username=request.name,
             email=request.email,
             password=hashed_pw,
@@ -60,63 +67,78 @@ async def register(request: SignupRequest):
             security_question_2=request.security_question_2,
             security_answer_2=hashed_ans_2
         )
-        user.save()
-        return {"message": "User registered successfully", "user_id": str(user.id)}
+        return {"message": "User registered successfully", "user_id": str(user_id)}
+    except PasswordHasherBusy:
+        raise
     except Exception as e:
-        print(f"Register Error: {e}")
+        logger.error("Register error", extra=error_fields(e))
         raise HTTPException(status_code=500, detail=f"Registration failed: {str(e)}")
 
 @router.post("/login")
 async def login(request: LoginRequest):
-    user = User.objects(email=request.email).first()
+    user = await users.find_user_by_email(request.email)
     if not user:
         raise HTTPException(status_code=400, detail="Invalid email or password")
     
-    if not verify_password(request.password, user.password):
+    if not await verify_password(request.password, user["password"]):
         raise HTTPException(status_code=400, detail="Invalid email or password")
+
+    # Transparently upgrade hashes made with an older work factor
+    try:
+        new_hash = await password_hasher.rehash_if_needed(request.password, user["password"])
+        if new_hash:
+            await users.update_user_password(user["_id"], new_hash, revoke_tokens=False)
+    except Exception as e:
+        logger.warning("Password rehash failed", extra=error_fields(e))
         
+    access_token, expires_in = issue_access_token(user["_id"], version=user.get("token_version", 0))
     return {
         "message": "Login successful",
-        "user_id": str(user.id),
-        "name": user.username,
-        "email": user.email
+        "user_id": str(user["_id"]),
+        "name": user["username"],
+        "email": user["email"],
+        # Send as "Authorization: Bearer <access_token>"
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": expires_in,
     }
 
 @router.post("/forgot-password")
 async def forgot_password(request: ForgotPasswordRequest):
     # Stub for now
-    user = User.objects(email=request.email).first()
+    user = await users.find_user_by_email(request.email, {"_id": 1})
     # Logic to send email would go here
     return {"message": "If email exists, reset link sent"}
 
 @router.post("/security-questions")
 async def get_security_questions(request: SecurityQuestionsRequest):
-    user = User.objects(email=request.email).first()
+    user = await users.find_user_by_email(request.email, {"security_question_1": 1, "security_question_2": 1})
     if not user:
         # distinct error for now to help UI, though security-wise generic is better usually
         raise HTTPException(status_code=404, detail="Email not found")
     
     return {
-        "question_1": user.security_question_1,
-        "question_2": user.security_question_2
+        "question_1": user["security_question_1"],
+        "question_2": user["security_question_2"]
     }
 
 @router.post("/reset-password")
 async def reset_password(request: ResetPasswordRequest):
-    user = User.objects(email=request.email).first()
+    user = await users.find_user_by_email(request.email, {"security_answer_1": 1, "security_answer_2": 1})
     if not user:
          raise HTTPException(status_code=404, detail="User not found")
     
     # Verify Answers
-    if not verify_password(request.security_answer_1.lower().strip(), user.security_answer_1):
+    if not await verify_password(request.security_answer_1.lower().strip(), user["security_answer_1"]):
         raise HTTPException(status_code=400, detail="Answer 1 is incorrect")
     
-    if not verify_password(request.security_answer_2.lower().strip(), user.security_answer_2):
+    if not await verify_password(request.security_answer_2.lower().strip(), user["security_answer_2"]):
         raise HTTPException(status_code=400, detail="Answer 2 is incorrect")
     
     # Update Password
-    user.password = get_password_hash(request.new_password)
-    user.save()
+    # Revokes the tokens issued so far; other workers see it within USER_CACHE_TTL_SECONDS
+    await users.update_user_password(user["_id"], await get_password_hash(request.new_password))
+    user_cache.invalidate(user["_id"])
     
     return {"message": "Password reset successfully"}
     
@@ -127,49 +149,37 @@ class ChangePasswordRequest(BaseModel):
 
 @router.post("/change-password")
 async def change_password(request: ChangePasswordRequest):
-    user = User.objects(id=request.user_id).first()
+    user = await users.find_user_by_id(request.user_id, {"password": 1})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
         
     # Verify Old Password
-    if not verify_password(request.old_password, user.password):
+    if not await verify_password(request.old_password, user["password"]):
         raise HTTPException(status_code=400, detail="Incorrect old password")
         
     # Update to New Password
-    user.password = get_password_hash(request.new_password)
-    user.save()
+    # Revokes the tokens issued so far; other workers see it within USER_CACHE_TTL_SECONDS
+    await users.update_user_password(user["_id"], await get_password_hash(request.new_password))
+    user_cache.invalidate(user["_id"])
     
     return {"message": "Password updated successfully"}
 
-def get_current_user_id(authorization: str):
-    if not authorization:
-        return None
-    try:
-        scheme, param = authorization.split()
-        if scheme.lower() != 'bearer':
-            return None
-        return param
-    except:
-        return None
-
-from fastapi import Header
-from app.database import Chat
-
 @router.delete("/me")
-async def delete_account(authorization: str = Header(None)):
-    user_id = get_current_user_id(authorization)
+async def delete_account(user_id: str = Depends(get_verified_user_id)):
     if not user_id:
         raise HTTPException(status_code=401, detail="Unauthorized")
         
-    user = User.objects(id=user_id).first()
+    user = await user_cache.get(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Delete User's Chats
-    Chat.objects(user=user).delete()
+    await chats.delete_user_chats(user["_id"])
+    await summaries.delete_user_summaries(user["_id"])
     
     # Delete User
-    user.delete()
+    await users.delete_user(user["_id"])
+    user_cache.invalidate(user_id)
     
     return {"message": "Account deleted successfully"}
 
@@ -1,15 +1,35 @@
-from fastapi import APIRouter, HTTPException, Header, Depends
-from pydantic import BaseModel
+import asyncio
+import json
+import logging
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from app.services.embeddings import generate_embedding
 from app.services.retrieval import search_techniques, get_crisis_resources
-from app.services.llm import classify_severity, generate_response
-from app.database import Chat, User
+from app.services.llm import classify_severity, generate_response, generate_response_stream, classify_and_respond
+from app.services.pipeline import Pipeline
+from app.services.metrics import track_call, format_server_timing, ERRORS, FALLBACKS, error_cause
+from app.services.chat_writer import chat_writer
+from app.services.access_tokens import get_current_user_id, get_verified_user_id
+from app.services.user_cache import user_cache
+from app.repositories import users, chats, summaries
+from app.config import CHAT_LLM_MODE, SEMANTIC_CACHE_ENABLED, MEMORY_ENABLED
+from app.services.semantic_cache import semantic_cache
+from app.services.memory import conversation_memory
+from app.services.technique_context import technique_context
+from app.services.logging_setup import error_fields, session_id_var
 from datetime import datetime, timezone
+from bson import ObjectId
+from bson.errors import InvalidId
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 class ChatRequest(BaseModel):
     message: str
+    # Turns of the same session share conversation memory
+    session_id: str = Field("default", min_length=1, max_length=64)
 
 class ChatResponse(BaseModel):
     response: str
@@ -25,134 +45,350 @@ def detect_language(text: str) -> str:
             return 'th'
     return 'en'
 
-def get_current_user_id(authorization: str = Header(None)):
-    if not authorization:
-        return None
+def encode_cursor(timestamp: datetime, chat_id: ObjectId) -> str:
+    # Mongo stores datetimes with millisecond precision, so milliseconds round-trip exactly
+    millis = int(timestamp.replace(tzinfo=timezone.utc).timestamp() * 1000)
+    return f"{millis}_{chat_id}"
+
+def decode_cursor(cursor: str) -> tuple[datetime, ObjectId]:
     try:
-        # Expected format: "Bearer <user_id>"
-        scheme, param = authorization.split()
-        if scheme.lower() != 'bearer':
-            return None
-        return param
-    except:
-        return None
+        millis, chat_id = cursor.split("_")
+        return datetime.fromtimestamp(int(millis) / 1000, tz=timezone.utc), ObjectId(chat_id)
+    except (ValueError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.get("/chat/history")
-async def get_chat_history(authorization: str = Header(None)):
-    user_id = get_current_user_id(authorization)
+async def get_chat_history(
+    response: Response,
+    current_user_id: str = Depends(get_verified_user_id),
+    session_id: str = Query(None, description="Only return messages from this session"),
+    before: str = Query(None, description="Cursor: return messages older than this one"),
+    after: str = Query(None, description="Cursor: return messages newer than this one"),
+    limit: int = Query(50, ge=1, le=200),
+):
+    """
+    Returns a page of chat history in chronological order, newest page first.
+    The X-Before-Cursor / X-After-Cursor headers point at the oldest / newest message of the page;
+    a page shorter than `limit` means there is nothing further in that direction.
+    """
+    user_id = users.to_object_id(current_user_id)
     if not user_id:
         return [] # Return empty if no auth, or raise 401
-    
-    user = User.objects(id=user_id).first()
-    if not user:
-        return []
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either 'before' or 'after', not both")
+
+    # Chats reference the user by ObjectId, so there's no need to load the user document first
+    docs = await chats.find_history_page(
+        user_id,
+        session_id=session_id,
+        before=decode_cursor(before) if before else None,
+        after=decode_cursor(after) if after else None,
+        limit=limit,
+    )
 
-    # Fetch last 50 messages
-    chats = Chat.objects(user=user).order_by('timestamp').limit(50)
-    
     history = []
-    for chat in chats:
+    for doc in docs:
+        timestamp = doc["timestamp"]
         history.append({
-            "id": str(chat.id),
-            "text": chat.message,
-            "isUser": chat.role == "user",
-            "timestamp": chat.timestamp.strftime("%I:%M %p"),
-            "timestamp_iso": chat.timestamp.isoformat(),
-            "date": chat.timestamp.date().isoformat(),
+            "id": str(doc["_id"]),
+            "text": doc["message"],
+            "isUser": doc["role"] == "user",
+            "timestamp": timestamp.strftime("%I:%M %p"),
+            "timestamp_iso": timestamp.isoformat(),
+            "date": timestamp.date().isoformat(),
             "techniques": [], # Could store these if needed
             "crisis_resources": [],
             "severity": "", 
             "quotes": []
         })
+
+    if docs:
+        response.headers["X-Before-Cursor"] = encode_cursor(docs[0]["timestamp"], docs[0]["_id"])
+        response.headers["X-After-Cursor"] = encode_cursor(docs[-1]["timestamp"], docs[-1]["_id"])
     return history
 
 @router.delete("/chat/history")
-async def delete_chat_history(authorization: str = Header(None)):
-    user_id = get_current_user_id(authorization)
+async def delete_chat_history(user_id: str = Depends(get_verified_user_id)):
     if not user_id:
         raise HTTPException(status_code=401, detail="Unauthorized")
     
-    user = User.objects(id=user_id).first()
+    user = await user_cache.get(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
         
-    Chat.objects(user=user).delete()
+    await chats.delete_user_chats(user["_id"])
+    await summaries.delete_user_summaries(user["_id"])
     return {"message": "Chat history deleted"}
 
+# --- CHAT PIPELINE ---
+# Classification starts right away, in parallel with the embedding. The embedding is
+# looked up in the semantic cache; on a hit the cached techniques are reused, otherwise
+# technique search runs. Severity is never taken from the cache.
+# Crisis resources start as soon as severity is known.
+# The session's conversation memory is read alongside and only the response waits for it.
+chat_pipeline = Pipeline("chat")
+
+@chat_pipeline.stage("user")
+async def _load_user(ctx):
+    # The token already proves who this is; the (cached) record confirms the account still exists
+    if ctx["user_id"] is None:
+        return None
+    return await user_cache.get(ctx["user_id"])
+
+@chat_pipeline.stage("memory")
+async def _load_memory(ctx):
+    # Summary + recent turns of this session; a turn without memory is still answered
+    user_id = users.to_object_id(ctx["user_id"])
+    if not MEMORY_ENABLED or user_id is None:
+        return ""
+    try:
+        with track_call("mongo", "load_memory"):
+            return await conversation_memory.context(user_id, ctx["session_id"])
+    except Exception as e:
+        logger.error("Error loading conversation memory", extra=error_fields(e))
+        FALLBACKS.labels("memory", error_cause(e)).inc()
+        return ""
+
+@chat_pipeline.stage("embedding")
+async def _embed(ctx):
+    # An empty embedding (Gemini rate-limited or down) means the turn is answered without techniques
+    return await generate_embedding(ctx["message"])
+
+@chat_pipeline.stage("semantic", after=("embedding",))
+async def _semantic_lookup(ctx):
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    return semantic_cache.lookup(ctx["embedding"], language=ctx["language"])
+
+@chat_pipeline.stage("severity")
+async def _classify(ctx):
+    return await classify_severity(ctx["message"])
+
+@chat_pipeline.stage("techniques", after=("semantic",))
+async def _search(ctx):
+    if ctx["semantic"] is not None:
+        return ctx["semantic"].techniques
+    if not ctx["embedding"]:
+        return []
+    return await search_techniques(ctx["embedding"], language=ctx["language"], match_count=5)
+
+@chat_pipeline.stage("remember", after=("semantic", "techniques"))
+async def _semantic_store(ctx):
+    if not SEMANTIC_CACHE_ENABLED or ctx["semantic"] is not None:
+        return False
+    semantic_cache.store(ctx["embedding"], ctx["techniques"], language=ctx["language"])
+    return True
+
+@chat_pipeline.stage("crisis_resources", after=("severity",))
+async def _crisis(ctx):
+    if ctx["severity"] in ["HIGH", "CRISIS"]:
+        return await get_crisis_resources(language=ctx["language"])
+    return []
+
+def format_technique_context(techniques: list) -> str:
+    # Pre-rendered snippets, deduplicated and fitted to the token budget (the cards carry the full instructions)
+    return technique_context.assemble(techniques)
+
+@chat_pipeline.stage("response", after=("memory", "severity", "techniques", "crisis_resources"))
+async def _respond(ctx):
+    context = format_technique_context(ctx["techniques"])
+    llm_output = await generate_response(ctx["message"], context, ctx["severity"], ctx["crisis_resources"], language=ctx["language"], history=ctx["memory"])
+
+    # Handle case where llm_output might be a string (fallback) or dict
+    if isinstance(llm_output, str):
+        return {"text": llm_output, "quotes": []}
+    return {"text": llm_output.get("text", ""), "quotes": llm_output.get("quotes", [])}
+
+@chat_pipeline.stage("persist", after=("user", "response"))
+async def _persist(ctx):
+    user = ctx["user"]
+    if not user:
+        return False
+
+    techniques = ctx["techniques"]
+    crisis_info = ctx["crisis_resources"]
+    try:
+        user_chat = chats.new_chat(
+            user["_id"],
+            role="user",
+            message=ctx["message"],
+            timestamp=ctx["received_at"],
+            session_id=ctx["session_id"],
+        )
+        bot_chat = chats.new_chat(
+            user["_id"],
+            role="model",
+            message=ctx["response"]["text"],
+            timestamp=datetime.now(timezone.utc),
+            session_id=ctx["session_id"],
+            techniques=str(techniques) if techniques else "",
+            crisis_resources=str(crisis_info) if crisis_info else ""
+        )
+    except ValueError as db_e:
+        logger.error("Failed to save chat to DB", extra=error_fields(db_e))
+        return False
+
+    # Written in the background by the chat writer, in order, batched with other turns;
+    # the session's memory is updated once they are stored (_update_memory)
+    await chat_writer.enqueue(user_chat, bot_chat)
+    return True
+
+def _update_memory(docs):
+    """
+    Chat writer callback: folds older messages of the sessions in a stored batch into their summaries.
+    Runs after the flush, so the update reads the turn that was just written.
+    """
+    if not MEMORY_ENABLED:
+        return
+    for user_id, session_id in {(doc["user"], doc["session_id"]) for doc in docs}:
+        conversation_memory.schedule_update(user_id, session_id)
+
+chat_writer.on_written(_update_memory)
+
+async def _respond_stream(ctx):
+    """
+    Streaming response stage: pushes text deltas and the quotes onto the request's event queue.
+    """
+    context = format_technique_context(ctx["techniques"])
+    text = ""
+    quotes = []
+    async for event, data in generate_response_stream(ctx["message"], context, ctx["severity"], ctx["crisis_resources"], language=ctx["language"], history=ctx["memory"]):
+        if event == "text":
+            text += data
+            ctx["events"].put_nowait(("text", {"delta": data}))
+        elif event == "quotes":
+            quotes = data
+            ctx["events"].put_nowait(("quotes", {"quotes": data}))
+    return {"text": text, "quotes": quotes}
+
+chat_stream_pipeline = chat_pipeline.with_stage("response", _respond_stream, pipeline_name="chat_stream")
+
+# --- SINGLE-CALL PIPELINE ---
+# One structured-output Gemini call returns severity, text and quotes together,
+# so it waits for the techniques; crisis resources are attached once severity is known.
+# The semantic cache can only save the technique search here.
+chat_single_call_pipeline = Pipeline("chat_single_call")
+chat_single_call_pipeline.stage("user")(_load_user)
+chat_single_call_pipeline.stage("memory")(_load_memory)
+chat_single_call_pipeline.stage("embedding")(_embed)
+chat_single_call_pipeline.stage("semantic", after=("embedding",))(_semantic_lookup)
+chat_single_call_pipeline.stage("techniques", after=("semantic",))(_search)
+
+@chat_single_call_pipeline.stage("turn", after=("memory", "techniques"))
+async def _classify_and_respond(ctx):
+    context = format_technique_context(ctx["techniques"])
+    return await classify_and_respond(ctx["message"], context, language=ctx["language"], history=ctx["memory"])
+
+@chat_single_call_pipeline.stage("severity", after=("turn",))
+async def _turn_severity(ctx):
+    return ctx["turn"]["severity"]
+
+chat_single_call_pipeline.stage("crisis_resources", after=("severity",))(_crisis)
+chat_single_call_pipeline.stage("remember", after=("semantic", "techniques"))(_semantic_store)
+
+@chat_single_call_pipeline.stage("response", after=("turn", "crisis_resources"))
+async def _turn_response(ctx):
+    return {"text": ctx["turn"]["text"], "quotes": ctx["turn"]["quotes"]}
+
+chat_single_call_pipeline.stage("persist", after=("user", "response"))(_persist)
+
+def active_chat_pipeline() -> Pipeline:
+    return chat_single_call_pipeline if CHAT_LLM_MODE == "single_call" else chat_pipeline
+
+# Stage results that are sent to streaming clients as soon as they are known
+EARLY_STREAM_EVENTS = ("severity", "crisis_resources", "techniques")
+
+def format_sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@router.get("/chat/pipeline")
+async def get_chat_pipeline():
+    """
+    Reports the stage dependency graph of the /chat pipeline.
+    """
+    pipeline = active_chat_pipeline()
+    return {"pipeline": pipeline.name, "stages": pipeline.graph()}
+
 @router.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest, authorization: str = Header(None)):
+async def chat_endpoint(request: ChatRequest, response: Response, user_id: str = Depends(get_current_user_id)):
+    # The body's session id wins over the X-Session-ID header / query parameter the middleware saw
+    session_id_var.set(request.session_id)
     try:
-        user_id = get_current_user_id(authorization)
-        user = None
-        if user_id:
-            user = User.objects(id=user_id).first()
+        pipeline = active_chat_pipeline()
+        results, timings = await pipeline.run(
+            message=request.message,
+            user_id=user_id,
+            language=detect_language(request.message),
+            received_at=datetime.now(timezone.utc),
+            session_id=request.session_id,
+        )
+        logger.info("Pipeline finished", extra={"pipeline": pipeline.name, "timings_ms": timings})
+        # Lets clients (and browser dev tools) see which stage a slow turn spent its time in
+        response.headers["Server-Timing"] = format_server_timing(timings)
 
-        # 1. Detect Language
-        language = detect_language(request.message)
-        
-        # 2. Classify Severity
-        severity = classify_severity(request.message)
-        
-        # 3. Generate Embedding
-        embedding = generate_embedding(request.message)
-        if not embedding:
-            raise HTTPException(status_code=500, detail="Failed to generate embedding")
-        
-        # 4. Search Techniques
-        techniques = search_techniques(embedding, language=language, match_count=5)
-        
-        # 5. Get Crisis Resources (if needed)
-        crisis_info = []
-        if severity in ["HIGH", "CRISIS"]:
-            crisis_info = get_crisis_resources(language=language)
-            
-        # 6. Generate Response
-        # Format context from techniques
-        context = ""
-        for t in techniques:
-            context += f"Technique: {t['title']}\nDescription: {t['content']}\nInstructions: {t['instructions']}\n\n"
-            
-        llm_output = generate_response(request.message, context, severity, crisis_info, language=language)
-        
-        # Handle case where llm_output might be a string (fallback) or dict
-        if isinstance(llm_output, str):
-             bot_response = llm_output
-             quotes = []
-        else:
-             bot_response = llm_output.get("text", "")
-             quotes = llm_output.get("quotes", [])
-             
-        # --- SAVE TO MONGODB ---
-        if user:
-            try:
-                # Save User Message
-                Chat(
-                    user=user,
-                    role="user",
-                    message=request.message,
-                    timestamp=datetime.now(timezone.utc)
-                ).save()
-                
-                # Save Bot Response
-                Chat(
-                    user=user,
-                    role="model",
-                    message=bot_response,
-                    timestamp=datetime.now(timezone.utc),
-                    techniques=str(techniques) if techniques else "",
-                    crisis_resources=str(crisis_info) if crisis_info else ""
-                ).save()
-            except Exception as db_e:
-                print(f"Failed to save chat to DB: {db_e}")
-        
         return ChatResponse(
-            response=bot_response,
-            severity=severity,
-            techniques=techniques,
-            crisis_resources=crisis_info,
-            quotes=quotes
+            response=results["response"]["text"],
+            severity=results["severity"],
+            techniques=results["techniques"],
+            crisis_resources=results["crisis_resources"],
+            quotes=results["response"]["quotes"]
         )
-        
+
     except Exception as e:
-        print(f"Error in chat endpoint: {e}")
+        logger.error("Error in chat endpoint", extra=error_fields(e))
+        ERRORS.labels("chat", error_cause(e)).inc()
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, user_id: str = Depends(get_current_user_id)):
+    """
+    Server-Sent Events variant of /chat. Sends `severity`, `crisis_resources` and
+    `techniques` events as soon as each is known, then `text` deltas as the answer
+    is generated, then `quotes`, and finally `done` (or `error`).
+    """
+    # Set before the response starts, so the streaming task inherits it
+    session_id_var.set(request.session_id)
+    events = asyncio.Queue()
+
+    def on_stage_done(name, result):
+        if name in EARLY_STREAM_EVENTS:
+            events.put_nowait((name, {name: result}))
+
+    async def event_stream():
+        run = asyncio.create_task(chat_stream_pipeline.run(
+            on_stage_done=on_stage_done,
+            message=request.message,
+            user_id=user_id,
+            language=detect_language(request.message),
+            received_at=datetime.now(timezone.utc),
+            session_id=request.session_id,
+            events=events,
+        ))
+        run.add_done_callback(lambda _: events.put_nowait(None))
+
+        try:
+            while True:
+                item = await events.get()
+                if item is None:
+                    break
+                yield format_sse(*item)
+
+            try:
+                _, timings = run.result()
+                logger.info("Pipeline finished", extra={"pipeline": chat_stream_pipeline.name, "timings_ms": timings})
+                yield format_sse("done", {})
+            except Exception as e:
+                logger.error("Error in chat stream endpoint", extra=error_fields(e))
+                ERRORS.labels("chat_stream", error_cause(e)).inc()
+                detail = e.detail if isinstance(e, HTTPException) else str(e)
+                yield format_sse("error", {"detail": detail})
+        finally:
+            # Client went away before the pipeline finished
+            if not run.done():
+                run.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
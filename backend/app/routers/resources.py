@@ -1,14 +1,27 @@
-from fastapi import APIRouter, HTTPException, Query
-from app.config import supabase
+import logging
+from fastapi import APIRouter, HTTPException, Query, Header, Response
+from app.services.resource_cache import resource_cache
+from app.services.logging_setup import error_fields
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/resources", tags=["resources"])
 
 @router.get("/")
-async def get_resources(language: str = Query("en", description="Filter resources by language code (en, th)")):
+async def get_resources(
+    response: Response,
+    language: str = Query("en", description="Filter resources by language code (en, th)"),
+    if_none_match: str = Header(None),
+):
     try:
-        # Fetch resources from Supabase where 'language' matches
-        response = supabase.table("crisis_resources").select("*").eq("language", language).execute()
-        return response.data
+        resources, etag = await resource_cache.get(language)
     except Exception as e:
-        print(f"Error fetching resources: {e}")
+        logger.error("Error fetching resources", extra=error_fields(e))
         raise HTTPException(status_code=500, detail="Failed to fetch resources")
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return resources
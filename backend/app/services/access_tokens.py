@@ -0,0 +1,124 @@
+"""
+Signed, expiring access tokens.
+
+/auth/login issues an HS256 JWT whose `sub` is the user id and whose `ver` is the
+user's token version. Routes check the signature and expiry in memory, and the
+version against the user record (through the user cache): a password change bumps
+the version, which revokes every token issued before it. Requests without an
+Authorization header stay anonymous. A header with a bad, expired or revoked token
+is rejected with 401, so the client knows to log in again.
+"""
+import logging
+import secrets
+import time
+import jwt
+from fastapi import Header, HTTPException
+from app.config import AUTH_SECRET, AUTH_DEV_EPHEMERAL_SECRET, ACCESS_TOKEN_TTL_SECONDS, AUTH_ACCEPT_USER_ID_TOKENS
+from app.repositories.users import to_object_id
+from app.services.metrics import ERRORS
+from app.services.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+ALGORITHM = "HS256"
+TOKEN_TYPE = "access"
+
+_secret = None
+
+
+def signing_key() -> str:
+    """
+    The HS256 key. Resolved on first use, so importing the app does no config work;
+    the startup hook calls it too, so a misconfigured worker refuses to start.
+    """
+    global _secret
+    if _secret is None:
+        if AUTH_SECRET:
+            _secret = AUTH_SECRET
+        # With several workers, a per-process key would reject most tokens, so refuse to run
+        elif not AUTH_DEV_EPHEMERAL_SECRET:
+            raise RuntimeError(
+                "AUTH_SECRET is not set. Set it to the same random value on every worker "
+                "(or AUTH_DEV_EPHEMERAL_SECRET=true for single-process local development)"
+            )
+        else:
+            _secret = secrets.token_urlsafe(32)
+            logger.warning("AUTH_SECRET is not set: access tokens are signed with a per-process key and won't survive a restart")
+    return _secret
+
+
+def issue_access_token(user_id, ttl: int = ACCESS_TOKEN_TTL_SECONDS, version: int = 0) -> tuple[str, int]:
+    """
+    Returns (token, seconds until it expires) for a user whose token version is `version`.
+    """
+    now = int(time.time())
+    claims = {"sub": str(user_id), "typ": TOKEN_TYPE, "ver": version, "iat": now, "exp": now + ttl}
+    return jwt.encode(claims, signing_key(), algorithm=ALGORITHM), ttl
+
+
+def decode_access_token(token: str) -> dict:
+    """
+    Returns the claims of a valid token; raises jwt.InvalidTokenError otherwise
+    (jwt.ExpiredSignatureError for an expired one).
+    """
+    claims = jwt.decode(token, signing_key(), algorithms=[ALGORITHM], options={"require": ["sub", "exp"]})
+    if claims.get("typ") != TOKEN_TYPE or to_object_id(claims["sub"]) is None:
+        raise jwt.InvalidTokenError("Not an access token")
+    return claims
+
+
+def verify_access_token(token: str) -> str:
+    """
+    Returns the user id from a valid token (signature and expiry only, not the version).
+    """
+    return decode_access_token(token)["sub"]
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+
+async def _user_id_from_header(authorization: str | None, fresh: bool) -> str | None:
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    token = token.strip()
+    if scheme.lower() != "bearer" or not token:
+        ERRORS.labels("auth", "malformed").inc()
+        raise _unauthorized("Invalid authorization header")
+
+    try:
+        claims = decode_access_token(token)
+    except jwt.ExpiredSignatureError:
+        ERRORS.labels("auth", "expired").inc()
+        raise _unauthorized("Token expired")
+    except jwt.InvalidTokenError:
+        if AUTH_ACCEPT_USER_ID_TOKENS and to_object_id(token) is not None:
+            return token
+        ERRORS.labels("auth", "invalid").inc()
+        raise _unauthorized("Invalid token")
+
+    # A deleted account, or a token issued before the last password change
+    user = await user_cache.get(claims["sub"], fresh=fresh)
+    if user is None or user.get("token_version", 0) != claims.get("ver", 0):
+        ERRORS.labels("auth", "revoked").inc()
+        raise _unauthorized("Token revoked")
+    return claims["sub"]
+
+
+async def get_current_user_id(authorization: str = Header(None)) -> str | None:
+    """
+    The user id of the request's bearer token, or None when no token was sent.
+    The user record comes from the per-worker cache, so a revocation on another
+    worker counts here within USER_CACHE_TTL_SECONDS.
+    """
+    return await _user_id_from_header(authorization, fresh=False)
+
+
+async def get_verified_user_id(authorization: str = Header(None)) -> str | None:
+    """
+    Like get_current_user_id, but reads the user record from MongoDB, so a password
+    change or account deletion on any worker counts at once. For the routes that read
+    or delete a user's data.
+    """
+    return await _user_id_from_header(authorization, fresh=True)
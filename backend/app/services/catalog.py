@@ -0,0 +1,232 @@
+"""
+Bulk maintenance of the techniques catalog: paged reads, batched re-embedding
+keyed on a content hash, and chunked upserts. Used by scripts/reembed_techniques.py
+and scripts/seed_db.py.
+"""
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+from typing import NamedTuple
+from app.clients import get_supabase
+from app.services.embeddings import generate_embeddings, content_hash, EMBEDDING_BATCH_SIZE
+
+PAGE_SIZE = 1000  # PostgREST's default max rows per response
+UPSERT_CHUNK_SIZE = 200
+
+
+async def fetch_techniques(columns: str = "*", page_size: int = PAGE_SIZE) -> list[dict]:
+    """
+    Reads the whole techniques table, one page at a time.
+    """
+    rows = []
+    start = 0
+    while True:
+        response = await (
+            get_supabase().table("techniques")
+            .select(columns)
+            .order("id")
+            .range(start, start + page_size - 1)
+            .execute()
+        )
+        page = response.data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start += page_size
+
+
+def needs_embedding(row: dict, force: bool = False) -> bool:
+    """
+    True when the row has text to embed and its stored vector doesn't match that text.
+    """
+    if not row.get("embedding_text"):
+        return False
+    if force or not row.get("embedding"):
+        return True
+    return row.get("embedding_hash") != content_hash(row["embedding_text"])
+
+
+async def upsert_techniques(rows: list[dict], chunk_size: int = UPSERT_CHUNK_SIZE, on_conflict: str = "id"):
+    """
+    Writes rows with one bulk upsert per chunk.
+    """
+    for start in range(0, len(rows), chunk_size):
+        await get_supabase().table("techniques").upsert(rows[start:start + chunk_size], on_conflict=on_conflict).execute()
+
+
+async def reembed_rows(rows: list[dict], batch_size: int = EMBEDDING_BATCH_SIZE, concurrency: int = 4,
+                       on_batch_done=None) -> tuple[int, list[tuple[list[dict], Exception]]]:
+    """
+    Embeds rows' embedding_text in batches, `concurrency` batches at a time
+    (quota pacing is left to the shared Gemini client), and upserts each batch
+    as soon as it is embedded. on_batch_done(batch) runs after each successful write.
+    Returns (rows written, [(failed batch, error)]).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = []
+    written = 0
+
+    async def run_batch(batch):
+        nonlocal written
+        async with semaphore:
+            try:
+                embeddings = await generate_embeddings([row["embedding_text"] for row in batch])
+                now = datetime.now(timezone.utc).isoformat()
+                for row, embedding in zip(batch, embeddings):
+                    row["embedding"] = embedding
+                    row["embedding_hash"] = content_hash(row["embedding_text"])
+                    # Bumped so the in-process technique index picks the new vector up incrementally
+                    row["updated_at"] = now
+                await upsert_techniques(batch)
+            except Exception as e:
+                failures.append((batch, e))
+                return
+        written += len(batch)
+        if on_batch_done is not None:
+            on_batch_done(batch)
+
+    batches = [rows[i:i + batch_size] for i in range(0, len(rows), batch_size)]
+    await asyncio.gather(*(run_batch(batch) for batch in batches))
+    return written, failures
+
+
+class Checkpoint:
+    """
+    Records which rows a run has already written ({id: content hash}) so an
+    interrupted run can pick up where it stopped. Saved atomically after every batch.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.done = json.load(f).get("done", {})
+
+    def is_done(self, row: dict) -> bool:
+        return self.done.get(str(row["id"])) == content_hash(row["embedding_text"])
+
+    def mark(self, rows: list[dict]):
+        for row in rows:
+            self.done[str(row["id"])] = row["embedding_hash"]
+        self.save()
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"done": self.done}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        self.done = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# ---------------------------------------------------------------------------
+# SEEDING
+# ---------------------------------------------------------------------------
+
+# Columns taken from the catalog JSON files; (title, language) is the natural key
+SEED_FIELDS = (
+    "title", "category", "target_symptoms", "content", "instructions",
+    "when_to_use", "embedding_text", "source", "language",
+)
+REQUIRED_FIELDS = ("title", "category", "target_symptoms", "content", "instructions", "when_to_use", "embedding_text")
+
+
+class SeedPlan(NamedTuple):
+    inserts: list[dict]
+    updates: list[dict]
+    unchanged: list[dict]
+    to_embed: list[dict]        # Inserted/updated rows whose embedding_text needs a new vector
+    orphans: list[dict]         # Rows in the table that no catalog file mentions (left alone)
+
+
+def natural_key(row: dict) -> tuple:
+    return row["title"], row["language"]
+
+
+def validate_techniques(techniques, language: str, source: str) -> tuple[list[dict], list[str]]:
+    """
+    Checks one catalog file's entries and returns (rows to seed, errors).
+    Rows get the file's language and a "source" default when they don't set one.
+    """
+    if not isinstance(techniques, list):
+        return [], [f"{source}: expected a JSON list of techniques"]
+
+    rows, errors = [], []
+    for i, technique in enumerate(techniques):
+        where = f"{source}[{i}]"
+        if not isinstance(technique, dict):
+            errors.append(f"{where}: expected an object")
+            continue
+        missing = [f for f in REQUIRED_FIELDS if technique.get(f) in (None, "", [])]
+        if missing:
+            errors.append(f"{where} ({technique.get('title', 'untitled')}): missing {', '.join(missing)}")
+            continue
+        if not isinstance(technique["title"], str) or not isinstance(technique["embedding_text"], str):
+            errors.append(f"{where}: title and embedding_text must be strings")
+            continue
+        row = {field: technique.get(field) for field in SEED_FIELDS}
+        row["title"] = row["title"].strip()
+        row["source"] = technique.get("source", "Unknown")
+        row["language"] = technique.get("language", language)
+        rows.append(row)
+    return rows, errors
+
+
+def find_duplicates(rows: list[dict]) -> list[str]:
+    seen, errors = set(), []
+    for row in rows:
+        key = natural_key(row)
+        if key in seen:
+            errors.append(f"duplicate technique {key[0]!r} ({key[1]})")
+        seen.add(key)
+    return errors
+
+
+def plan_seed(rows: list[dict], existing: list[dict]) -> SeedPlan:
+    """
+    Diffs the catalog against the table. Existing vectors are reused whenever the
+    stored hash shows the embedding_text hasn't changed.
+    """
+    by_key = {natural_key(row): row for row in existing}
+    inserts, updates, unchanged, to_embed = [], [], [], []
+    for row in rows:
+        current = by_key.pop(natural_key(row), None)
+        if current is None:
+            inserts.append(row)
+            to_embed.append(row)
+            continue
+
+        reembed = needs_embedding({**current, "embedding_text": row["embedding_text"]})
+        if reembed:
+            to_embed.append(row)
+        else:
+            row["embedding"] = current["embedding"]
+            row["embedding_hash"] = current["embedding_hash"]
+
+        if reembed or any(row[f] != current.get(f) for f in SEED_FIELDS):
+            updates.append(row)
+        else:
+            unchanged.append(row)
+    return SeedPlan(inserts, updates, unchanged, to_embed, list(by_key.values()))
+
+
+async def apply_seed(plan: SeedPlan, chunk_size: int = UPSERT_CHUNK_SIZE):
+    """
+    Embeds what needs embedding, then upserts inserts and updates on (title, language).
+    """
+    if plan.to_embed:
+        embeddings = await generate_embeddings([row["embedding_text"] for row in plan.to_embed])
+        for row, embedding in zip(plan.to_embed, embeddings):
+            row["embedding"] = embedding
+            row["embedding_hash"] = content_hash(row["embedding_text"])
+
+    now = datetime.now(timezone.utc).isoformat()
+    rows = plan.inserts + plan.updates
+    for row in rows:
+        row["updated_at"] = now
+    await upsert_techniques(rows, chunk_size=chunk_size, on_conflict="title,language")
@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import random
+import time
+from pymongo.errors import BulkWriteError, ConnectionFailure, ExecutionTimeout, WTimeoutError
+from app.database import chats_collection
+from app.services.metrics import track_call
+from app.config import CHAT_WRITE_BATCH_SIZE, CHAT_WRITE_FLUSH_INTERVAL, CHAT_WRITE_MAX_QUEUE
+from app.services.logging_setup import error_fields
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+DUPLICATE_KEY_ERROR = 11000
+# Only these are retried; any other failure would repeat on every attempt
+TRANSIENT_ERRORS = (ConnectionFailure, ExecutionTimeout, WTimeoutError, ConnectionError, TimeoutError)
+
+
+class ChatWriter:
+    """
+    Write-behind persistence for chat messages. Requests enqueue raw chat documents
+    and return immediately; a background task flushes them with insert_many once
+    `batch_size` documents are waiting or `flush_interval` seconds have passed.
+    Batches that fail on a connection or timeout error are retried with jittered
+    exponential backoff. A document the server rejects (e.g. a validation error)
+    is dropped on its own and the rest of its batch is written.
+
+    Callbacks registered with on_written are called with the documents of each
+    flush once they are stored, for work that has to read them back.
+    """
+
+    def __init__(self, collection_getter, batch_size: int = 100, flush_interval: float = 0.25,
+                 max_queue: int = 10000, max_retries: int = 5, backoff: float = 0.5, max_backoff: float = 10.0):
+        self._collection_getter = collection_getter
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._queue = None
+        self._task = None
+        self._on_written = []
+        self._total_flush_ms = 0.0
+        self.last_flush_ms = None
+        self.counters = {
+            "enqueued": 0,
+            "written": 0,
+            "flushes": 0,
+            "retries": 0,
+            "dropped": 0,
+            "rejected": 0,
+            "overflow_writes": 0,
+        }
+
+    def start(self):
+        """
+        Starts the flush task on the running event loop (called on app startup, or lazily on first enqueue).
+        """
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+
+        # Carry over anything left behind by a previous loop
+        pending = []
+        while self._queue is not None and not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                pending.append(item)
+
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        for doc in pending:
+            self._queue.put_nowait(doc)
+        self._task = loop.create_task(self._run())
+
+    def on_written(self, callback):
+        """
+        Registers `callback(docs)`, called on the event loop after every flush with the documents
+        it stored. It must not block; start a task for anything slow.
+        """
+        self._on_written.append(callback)
+
+    async def enqueue(self, *docs: dict):
+        """
+        Queues documents for the next batch. If the queue is full, the documents are written directly.
+        """
+        self.start()
+        overflow = []
+        for doc in docs:
+            try:
+                self._queue.put_nowait(doc)
+                self.counters["enqueued"] += 1
+            except asyncio.QueueFull:
+                overflow.append(doc)
+
+        if overflow:
+            self.counters["overflow_writes"] += len(overflow)
+            await self._flush(overflow)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+
+            batch = [item]
+            stopping = False
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+            if stopping:
+                # Anything enqueued after the stop marker still gets written
+                rest = []
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is not _STOP:
+                        rest.append(item)
+                for i in range(0, len(rest), self.batch_size):
+                    await self._flush(rest[i:i + self.batch_size])
+                return
+
+    async def _flush(self, batch: list[dict]):
+        stored = []
+        try:
+            await self._write(batch, stored)
+        finally:
+            if stored:
+                self._notify(stored)
+
+    async def _write(self, batch: list[dict], stored: list[dict]):
+        attempt = 0
+        while batch:
+            start = time.perf_counter()
+            error, retryable = None, True
+            try:
+                with track_call("mongo", "insert_chats"):
+                    await self._collection_getter().insert_many(batch, ordered=True)
+                written = skipped = len(batch)
+            except BulkWriteError as e:
+                # insert_many assigns _id in place, so a retry only needs the documents that didn't make it
+                written = skipped = e.details.get("nInserted", 0)
+                write_errors = e.details.get("writeErrors", [])
+                if write_errors:
+                    # An ordered insert stops at the first failing document: skip it and carry on with the rest
+                    failed = write_errors[0]
+                    skipped = failed["index"] + 1
+                    if failed.get("code") == DUPLICATE_KEY_ERROR:
+                        # Written by an earlier attempt whose acknowledgement was lost
+                        written = skipped
+                    else:
+                        # Retrying would fail the same way, so only this document is lost
+                        written = failed["index"]
+                        self.counters["rejected"] += 1
+                        logger.error("Chat message rejected by MongoDB", extra={"code": failed.get("code")})
+                else:
+                    # Only a write concern error: retry whatever wasn't inserted
+                    error = e
+            except TRANSIENT_ERRORS as e:
+                written = skipped = 0
+                error = e
+            except Exception as e:
+                written = skipped = 0
+                error, retryable = e, False
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.last_flush_ms = round(elapsed_ms, 2)
+            self._total_flush_ms += elapsed_ms
+            self.counters["flushes"] += 1
+            self.counters["written"] += written
+            stored += batch[:written]
+            batch = batch[skipped:]
+            if error is None or not batch:
+                continue
+
+            if not retryable or attempt == self.max_retries:
+                self.counters["dropped"] += len(batch)
+                logger.error("Failed to save chat messages", extra={**error_fields(error), "dropped": len(batch), "attempts": attempt + 1})
+                return
+            self.counters["retries"] += 1
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+            await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+            attempt += 1
+
+    def _notify(self, docs: list[dict]):
+        for callback in self._on_written:
+            try:
+                callback(docs)
+            except Exception as e:
+                logger.error("Chat writer callback failed", extra=error_fields(e))
+
+    async def stop(self, timeout: float = 10.0):
+        """
+        Flushes everything still queued and stops the background task.
+        """
+        if self._task is None or self._task.done():
+            return
+        await self._queue.put(_STOP)
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.error("Chat writer did not drain in time", extra={"timeout_s": timeout, "unsaved": self._queue.qsize()})
+            self._task.cancel()
+
+    def stats(self) -> dict:
+        flushes = self.counters["flushes"]
+        return {
+            **self.counters,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "last_flush_ms": self.last_flush_ms,
+            "avg_flush_ms": round(self._total_flush_ms / flushes, 2) if flushes else None,
+        }
+
+
+chat_writer = ChatWriter(
+    chats_collection,
+    batch_size=CHAT_WRITE_BATCH_SIZE,
+    flush_interval=CHAT_WRITE_FLUSH_INTERVAL,
+    max_queue=CHAT_WRITE_MAX_QUEUE,
+)
@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+from app.services.logging_setup import error_fields
+
+logger = logging.getLogger(__name__)
+
+# Rough per-entry overhead of the key, OrderedDict node and bytes object
+_ENTRY_OVERHEAD_BYTES = 200
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes text so trivially different messages ("Hi ", "hi") share a cache entry.
+    """
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def cache_key(text: str, model: str, dimensions: int) -> str:
+    raw = f"{model}\x00{dimensions}\x00{normalize_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _SqliteStore:
+    """
+    Persistent tier shared by every uvicorn worker on the host (WAL mode allows concurrent readers).
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, dimensions INTEGER NOT NULL, "
+            "vector BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            row = self._conn.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, model: str, dimensions: int, vector: bytes):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, model, dimensions, vector, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, model, dimensions, vector, time.time()),
+            )
+
+
+class EmbeddingCache:
+    """
+    Two-tier memoization for embeddings: a byte-bounded in-memory LRU in front of
+    an optional sqlite file. Vectors are stored as packed float32 bytes.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, path: str | None = None):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._store = _SqliteStore(path) if path else None
+        self.counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "disk_errors": 0,
+        }
+
+    def _remember(self, key: str, vector: bytes):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return
+
+        size = len(vector) + _ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        self._entries[key] = vector
+        self._bytes += size
+
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted) + _ENTRY_OVERHEAD_BYTES
+            self.counters["evictions"] += 1
+
+    async def get(self, text: str, model: str, dimensions: int) -> list[float] | None:
+        key = cache_key(text, model, dimensions)
+
+        vector = self._entries.get(key)
+        if vector is not None:
+            self._entries.move_to_end(key)
+            self.counters["memory_hits"] += 1
+            return np.frombuffer(vector, dtype=np.float32).tolist()
+
+        if self._store is not None:
+            try:
+                vector = await asyncio.to_thread(self._store.get, key)
+            except sqlite3.Error as e:
+                self.counters["disk_errors"] += 1
+                logger.warning("Embedding cache read failed", extra=error_fields(e))
+                vector = None
+            if vector is not None:
+                self._remember(key, vector)
+                self.counters["disk_hits"] += 1
+                return np.frombuffer(vector, dtype=np.float32).tolist()
+
+        self.counters["misses"] += 1
+        return None
+
+    async def put(self, text: str, model: str, dimensions: int, embedding: list[float]):
+        key = cache_key(text, model, dimensions)
+        vector = np.asarray(embedding, dtype=np.float32).tobytes()
+        self._remember(key, vector)
+
+        if self._store is not None:
+            try:
+                await asyncio.to_thread(self._store.put, key, model, dimensions, vector)
+            except sqlite3.Error as e:
+                self.counters["disk_errors"] += 1
+                logger.warning("Embedding cache write failed", extra=error_fields(e))
+
+    def stats(self) -> dict:
+        lookups = self.counters["memory_hits"] + self.counters["disk_hits"] + self.counters["misses"]
+        hits = lookups - self.counters["misses"]
+        return {
+            **self.counters,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "persistent": self._store is not None,
+        }
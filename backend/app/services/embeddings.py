@@ -1,22 +1,86 @@
-from app.config import genai_client
-from google.genai import types
+import hashlib
+import logging
+from functools import cache
+from app.config import EMBEDDING_CACHE_MAX_BYTES, EMBEDDING_CACHE_PATH
+from app.services.gemini import gemini
+from app.services.embedding_cache import EmbeddingCache
+from app.services.metrics import track_call, FALLBACKS, error_cause
+from app.services.logging_setup import error_fields
 
-def generate_embedding(text: str) -> list[float]:
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "gemini-embedding-001"
+EMBEDDING_DIMENSIONS = 768
+# Gemini accepts at most this many texts per embed_content request
+EMBEDDING_BATCH_SIZE = 100
+
+embedding_cache = EmbeddingCache(max_bytes=EMBEDDING_CACHE_MAX_BYTES, path=EMBEDDING_CACHE_PATH)
+
+
+@cache
+def _embed_config():
+    # google.genai.types is slow to import, so it waits for the first embedding call
+    from google.genai import types
+
+    return types.EmbedContentConfig(output_dimensionality=EMBEDDING_DIMENSIONS)
+
+
+async def generate_embedding(text: str) -> list[float]:
     """
     Generates an embedding for the given text using Gemini's embedding model.
-    Output dimensionality is 3072 to match the Supabase vector column.
+    Output dimensionality is 768 to match the Supabase vector column.
+    Results are memoized in embedding_cache, so repeated messages skip the API call.
     """
+    cached = await embedding_cache.get(text, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS)
+    if cached is not None:
+        return cached
+
     try:
-        result = genai_client.models.embed_content(
-            model="gemini-embedding-001",
-            contents=text,
-            config=types.EmbedContentConfig(
-                output_dimensionality=768,
-            ),
-        )
+        with track_call("gemini", "embed"):
+            result = await gemini.embed_content(
+                model=EMBEDDING_MODEL,
+                contents=text,
+                config=_embed_config(),
+            )
         embedding = result.embeddings[0].values
-        print(f"[DEBUG] Embedding model: gemini-embedding-001, dimensions: {len(embedding)}")
+        # Hot path: debug records here are sampled (LOG_DEBUG_SAMPLE_RATE)
+        logger.debug("Embedding generated", extra={"model": EMBEDDING_MODEL, "dimensions": len(embedding)})
+        await embedding_cache.put(text, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, embedding)
         return embedding
     except Exception as e:
-        print(f"Error generating embedding: {e}")
+        logger.error("Error generating embedding", extra=error_fields(e))
+        FALLBACKS.labels("embedding", error_cause(e)).inc()
         return []
+
+
+def content_hash(text: str) -> str:
+    """
+    Hash of the exact text plus the embedding model/dimensions. A stored vector
+    whose hash still matches doesn't need to be re-embedded.
+    """
+    raw = f"{EMBEDDING_MODEL}\x00{EMBEDDING_DIMENSIONS}\x00{text}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def generate_embeddings(texts: list[str]) -> list[list[float]]:
+    """
+    Batch variant of generate_embedding for scripts, in requests of up to EMBEDDING_BATCH_SIZE texts.
+    It bypasses embedding_cache: the cache key is the normalized text, while the catalog tracks
+    vectors by the exact text (content_hash), so a cached vector could belong to a different
+    text, and --force must get new vectors anyway.
+    Unlike generate_embedding, API errors are raised so the caller knows which batch failed.
+    """
+    embeddings = []
+    for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+        chunk = texts[start:start + EMBEDDING_BATCH_SIZE]
+        with track_call("gemini", "embed_batch"):
+            result = await gemini.embed_content(
+                model=EMBEDDING_MODEL,
+                contents=chunk,
+                config=_embed_config(),
+            )
+        if len(result.embeddings) != len(chunk):
+            raise ValueError(f"Expected {len(chunk)} embeddings, got {len(result.embeddings)}")
+        embeddings.extend(embedding.values for embedding in result.embeddings)
+
+    return embeddings
@@ -4,6 +4,7 @@ Each emotion group has 10+ unique messages so responses feel natural and varied.
 A random message is selected each time to avoid repetition.
 """
 import random
+from app.services.keyword_matcher import KeywordMatcher, normalize_message
 
 # ---------------------------------------------------------------------------
 # ENGLISH FALLBACK RESPONSES
@@ -290,27 +291,88 @@ DEFAULT_RESPONSES_TH = [
 ]
 
 
+# ---------------------------------------------------------------------------
+# MATCHER
+# ---------------------------------------------------------------------------
+
+# Generic positive words ("good", "great") shouldn't outvote a distress keyword
+CATEGORY_WEIGHTS = {"happiness": 0.8, "confidence": 0.9}
+
+
+def keyword_weight(keyword: str, category: str) -> float:
+    # Multi-word phrases ("burned out", "can't sleep") are more specific than single words
+    return CATEGORY_WEIGHTS.get(category, 1.0) * (1.0 + 0.5 * (len(keyword.split()) - 1))
+
+
+def _build_matcher() -> KeywordMatcher:
+    # Each keyword's payload: {message language: ((category, weight), ...)}; Thai keywords only count for Thai messages
+    weights = {}
+    for language, bank in (("th", KEYWORD_RESPONSES_TH), ("en", KEYWORD_RESPONSES_EN)):
+        for category, entry in bank.items():
+            for kw in entry["keywords"]:
+                weights.setdefault(normalize_message(kw), []).append((language, category, keyword_weight(kw, category)))
+    return KeywordMatcher({
+        keyword: {
+            "th": tuple((category, weight) for _, category, weight in entries),
+            "en": tuple((category, weight) for language, category, weight in entries if language == "en"),
+        }
+        for keyword, entries in weights.items()
+    })
+
+
+# Every EN/TH keyword, compiled once at import
+FALLBACK_MATCHER = _build_matcher()
+
+# Tie-break order: the message language's categories first, in bank order
+CATEGORY_ORDER = {
+    "th": list(KEYWORD_RESPONSES_TH) + [c for c in KEYWORD_RESPONSES_EN if c not in KEYWORD_RESPONSES_TH],
+    "en": list(KEYWORD_RESPONSES_EN),
+}
+CATEGORY_RANK = {language: {c: -i for i, c in enumerate(order)} for language, order in CATEGORY_ORDER.items()}
+
+
+def _bank_language(language: str) -> str:
+    return "th" if language == "th" else "en"
+
+
+def score_categories(message: str, language: str = 'en') -> dict:
+    """
+    Scores every category from one scan. Negated keywords ("not anxious", "ไม่เครียด") don't count.
+    """
+    bank_language = _bank_language(language)
+    scores = {}
+    for keyword, count in FALLBACK_MATCHER.count_unnegated(normalize_message(message)).items():
+        for category, weight in FALLBACK_MATCHER.payload(keyword)[bank_language]:
+            scores[category] = scores.get(category, 0.0) + weight * count
+    return scores
+
+
+def best_category(message: str, language: str = 'en') -> str | None:
+    """
+    The best-scoring category; ties go to the category listed first in the message language's bank.
+    """
+    scores = score_categories(message, language)
+    if not scores:
+        return None
+    rank = CATEGORY_RANK[_bank_language(language)]
+    return max(scores, key=lambda c: (scores[c], rank[c]))
+
+
 def get_keyword_fallback(message: str, language: str = 'en') -> str:
     """
     Return a contextual, random fallback response based on keywords in the user's message.
-    Used when the Gemini API is rate-limited (429 error).
+    Used when the Gemini API is rate-limited (429 error) or the circuit breaker is open.
     """
-    msg = message.lower()
-    
-    # Select the appropriate response bank
-    if language == 'th':
-        # Check Thai keywords first
-        for category in KEYWORD_RESPONSES_TH.values():
-            if any(kw in msg for kw in category["keywords"]):
-                return random.choice(category["responses"])
-    
-    # Check English keywords (also serves as fallback for Thai if no Thai keyword matched)
-    for category in KEYWORD_RESPONSES_EN.values():
-        if any(kw in msg for kw in category["keywords"]):
-            return random.choice(category["responses"])
-    
+    category = best_category(message, language)
+
+    if category is not None:
+        # Answer in the user's language when that bank has the category
+        if language == 'th' and category in KEYWORD_RESPONSES_TH:
+            return random.choice(KEYWORD_RESPONSES_TH[category]["responses"])
+        return random.choice(KEYWORD_RESPONSES_EN[category]["responses"])
+
     # Default fallback if no keywords match
     if language == 'th':
         return random.choice(DEFAULT_RESPONSES_TH)
-    
+
     return random.choice(DEFAULT_RESPONSES_EN)
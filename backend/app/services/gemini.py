@@ -0,0 +1,267 @@
+import asyncio
+import random
+import time
+import httpx
+from app.clients import get_genai_client
+from app.config import (
+    GEMINI_RATE_LIMITS,
+    GEMINI_MAX_RETRIES,
+    GEMINI_RETRY_BACKOFF,
+    GEMINI_MAX_QUEUE_WAIT,
+    GEMINI_BREAKER_THRESHOLD,
+    GEMINI_BREAKER_RESET_SECONDS,
+)
+
+RETRIABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class GeminiUnavailable(Exception):
+    """
+    Raised without calling Gemini: the circuit breaker is open or the quota wait is too long.
+    Callers treat it like any other Gemini failure and use their fallback.
+    """
+
+
+def estimate_tokens(contents) -> int:
+    # Roughly 4 characters per token; only used to pace requests against the TPM quota
+    if isinstance(contents, str):
+        return max(1, len(contents) // 4)
+    if isinstance(contents, (list, tuple)):
+        return sum(estimate_tokens(c) for c in contents) or 1
+    return max(1, len(str(contents)) // 4)
+
+
+def is_retriable(error: Exception) -> bool:
+    # Imported here: google.genai is slow to import and only needed once a call has failed
+    from google.genai import errors
+
+    if isinstance(error, errors.APIError):
+        return error.code in RETRIABLE_STATUS
+    return isinstance(error, (httpx.TransportError, asyncio.TimeoutError, ConnectionError))
+
+
+class TokenBucket:
+    """
+    Refills at `per_minute` tokens per minute up to `per_minute`. Callers reserve
+    tokens up front (the balance may go negative) and sleep for the returned delay,
+    so concurrent requests queue in arrival order without a lock.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        """
+        Takes `amount` tokens and returns how many seconds to wait before using them.
+        """
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+        return max(0.0, -self.tokens / self.rate)
+
+    def refund(self, amount: float):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + min(amount, self.capacity))
+
+    def available(self) -> float:
+        self._refill()
+        return round(self.tokens, 1)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds; then lets a single probe through (half-open) and
+    closes again if it succeeds.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """
+        Ends a probe that neither succeeded nor failed (e.g. a 400 for a bad request).
+        """
+        self._probing = False
+
+
+class _ModelState:
+    def __init__(self, limits: dict, failure_threshold: int, reset_timeout: float):
+        self.rpm = TokenBucket(limits["rpm"]) if limits.get("rpm") else None
+        self.tpm = TokenBucket(limits["tpm"]) if limits.get("tpm") else None
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.counters = {"calls": 0, "retries": 0, "failures": 0, "rejected": 0, "throttled": 0}
+        self.wait_ms = 0.0
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "limiter_wait_ms": round(self.wait_ms, 2),
+            "rpm_available": self.rpm.available() if self.rpm else None,
+            "tpm_available": self.tpm.available() if self.tpm else None,
+            "breaker": self.breaker.state,
+            "breaker_opened": self.breaker.times_opened,
+            "consecutive_failures": self.breaker.failures,
+        }
+
+
+class GeminiClient:
+    """
+    Shared wrapper around the genai client's aio.models. Every call is paced by per-model
+    RPM/TPM token buckets, retried with jittered exponential backoff on 429/5xx and
+    transport errors, and guarded by a per-model circuit breaker.
+    """
+
+    def __init__(self, client=None, rate_limits: dict = None, max_retries: int = 3, backoff: float = 0.5,
+                 max_backoff: float = 8.0, max_queue_wait: float = 5.0, failure_threshold: int = 5,
+                 reset_timeout: float = 30.0):
+        self._client = client
+        self.rate_limits = rate_limits or {}
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_queue_wait = max_queue_wait
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._models = {}
+
+    @property
+    def client(self):
+        # Built on first use unless one was injected, so importing the app doesn't pay for google.genai
+        if self._client is None:
+            self._client = get_genai_client()
+        return self._client
+
+    def _state(self, model: str) -> _ModelState:
+        if model not in self._models:
+            self._models[model] = _ModelState(self.rate_limits.get(model, {}), self.failure_threshold, self.reset_timeout)
+        return self._models[model]
+
+    def is_open(self, model: str) -> bool:
+        """
+        True when calls to `model` are currently being rejected by its breaker.
+        """
+        state = self._state(model)
+        return state.breaker.state == CircuitBreaker.OPEN and time.monotonic() - state.breaker.opened_at < self.reset_timeout
+
+    async def _throttle(self, state: _ModelState, tokens: int):
+        delays = []
+        if state.rpm:
+            delays.append(state.rpm.reserve(1))
+        if state.tpm:
+            delays.append(state.tpm.reserve(tokens))
+        delay = max(delays, default=0.0)
+        if delay > self.max_queue_wait:
+            if state.rpm:
+                state.rpm.refund(1)
+            if state.tpm:
+                state.tpm.refund(tokens)
+            state.counters["throttled"] += 1
+            raise GeminiUnavailable(f"quota wait of {delay:.1f}s exceeds {self.max_queue_wait}s")
+        if delay > 0:
+            state.wait_ms += delay * 1000
+            await asyncio.sleep(delay)
+
+    async def _call(self, model: str, contents, fn, **kwargs):
+        state = self._state(model)
+        if not state.breaker.allow():
+            state.counters["rejected"] += 1
+            raise GeminiUnavailable(f"circuit open for {model}")
+
+        tokens = estimate_tokens(contents)
+        attempt = 0
+        try:
+            while True:
+                await self._throttle(state, tokens)
+                state.counters["calls"] += 1
+                try:
+                    response = await fn(model=model, contents=contents, **kwargs)
+                except Exception as e:
+                    if not is_retriable(e):
+                        state.breaker.release()
+                        raise
+                    if attempt == self.max_retries:
+                        state.counters["failures"] += 1
+                        state.breaker.record_failure()
+                        raise
+                    state.counters["retries"] += 1
+                    delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+                    await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+                    attempt += 1
+                    continue
+
+                state.breaker.record_success()
+                # Charge the TPM bucket for the tokens actually used (prompt + output)
+                usage = getattr(response, "usage_metadata", None)
+                used = getattr(usage, "total_token_count", None)
+                if state.tpm and isinstance(used, int) and used > tokens:
+                    state.tpm.reserve(used - tokens)
+                return response
+        except (asyncio.CancelledError, GeminiUnavailable):
+            state.breaker.release()
+            raise
+
+    async def generate_content(self, model: str, contents, config=None):
+        return await self._call(model, contents, self.client.aio.models.generate_content, config=config)
+
+    async def generate_content_stream(self, model: str, contents, config=None):
+        """
+        Opens a stream. Only opening it is retried; errors mid-stream are the caller's to handle.
+        """
+        return await self._call(model, contents, self.client.aio.models.generate_content_stream, config=config)
+
+    async def embed_content(self, model: str, contents, config=None):
+        return await self._call(model, contents, self.client.aio.models.embed_content, config=config)
+
+    def stats(self) -> dict:
+        return {model: state.stats() for model, state in self._models.items()}
+
+
+gemini = GeminiClient(
+    rate_limits=GEMINI_RATE_LIMITS,
+    max_retries=GEMINI_MAX_RETRIES,
+    backoff=GEMINI_RETRY_BACKOFF,
+    max_queue_wait=GEMINI_MAX_QUEUE_WAIT,
+    failure_threshold=GEMINI_BREAKER_THRESHOLD,
+    reset_timeout=GEMINI_BREAKER_RESET_SECONDS,
+)
@@ -0,0 +1,158 @@
+"""
+Shared, tuned httpx connection pools for outbound API clients.
+
+One pool per service keeps TLS connections alive between requests and, over
+HTTP/2, multiplexes concurrent requests on them. A semaphore bounds how many
+requests are in flight; callers past the bound wait up to `wait_timeout` for a
+slot and then fail fast with httpx.PoolTimeout instead of piling up.
+"""
+import asyncio
+import time
+import httpx
+from app.services.metrics import POOL_IN_FLIGHT, POOL_WAITING, POOL_WAIT, POOL_CONNECTIONS
+
+
+class _ReleasingStream(httpx.AsyncByteStream):
+    """
+    Response body that frees the request's slot once it has been read and closed.
+    """
+
+    def __init__(self, stream, release):
+        self._stream = stream
+        self._release = release
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            self._release()
+
+
+class BoundedTransport(httpx.AsyncBaseTransport):
+    """
+    Wraps a transport with a concurrency bound, per-route read timeouts and pool metrics.
+    `route_timeouts` maps a URL path fragment (e.g. "/rpc/") to a read timeout in seconds.
+    """
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, service: str, max_concurrency: int = 32,
+                 wait_timeout: float = 2.0, route_timeouts: dict = None):
+        self._inner = inner
+        self.service = service
+        self.max_concurrency = max_concurrency
+        self.wait_timeout = wait_timeout
+        self.route_timeouts = route_timeouts or {}
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._in_flight = 0
+        self._waiting = 0
+        self.counters = {"requests": 0, "pool_timeouts": 0, "peak_in_flight": 0}
+
+    async def _acquire(self, request: httpx.Request):
+        if not self._slots.locked():
+            await self._slots.acquire()
+            POOL_WAIT.labels(self.service).observe(0.0)
+            return
+
+        start = time.perf_counter()
+        self._waiting += 1
+        POOL_WAITING.labels(self.service).set(self._waiting)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.wait_timeout)
+        except asyncio.TimeoutError:
+            self.counters["pool_timeouts"] += 1
+            raise httpx.PoolTimeout(f"No free {self.service} connection slot after {self.wait_timeout}s", request=request)
+        finally:
+            self._waiting -= 1
+            POOL_WAITING.labels(self.service).set(self._waiting)
+        POOL_WAIT.labels(self.service).observe(time.perf_counter() - start)
+
+    def _apply_route_timeout(self, request: httpx.Request):
+        for fragment, seconds in self.route_timeouts.items():
+            if fragment in request.url.path:
+                timeout = request.extensions.get("timeout", {})
+                request.extensions["timeout"] = {**timeout, "read": seconds}
+                return
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await self._acquire(request)
+        self._in_flight += 1
+        self.counters["requests"] += 1
+        self.counters["peak_in_flight"] = max(self.counters["peak_in_flight"], self._in_flight)
+        POOL_IN_FLIGHT.labels(self.service).set(self._in_flight)
+
+        released = False
+
+        def release():
+            nonlocal released
+            if not released:
+                released = True
+                self._in_flight -= 1
+                POOL_IN_FLIGHT.labels(self.service).set(self._in_flight)
+                self._slots.release()
+                self._record_connections()
+
+        self._apply_route_timeout(request)
+        try:
+            response = await self._inner.handle_async_request(request)
+        except BaseException:
+            release()
+            raise
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_ReleasingStream(response.stream, release),
+            extensions=response.extensions,
+        )
+
+    def _connections(self) -> dict:
+        pool = getattr(self._inner, "_pool", None)
+        counts = {"active": 0, "idle": 0, "http2": 0}
+        for connection in getattr(pool, "connections", ()):
+            counts["idle" if connection.is_idle() else "active"] += 1
+            if "HTTP/2" in connection.info():
+                counts["http2"] += 1
+        return counts
+
+    def _record_connections(self):
+        counts = self._connections()
+        POOL_CONNECTIONS.labels(self.service, "active").set(counts["active"])
+        POOL_CONNECTIONS.labels(self.service, "idle").set(counts["idle"])
+
+    async def aclose(self):
+        await self._inner.aclose()
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "max_concurrency": self.max_concurrency,
+            "connections": self._connections(),
+        }
+
+
+def build_http_client(service: str, *, http2: bool = True, max_connections: int = 20, max_keepalive: int = 10,
+                      keepalive_expiry: float = 60.0, max_concurrency: int = 32, connect_timeout: float = 3.0,
+                      timeout: float = 10.0, wait_timeout: float = 2.0, route_timeouts: dict = None) -> httpx.AsyncClient:
+    """
+    An httpx.AsyncClient on a kept-alive (HTTP/2 by default) pool behind a BoundedTransport.
+    """
+    inner = httpx.AsyncHTTPTransport(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        ),
+    )
+    transport = BoundedTransport(
+        inner, service, max_concurrency=max_concurrency, wait_timeout=wait_timeout, route_timeouts=route_timeouts,
+    )
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(timeout, connect=connect_timeout),
+        follow_redirects=True,
+    )
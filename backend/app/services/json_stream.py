@@ -0,0 +1,85 @@
+import re
+
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class JsonStringFieldStream:
+    """
+    Incrementally decodes one string field of a JSON object that arrives in chunks,
+    e.g. the "text" field of {"text": "...", "quotes": [...]} from a streaming LLM call.
+    feed() returns the newly decoded characters of the field; the raw chunks are
+    kept in `buffer` so the complete document can be parsed once the stream ends.
+    """
+
+    def __init__(self, field: str):
+        self._key_pattern = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self.buffer = ""
+        self.value = ""
+        self.done = False
+        self._pos = None  # Index in buffer where the undecoded part of the field starts
+
+    def feed(self, chunk: str) -> str:
+        self.buffer += chunk
+        if self.done:
+            return ""
+
+        if self._pos is None:
+            match = self._key_pattern.search(self.buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+
+        buf = self.buffer
+        n = len(buf)
+        i = self._pos
+        out = []
+        while i < n:
+            c = buf[i]
+            if c == '"':
+                self.done = True
+                i += 1
+                break
+            if c != '\\':
+                j = i
+                while j < n and buf[j] != '"' and buf[j] != '\\':
+                    j += 1
+                out.append(buf[i:j])
+                i = j
+                continue
+
+            # Escape sequences may be split across chunks; wait for the rest before decoding
+            if i + 1 >= n:
+                break
+            escape = buf[i + 1]
+            if escape != 'u':
+                out.append(_ESCAPES.get(escape, escape))
+                i += 2
+                continue
+            if i + 6 > n:
+                break
+            try:
+                code = int(buf[i + 2:i + 6], 16)
+            except ValueError:
+                out.append(buf[i:i + 6])
+                i += 6
+                continue
+            if 0xD800 <= code < 0xDC00:
+                # High surrogate: combine with the following \uXXXX low surrogate
+                if i + 12 > n:
+                    break
+                if buf[i + 6:i + 8] == '\\u':
+                    try:
+                        low = int(buf[i + 8:i + 12], 16)
+                    except ValueError:
+                        low = None
+                    if low is not None and 0xDC00 <= low < 0xE000:
+                        out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                        i += 12
+                        continue
+            out.append(chr(code))
+            i += 6
+
+        self._pos = i
+        decoded = "".join(out)
+        self.value += decoded
+        return decoded
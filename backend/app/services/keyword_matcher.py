@@ -0,0 +1,213 @@
+"""
+Multi-keyword matching for the keyword lexicons, plus the negation check they share.
+"""
+import re
+from bisect import bisect_left
+from collections import Counter
+from itertools import accumulate, compress, count
+from operator import add
+from typing import NamedTuple
+
+# A term counts as negated when one of the (up to) three words before it, in the same clause, is a negation
+NEGATION_WORDS_EN = {"not", "never", "no", "dont", "don't", "isnt", "isn't", "arent", "aren't", "wasnt", "wasn't",
+                     "aint", "ain't", "wont", "won't", "without"}
+NEGATION_TH = ("ไม่", "ไม่ได้", "ไม่ค่อย", "ไม่เคย")
+CLAUSE_BREAKS = ",.;:!?"
+# How far back (in characters) a negation can be from the term it negates
+NEGATION_WINDOW = 30
+
+
+def normalize_message(message: str) -> str:
+    # Curly apostrophes from phone keyboards would otherwise miss "can't", "don't", ...
+    # Replaced first: a message that is ASCII without them gets the fast ASCII lower()
+    return message.replace("’", "'").lower()
+
+
+def is_negated(text: str, start: int) -> bool:
+    """
+    True when the term starting at `start` follows a negation ("not really anxious", "ไม่เครียด").
+    Expects lowercased text.
+    """
+    # One anchored match on the reversed window walks back over the last words before the term
+    return NEGATION_BEFORE.match(text[max(0, start - NEGATION_WINDOW):start][::-1]) is not None
+
+
+def _alternation(terms) -> str:
+    """
+    The terms as a prefix-factored regex ("anxi(?:ety|ous)"), so the engine follows
+    one branch per character instead of trying every keyword at every position.
+    Longer terms are tried before their prefixes.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+    return _trie_regex(trie)
+
+
+def _trie_regex(node: dict) -> str:
+    branches = [re.escape(ch) + _trie_regex(child) for ch, child in sorted(node.items()) if ch]
+    if not branches:
+        return ""
+    pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if "" in node:
+        # The term can also end here
+        pattern = "(?:" + pattern + ")?"
+    return pattern
+
+
+# is_negated, read backwards from the term: a Thai negation right before it, or up to two
+# words and then a negation word or a word ending in "n't", all in the same clause (a negation
+# doesn't reach across "not anxious, just tired"). Words are runs of \w characters and apostrophes.
+_GAP = r"[^\w'" + re.escape(CLAUSE_BREAKS) + "]"
+NEGATION_BEFORE = re.compile(
+    _alternation(word[::-1] for word in NEGATION_TH) + "|" + _GAP + r"*(?:[\w']+" + _GAP + "+){0,2}"
+    r"(?:(?:" + _alternation(word[::-1] for word in NEGATION_WORDS_EN) + r")(?![\w'])|t'n[\w']*)"
+)
+
+# A whole negation word, to find the ones inside a scanned term ("no one"); "n't" and the Thai
+# negations (they all start with ไม่) are found with str.find
+_NEGATION_WORD = re.compile(r"(?<![a-z0-9_])(?:" + _alternation(NEGATION_WORDS_EN) + r")(?![a-z0-9_])")
+
+
+def _ends_of(text: str, needle: str) -> list[int]:
+    ends = []
+    i = text.find(needle)
+    while i != -1:
+        ends.append(i + len(needle))
+        i = text.find(needle, i + 1)
+    return ends
+
+
+# Every character that can't continue an ASCII word becomes a space, so the ASCII scan can look for
+# " term" (a literal first character the regex engine skips ahead to) instead of a character class
+_NON_WORD = re.compile(r"[^a-z0-9_]")
+# A bytes table: bytes.translate has none of str.translate's per-call setup
+_SEPARATORS = bytes(ord(" ") if _NON_WORD.match(chr(c)) else c for c in range(256))
+
+
+def _spaced(text: str) -> str:
+    # Same length as the text, so positions carry over; the leading space lets a term match at position 0
+    if text.isascii():
+        return " " + text.encode("ascii").translate(_SEPARATORS).decode("ascii")
+    return " " + _NON_WORD.sub(" ", text)
+
+
+def _match_starts(pieces: list[str]) -> list[int]:
+    # A split alternates the text before a match and the matched term. Match i starts after the
+    # pieces before it and the i + 1 spaces the matches consumed, less the leading pad.
+    return list(map(add, list(accumulate(map(len, pieces)))[0:-1:2], count()))
+
+
+def _negated(text: str, starts: list[int], terms: list[str], keywords, cues: list[int]) -> set[int]:
+    """
+    Indexes of the matches (`terms` at the sorted `starts`) that are negated keywords. Only
+    matches within NEGATION_WINDOW after a negation cue can be, and each is checked once.
+    """
+    # is_negated without a slice per check: match the reversed text between the same bounds
+    reversed_text = text[::-1]
+    checked = {}
+    for cue in cues:
+        i = bisect_left(starts, cue)
+        while i < len(starts) and starts[i] - cue <= NEGATION_WINDOW:
+            if i not in checked and terms[i] in keywords:
+                end = len(text) - starts[i]
+                checked[i] = NEGATION_BEFORE.match(reversed_text, end, end + NEGATION_WINDOW) is not None
+            i += 1
+    return {i for i, negated in checked.items() if negated}
+
+
+class Match(NamedTuple):
+    start: int
+    end: int
+    keyword: str
+    payload: object
+
+
+class KeywordMatcher:
+    """
+    Keywords map to payloads. The ASCII and the Thai keywords are each compiled into
+    one prefix-factored regex, so a message is scanned once by the C regex engine no
+    matter how many keywords there are.
+
+    ASCII keywords match at the start of a word and also cover longer forms of it
+    ("stress" matches "stressful", "panic" matches "panicking") but not a keyword
+    inside another word ("sad" doesn't fire inside "crusade"). Thai is written
+    without spaces, so Thai keywords match anywhere.
+
+    The English negation words ride along in the ASCII regex (they are never reported),
+    so count_unnegated gets the negation cues from the same scan and only computes
+    match positions when the message has a negation at all.
+    """
+
+    def __init__(self, keywords: dict):
+        self._payloads = dict(keywords)
+        # Scanned term -> keyword. ASCII keywords are scanned in the same spaced form as the text
+        # ("can't sleep" -> "can t sleep"); Thai keywords as they are.
+        self._keywords = {(_spaced(k)[1:] if k.isascii() else k): k for k in keywords}
+        ascii_terms = {t for t in self._keywords if t.isascii()} | {w for w in NEGATION_WORDS_EN if "'" not in w}
+        thai_terms = [t for t in self._keywords if not t.isascii()]
+        # Where, within a scanned term, a negation word ends ("no one" -> 2). A longer form of one
+        # ("nothing") also counts, which only costs an extra is_negated check. "n't" is found separately.
+        self._cue_offsets = {}
+        for term in ascii_terms:
+            ends = [m.end() for m in _NEGATION_WORD.finditer(term)]
+            if ends:
+                self._cue_offsets[term] = ends[-1]
+        self._ascii = re.compile(" (" + _alternation(ascii_terms) + ")")
+        self._thai = re.compile(_alternation(thai_terms)) if thai_terms else None
+
+    def _scan(self, text: str) -> tuple[list[str], list[tuple[int, str]]]:
+        """
+        The split of the spaced text around the ASCII terms (keywords and negation words), and
+        (start, term) of the Thai matches.
+        """
+        pieces = self._ascii.split(_spaced(text))
+        thai = []
+        if self._thai is not None and not text.isascii():
+            thai = [(m.start(), m.group()) for m in self._thai.finditer(text)]
+        return pieces, thai
+
+    def find(self, text: str) -> list[tuple[int, str]]:
+        """
+        (start, keyword) for every non-overlapping match in `text` (lowercased), ASCII keywords first.
+        """
+        pieces, thai = self._scan(text)
+        found = zip(_match_starts(pieces), pieces[1::2])
+        return [(start, self._keywords[term]) for start, term in [*found, *thai] if term in self._keywords]
+
+    def count_unnegated(self, text: str) -> dict[str, int]:
+        """
+        How often each keyword matches in `text` (lowercased) without being negated (see is_negated).
+        Counting and finding the negation cues stay in C; only matches near a cue are looked at one by one.
+        """
+        pieces, thai = self._scan(text)
+        terms = pieces[1::2]
+        thai_terms = [term for _, term in thai]
+        counts = Counter(terms + thai_terms if thai else terms)
+        if "n't" in text or NEGATION_TH[0] in text or not self._cue_offsets.keys().isdisjoint(terms):
+            starts = _match_starts(pieces)
+            is_cue = list(map(self._cue_offsets.__contains__, terms))
+            cues = list(map(add, compress(starts, is_cue), map(self._cue_offsets.get, compress(terms, is_cue))))
+            cues = sorted(cues + _ends_of(text, "n't") + _ends_of(text, NEGATION_TH[0]))
+            for i in _negated(text, starts, terms, self._keywords, cues):
+                counts[terms[i]] -= 1
+            if thai:
+                for i in _negated(text, [start for start, _ in thai], thai_terms, self._keywords, cues):
+                    counts[thai_terms[i]] -= 1
+        return {self._keywords[term]: n for term, n in counts.items() if n and term in self._keywords}
+
+    def iter_matches(self, text: str):
+        """
+        Non-overlapping matches in `text` (lowercased), with positions.
+        """
+        for start, keyword in self.find(text):
+            yield Match(start, start + len(keyword), keyword, self._payloads[keyword])
+
+    def payload(self, keyword: str):
+        return self._payloads[keyword]
+
+    def __len__(self):
+        return len(self._payloads)
@@ -1,7 +1,15 @@
 import json
-from google.genai import types
-from app.config import genai_client
+import logging
+from functools import cache
+from app.config import SEVERITY_FAST_PATH
+from app.services.gemini import gemini
 from app.services.fallback_responses import get_keyword_fallback
+from app.services.json_stream import JsonStringFieldStream
+from app.services.metrics import track_call, FALLBACKS, error_cause
+from app.services.severity import classify_local
+from app.services.logging_setup import error_fields
+
+logger = logging.getLogger(__name__)
 
 SYSTEM_INSTRUCTION = """
 You are Mind-Nest, a warm, empathetic, and supportive mental wellness companion.
@@ -19,100 +27,292 @@ Guidelines:
 """
 
 
-def classify_severity(message: str) -> str:
+async def classify_severity(message: str) -> str:
     """
     Classifies the severity of the user's message.
+    Clear-cut messages are settled by the local classifier; the rest go to Gemini.
     """
+    decision = classify_local(message) if SEVERITY_FAST_PATH else None
+    if decision and decision.label:
+        logger.info("Severity classified", extra={"tier": "local", "label": decision.label, "confidence": decision.confidence, "reason": decision.reason})
+        return decision.label
+
     prompt = f"""Classify this message's mental health severity. Respond with ONLY one word.
 
-LOW: Mild stress, general questions, curiosity
-MODERATE: Anxiety, sadness, work stress, relationship issues
-HIGH: Severe distress, panic attacks, hopelessness, can't function
-CRISIS: Self-harm thoughts, suicidal ideation, immediate danger
+{SEVERITY_RUBRIC}
 
 Message: "{message}"
 
 Classification:"""
 
     try:
-        response = genai_client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=prompt,
-        )
+        with track_call("gemini", "classify_severity"):
+            response = await gemini.generate_content(
+                model="gemini-2.0-flash",
+                contents=prompt,
+            )
         severity = response.text.strip().upper()
-        if severity not in ["LOW", "MODERATE", "HIGH", "CRISIS"]:
-            return "MODERATE"
+        if severity not in SEVERITY_LEVELS:
+            severity = "MODERATE"
+        if decision:
+            logger.info("Severity classified", extra={"tier": "llm", "label": severity, "local_guess": decision.guess, "local_confidence": decision.confidence})
         return severity
     except Exception as e:
-        print(f"Error classifying severity: {e}")
+        logger.error("Error classifying severity", extra=error_fields(e))
+        FALLBACKS.labels("severity", error_cause(e)).inc()
+        # The local guess never goes below MODERATE here: we only got this far because it wasn't sure
+        if decision and decision.guess == "HIGH":
+            return "HIGH"
         return "MODERATE"
 
 
-def generate_response(message: str, context: str, severity: str, crisis_info: list, language: str = 'en') -> dict:
-    """
-    Generates a supportive response using Gemini, returning a structured dict.
-    """
-    
-    language_instruction = ""
+SEVERITY_LEVELS = ["LOW", "MODERATE", "HIGH", "CRISIS"]
+
+SEVERITY_RUBRIC = """LOW: Mild stress, general questions, curiosity
+MODERATE: Anxiety, sadness, work stress, relationship issues
+HIGH: Severe distress, panic attacks, hopelessness, can't function
+CRISIS: Self-harm thoughts, suicidal ideation, immediate danger"""
+
+MODERATE_INSTRUCTION = "The user is feeling moderate distress. Suggest the provided techniques as helpful tools. Be empathetic and supportive."
+DISTRESS_INSTRUCTION = "The user is in distress. Be extremely gentle, validating, and prioritize safety. Your response should be purely empathetic and supportive. IMPORTANT: Do NOT list any phone numbers or resource names in your text. The user will see them in the cards below. Just gently urge them to use the resources provided below."
+CRISIS_QUOTES_INSTRUCTION = "Generate 3 short, uplifting, and appropriate quotes for this situation to help the user feel a bit better. Include them in the 'quotes' array of the JSON response."
+TECHNIQUES_INSTRUCTION = "IMPORTANT: In your 'text' response, mention at most 2 techniques from the context. Briefly explain why they help, but do NOT list steps. Refer the user to the cards below for more details."
+
+# Structured output: Gemini returns JSON matching these schemas, so no code fences to strip.
+# Built on first use: google.genai.types is slow to import and not needed until the first call.
+@cache
+def response_schema():
+    from google.genai import types
+
+    return types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "text": types.Schema(type=types.Type.STRING),
+            "quotes": types.Schema(type=types.Type.ARRAY, items=types.Schema(type=types.Type.STRING)),
+        },
+        required=["text", "quotes"],
+        property_ordering=["text", "quotes"],
+    )
+
+
+@cache
+def turn_schema():
+    from google.genai import types
+
+    return types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "severity": types.Schema(type=types.Type.STRING, enum=SEVERITY_LEVELS),
+            "text": types.Schema(type=types.Type.STRING),
+            "quotes": types.Schema(type=types.Type.ARRAY, items=types.Schema(type=types.Type.STRING)),
+        },
+        required=["severity", "text", "quotes"],
+        # Severity first, so the model commits to a label before writing the response
+        property_ordering=["severity", "text", "quotes"],
+    )
+
+
+def _json_config(schema):
+    from google.genai import types
+
+    return types.GenerateContentConfig(
+        system_instruction=SYSTEM_INSTRUCTION,
+        response_mime_type="application/json",
+        response_schema=schema,
+    )
+
+
+def _language_instruction(language: str) -> str:
     if language == 'th':
-        language_instruction = "IMPORTANT: Please respond in Thai language (ภาษาไทย)."
-    else:
-        language_instruction = "Please respond in English."
+        return "IMPORTANT: Please respond in Thai language (ภาษาไทย)."
+    return "Please respond in English."
+
+
+def _history_part(history: str) -> list[str]:
+    if not history:
+        return []
+    return [f"Conversation So Far (context only; reply to the latest message):\n{history}"]
 
+
+def build_response_prompt(message: str, context: str, severity: str, language: str = 'en', history: str = "") -> str:
+    """
+    Builds the generation prompt, including the severity-specific instructions.
+    `history` is the session's conversation memory (see app/services/memory.py).
+    """
     prompt_parts = [
+        *_history_part(history),
         f"User Message: {message}",
         f"Detected Severity: {severity}",
         f"Relevant Techniques Context:\n{context}",
-        language_instruction,
-        "IMPORTANT: You must return your response in valid JSON format: {\"text\": \"Your response text...\", \"quotes\": [\"Quote 1\", \"Quote 2\", \"Quote 3\"]}. If no quotes are needed, return an empty list for quotes.",
-        "IMPORTANT: In your 'text' response, mention at most 2 techniques from the context. Briefly explain why they help, but do NOT list steps. Refer the user to the cards below for more details."
+        _language_instruction(language),
+        "Return your response as JSON with a 'text' field and a 'quotes' list. If no quotes are needed, return an empty list for quotes.",
+        TECHNIQUES_INSTRUCTION,
     ]
-    
+
     if severity == "MODERATE":
-        prompt_parts.append("IMPORTANT: The user is feeling moderate distress. Suggest the provided techniques as helpful tools. Be empathetic and supportive.")
+        prompt_parts.append(f"IMPORTANT: {MODERATE_INSTRUCTION}")
 
     elif severity in ["HIGH", "CRISIS"]:
-        prompt_parts.append("CRITICAL: The user is in distress. Be extremely gentle, validating, and prioritize safety. Your response should be purely empathetic and supportive. IMPORTANT: Do NOT list any phone numbers or resource names in your text. The user will see them in the cards below. Just gently urge them to use the resources provided below.")
-        
+        prompt_parts.append(f"CRITICAL: {DISTRESS_INSTRUCTION}")
+
         if severity == "CRISIS":
-             prompt_parts.append("ALSO: Generate 3 short, uplifting, and appropriate quotes for this situation to help the user feel a bit better. Include them in the 'quotes' array of the JSON response.")
+            prompt_parts.append(f"ALSO: {CRISIS_QUOTES_INSTRUCTION}")
+
+    return "\n\n".join(prompt_parts)
 
-    full_prompt = "\n\n".join(prompt_parts)
+
+def build_turn_prompt(message: str, context: str, language: str = 'en', history: str = "") -> str:
+    """
+    Builds the single-call prompt: classify the message, then respond following
+    the instructions for the severity that was chosen.
+    """
+    prompt_parts = [
+        *_history_part(history),
+        f"User Message: {message}",
+        f"Relevant Techniques Context:\n{context}",
+        f"First classify the message's mental health severity as one of:\n{SEVERITY_RUBRIC}",
+        "Then write your response, following only the instructions for the severity you chose.",
+        f"If MODERATE: {MODERATE_INSTRUCTION}",
+        f"If HIGH or CRISIS: {DISTRESS_INSTRUCTION}",
+        f"If CRISIS, also: {CRISIS_QUOTES_INSTRUCTION} Otherwise return an empty list for quotes.",
+        _language_instruction(language),
+        TECHNIQUES_INSTRUCTION,
+    ]
+    return "\n\n".join(prompt_parts)
+
+
+def fallback_response(message: str, severity: str, language: str = 'en') -> dict:
+    """
+    The response used when the Gemini call fails.
+    """
+    fallback_quotes = []
     
-    try:
-        response = genai_client.models.generate_content(
-            model="gemini-2.0-flash",
-            contents=full_prompt,
-            config=types.GenerateContentConfig(
-                system_instruction=SYSTEM_INSTRUCTION,
-            ),
-        )
-        # Clean up potential markdown code blocks
-        text_response = response.text.strip()
-        if text_response.startswith("```json"):
-            text_response = text_response[7:]
-        if text_response.endswith("```"):
-            text_response = text_response[:-3]
+    # HIGH/CRISIS always gets the safety-first response
+    if severity in ["HIGH", "CRISIS"]:
+        fallback_text = "I hear how much pain you're in right now. Please, reach out to the support numbers below. You don't have to go through this alone."
+        fallback_quotes = [
+            "You are stronger than you know.",
+            "This too shall pass.",
+            "You are not alone."
+        ]
+    else:
+        # Keyword-based contextual fallback with randomized responses
+        fallback_text = get_keyword_fallback(message, language)
         
-        return json.loads(text_response)
+    return {
+        "text": fallback_text,
+        "quotes": fallback_quotes
+    }
+
+
+async def generate_response(message: str, context: str, severity: str, crisis_info: list, language: str = 'en',
+                            history: str = "") -> dict:
+    """
+    Generates a supportive response using Gemini, returning a structured dict.
+    """
+    full_prompt = build_response_prompt(message, context, severity, language, history)
+    
+    try:
+        with track_call("gemini", "generate_response"):
+            response = await gemini.generate_content(
+                model="gemini-2.0-flash",
+                contents=full_prompt,
+                config=_json_config(response_schema()),
+            )
+        return json.loads(response.text)
     except Exception as e:
-        print(f"Error generating response: {e}")
-        
-        fallback_quotes = []
-        
-        # HIGH/CRISIS always gets the safety-first response
-        if severity in ["HIGH", "CRISIS"]:
-            fallback_text = "I hear how much pain you're in right now. Please, reach out to the support numbers below. You don't have to go through this alone."
-            fallback_quotes = [
-                "You are stronger than you know.",
-                "This too shall pass.",
-                "You are not alone."
-            ]
-        else:
-            # Keyword-based contextual fallback with randomized responses
-            fallback_text = get_keyword_fallback(message, language)
-            
-        return {
-            "text": fallback_text,
-            "quotes": fallback_quotes
-        }
\ No newline at end of file
+        logger.error("Error generating response", extra=error_fields(e))
+        FALLBACKS.labels("response", error_cause(e)).inc()
+        return fallback_response(message, severity, language)
+
+
+async def generate_response_stream(message: str, context: str, severity: str, crisis_info: list, language: str = 'en',
+                                   history: str = ""):
+    """
+    Streaming variant of generate_response. Yields ("text", delta) events as the
+    'text' field of the JSON answer is generated, then a single ("quotes", list) event.
+    """
+    full_prompt = build_response_prompt(message, context, severity, language, history)
+    text_stream = JsonStringFieldStream("text")
+
+    try:
+        with track_call("gemini", "generate_response_stream"):
+            stream = await gemini.generate_content_stream(
+                model="gemini-2.0-flash",
+                contents=full_prompt,
+                config=_json_config(response_schema()),
+            )
+            async for chunk in stream:
+                delta = text_stream.feed(chunk.text or "")
+                if delta:
+                    yield "text", delta
+
+        quotes = json.loads(text_stream.buffer).get("quotes", [])
+    except Exception as e:
+        logger.error("Error streaming response", extra=error_fields(e))
+        FALLBACKS.labels("response_stream", error_cause(e)).inc()
+        fallback = fallback_response(message, severity, language)
+        # Only fall back on the text if none of the model's answer reached the user
+        if not text_stream.value:
+            yield "text", fallback["text"]
+        quotes = fallback["quotes"]
+
+    yield "quotes", quotes
+
+
+async def classify_and_respond(message: str, context: str, language: str = 'en', history: str = "") -> dict:
+    """
+    Single-call mode: one structured-output Gemini call returns {"severity", "text", "quotes"}.
+    Messages the local classifier settles skip the classification part of the prompt.
+    """
+    decision = classify_local(message) if SEVERITY_FAST_PATH else None
+    if decision and decision.label:
+        logger.info("Severity classified", extra={"tier": "local", "label": decision.label, "confidence": decision.confidence, "reason": decision.reason})
+        response = await generate_response(message, context, decision.label, [], language, history)
+        return {"severity": decision.label, **response}
+
+    try:
+        with track_call("gemini", "classify_and_respond"):
+            response = await gemini.generate_content(
+                model="gemini-2.0-flash",
+                contents=build_turn_prompt(message, context, language, history),
+                config=_json_config(turn_schema()),
+            )
+        turn = json.loads(response.text)
+        if turn.get("severity") not in SEVERITY_LEVELS:
+            turn["severity"] = "MODERATE"
+        if decision:
+            logger.info("Severity classified", extra={"tier": "llm", "label": turn["severity"], "local_guess": decision.guess, "local_confidence": decision.confidence})
+        return {"severity": turn["severity"], "text": turn.get("text", ""), "quotes": turn.get("quotes", [])}
+    except Exception as e:
+        logger.error("Error generating response", extra=error_fields(e))
+        FALLBACKS.labels("turn", error_cause(e)).inc()
+        severity = "HIGH" if decision and decision.guess == "HIGH" else "MODERATE"
+        return {"severity": severity, **fallback_response(message, severity, language)}
+
+
+SUMMARY_INSTRUCTION = """You keep the running summary of a conversation between a user and Mind-Nest, a mental wellness companion.
+Update the summary with the new messages. Keep what matters for supporting the user later:
+their situation, feelings and how they changed, techniques suggested and how they responded, and any safety concerns.
+Leave out greetings and small talk. Write in the third person, in the language the user writes in."""
+
+
+async def summarize_conversation(previous_summary: str, transcript: str, max_words: int = 200) -> str | None:
+    """
+    Folds `transcript` (older messages, one per line) into the session summary.
+    Returns None if Gemini fails, so the caller keeps the previous summary.
+    """
+    prompt = "\n\n".join([
+        SUMMARY_INSTRUCTION,
+        f"Current summary:\n{previous_summary or '(none yet)'}",
+        f"New messages:\n{transcript}",
+        f"Updated summary (at most {max_words} words):",
+    ])
+    try:
+        with track_call("gemini", "summarize_conversation"):
+            response = await gemini.generate_content(model="gemini-2.0-flash", contents=prompt)
+        return (response.text or "").strip() or None
+    except Exception as e:
+        logger.error("Error summarizing conversation", extra=error_fields(e))
+        FALLBACKS.labels("summary", error_cause(e)).inc()
+        return None
@@ -0,0 +1,265 @@
+"""
+Structured, non-blocking logging for the app.
+
+Records from the "app" logger tree are filtered and queued in the request's
+thread (a dict build and a put_nowait), then formatted as JSON and written
+to stdout by a background QueueListener thread. Every record carries the
+request and session ids of the request that produced it.
+"""
+import contextvars
+import json
+import logging
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from urllib.parse import unquote_plus
+from prometheus_client import Counter
+from app.config import (
+    LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_QUEUE_SIZE, LOG_RATE_LIMIT_PER_SECOND,
+    LOG_DEBUG_SAMPLE_RATE, LOG_REDACT_CONTENT,
+)
+from app.services.metrics import error_cause
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+session_id_var = contextvars.ContextVar("session_id", default=None)
+
+# `extra` fields holding user content; their values are replaced by a length unless LOG_REDACT_CONTENT is off
+CONTENT_FIELDS = {"content", "prompt", "email", "answer", "response_text", "error"}
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+# Attributes every LogRecord has; anything else on a record came from `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "taskName", "request_id", "session_id", "suppressed",
+}
+
+LOGS_DROPPED = Counter("mindnest_log_records_dropped", "Log records not written, by reason.", ("reason",))
+
+
+def redact(value) -> str:
+    return f"[redacted {len(str(value))} chars]"
+
+
+def error_fields(error: BaseException) -> dict:
+    """
+    `extra` fields for a caught exception: its cause (as in the metrics), and its message
+    under "error", which is redacted like user content. Driver messages can carry user
+    data: a BulkWriteError includes the failing document, a DuplicateKeyError the key.
+    """
+    return {"cause": error_cause(error), "error": str(error)}
+
+
+def log_fields(record: logging.LogRecord) -> dict:
+    fields = {}
+    for key, value in vars(record).items():
+        if key in _RECORD_ATTRIBUTES or key.startswith("_"):
+            continue
+        fields[key] = redact(value) if LOG_REDACT_CONTENT and key in CONTENT_FIELDS and value else value
+    return fields
+
+
+class ContextFilter(logging.Filter):
+    """
+    Copies the correlation ids onto the record. Runs in the logging thread,
+    before the record is handed to the listener thread, which has no request context.
+    """
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        record.session_id = session_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps `debug_sample_rate` of DEBUG records, and at most `per_second` DEBUG and INFO
+    records per (logger, message template) each second. The next record let through for
+    a template reports how many were suppressed in between. Warnings and errors always
+    get through: they are the records an incident is investigated with.
+    """
+
+    def __init__(self, per_second: float = 10.0, debug_sample_rate: float = 1.0):
+        super().__init__()
+        self.per_second = per_second
+        self.debug_sample_rate = debug_sample_rate
+        self._windows = {}  # (logger, template) -> [window start, count in window, suppressed]
+
+    def filter(self, record):
+        if record.levelno <= logging.DEBUG and self.debug_sample_rate < 1.0:
+            if random.random() >= self.debug_sample_rate:
+                LOGS_DROPPED.labels("sampled").inc()
+                return False
+        if not self.per_second or record.levelno >= logging.WARNING:
+            return True
+
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None or now - window[0] >= 1.0:
+            suppressed = window[2] if window else 0
+            self._windows[key] = [now, 1, 0]
+            if suppressed:
+                record.suppressed = suppressed
+            return True
+        if window[1] < self.per_second:
+            window[1] += 1
+            return True
+        window[2] += 1
+        LOGS_DROPPED.labels("rate_limited").inc()
+        return False
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    A QueueHandler that drops (and counts) records when the queue is full instead of blocking.
+    Only the message text is resolved here; JSON formatting happens on the listener thread.
+    """
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(vars(record))
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOGS_DROPPED.labels("queue_full").inc()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key in ("request_id", "session_id", "suppressed"):
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        entry.update(log_fields(record))
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """
+    Human-readable lines for local development (LOG_FORMAT=text).
+    """
+
+    def format(self, record):
+        line = f"{self.formatTime(record)} {record.levelname:<7} {record.name} [{getattr(record, 'request_id', None) or '-'}] {record.getMessage()}"
+        fields = log_fields(record)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+def parse_levels(spec: str) -> dict:
+    """
+    "app.services.llm=DEBUG,app.database=WARNING" -> {"app.services.llm": "DEBUG", ...}
+    """
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+_listener = None
+_handler = None
+
+
+def setup_logging():
+    """
+    Attaches the queue handler to the "app" logger and starts the writer thread. Safe to call twice.
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return
+
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    _handler = NonBlockingQueueHandler(log_queue)
+    _handler.addFilter(ContextFilter())
+    _handler.addFilter(SamplingFilter(per_second=LOG_RATE_LIMIT_PER_SECOND, debug_sample_rate=LOG_DEBUG_SAMPLE_RATE))
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel(LOG_LEVEL)
+    app_logger.addHandler(_handler)
+    for name, level in parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """
+    Writes out whatever is still queued and stops the writer thread.
+    """
+    global _listener, _handler
+    if _listener is not None:
+        logging.getLogger("app").removeHandler(_handler)
+        _listener.stop()
+        _listener = _handler = None
+
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware that gives each request a correlation id (the client's X-Request-ID
+    if it sent a sane one) and echoes it back. The session id comes from the
+    `session_id` query parameter or an X-Session-ID header; the chat endpoints
+    replace it with the one in the request body.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1")
+        if not REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex
+        session_id = headers.get(b"x-session-id", b"").decode("latin-1") or _query_param(scope, b"session_id")
+
+        request_token = request_id_var.set(request_id)
+        session_token = session_id_var.set(session_id[:64] if session_id else None)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*message.get("headers", []), (b"x-request-id", request_id.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(request_token)
+            session_id_var.reset(session_token)
+
+
+def _query_param(scope, name: bytes) -> str | None:
+    for pair in scope.get("query_string", b"").split(b"&"):
+        key, _, value = pair.partition(b"=")
+        if key == name and value:
+            return unquote_plus(value.decode("latin-1"))
+    return None
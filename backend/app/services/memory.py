@@ -0,0 +1,180 @@
+"""
+Bounded conversation memory.
+
+Each (user, session_id) has a rolling summary stored next to its chats. The
+prompt carries that summary plus the session's most recent turns, cut to a
+fixed token budget, so input tokens stay bounded however long a session gets.
+
+After every turn is stored, a background task folds the messages that have dropped out of
+the recent window into the summary with one short Gemini call. The summary
+records the last chat it covers, so each update only reads and summarizes new
+messages.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from bson import ObjectId
+from app.config import MEMORY_RECENT_TURNS, MEMORY_TOKEN_BUDGET, MEMORY_SUMMARY_MAX_TOKENS, MEMORY_SUMMARIZE_AFTER_TURNS
+from app.repositories import chats, summaries
+from app.services.llm import summarize_conversation
+from app.services.metrics import ERRORS, error_cause
+from app.services.tokens import estimate_tokens, truncate_to_tokens
+from app.services.logging_setup import error_fields
+
+logger = logging.getLogger(__name__)
+
+# Keyset position before any chat: summaries start from here
+SESSION_START = (datetime.fromtimestamp(0, timezone.utc), ObjectId("0" * 24))
+SPEAKERS = {"user": "User", "model": "Mind-Nest"}
+# Upper bound on messages folded by one update, so a long backlog is summarized over several turns
+MAX_FOLD_MESSAGES = 40
+
+
+def format_message(doc: dict) -> str:
+    return f"{SPEAKERS.get(doc['role'], doc['role'])}: {doc['message']}"
+
+
+class ConversationMemory:
+    """
+    Reads the prompt memory of a session and keeps its summary up to date.
+    """
+
+    def __init__(self, recent_turns: int = 4, token_budget: int = 1000, summary_max_tokens: int = 300,
+                 summarize_after_turns: int = 2):
+        self.recent_messages = recent_turns * 2
+        self.token_budget = token_budget
+        self.summary_max_tokens = summary_max_tokens
+        self.fold_batch = summarize_after_turns * 2
+        self._updates = {}  # (user, session_id) -> running update task
+        self.counters = {
+            "reads": 0,
+            "messages_trimmed": 0,
+            "updates": 0,
+            "messages_folded": 0,
+            "update_failures": 0,
+            "lost_races": 0,
+        }
+
+    def render(self, summary: str, messages: list[dict]) -> str:
+        """
+        The memory block for the prompt: the summary, then as many of the most recent
+        messages as fit in the rest of the budget (oldest first).
+        """
+        budget = self.token_budget
+        parts = []
+        if summary:
+            summary = truncate_to_tokens(summary, min(self.summary_max_tokens, budget))
+            budget -= estimate_tokens(summary)
+            parts.append(f"Summary of earlier conversation: {summary}")
+
+        lines = []
+        for doc in reversed(messages):
+            line = format_message(doc)
+            cost = estimate_tokens(line)
+            if cost > budget:
+                # A long message still gets its beginning in, if there's room for a useful part
+                if budget >= 50:
+                    lines.append(truncate_to_tokens(line, budget))
+                self.counters["messages_trimmed"] += len(messages) - len(lines)
+                break
+            lines.append(line)
+            budget -= cost
+        if lines:
+            parts.append("Recent messages:\n" + "\n".join(reversed(lines)))
+        return "\n\n".join(parts)
+
+    async def context(self, user_id: ObjectId, session_id: str) -> str:
+        """
+        The prompt memory for a session: one summary read and one indexed read of its last messages.
+        """
+        self.counters["reads"] += 1
+        summary_doc, recent = await asyncio.gather(
+            summaries.find_summary(user_id, session_id),
+            chats.find_history_page(user_id, session_id=session_id, limit=self.recent_messages),
+        )
+        summary = summary_doc["summary"] if summary_doc else ""
+        if summary_doc:
+            # Messages the summary already covers (possible right after a long backlog was folded)
+            until = (summary_doc["until_timestamp"], summary_doc["until_id"])
+            recent = [doc for doc in recent if (doc["timestamp"], doc["_id"]) > until]
+        return self.render(summary, recent)
+
+    def schedule_update(self, user_id: ObjectId, session_id: str):
+        """
+        Folds older messages into the session summary in the background. At most one
+        update per session runs at a time; a turn that arrives meanwhile is picked up
+        by the next update.
+        """
+        key = (user_id, session_id)
+        if key in self._updates:
+            return
+        task = asyncio.create_task(self._update(user_id, session_id))
+        self._updates[key] = task
+        task.add_done_callback(lambda _: self._updates.pop(key, None))
+
+    async def _update(self, user_id: ObjectId, session_id: str) -> bool:
+        try:
+            return await self.update(user_id, session_id)
+        except Exception as e:
+            self.counters["update_failures"] += 1
+            ERRORS.labels("memory", error_cause(e)).inc()
+            logger.error("Error updating conversation summary", extra=error_fields(e))
+            return False
+
+    async def update(self, user_id: ObjectId, session_id: str) -> bool:
+        """
+        Folds messages that have left the recent window into the summary, once at least
+        a batch of them is waiting. Returns True if the summary was updated.
+        """
+        summary_doc = await summaries.find_summary(user_id, session_id)
+        position = (summary_doc["until_timestamp"], summary_doc["until_id"]) if summary_doc else SESSION_START
+        limit = MAX_FOLD_MESSAGES + self.recent_messages
+        pending = await chats.find_history_page(user_id, session_id=session_id, after=position, limit=limit)
+
+        # A full page means there are more messages after it, so the whole fold batch is outside the window
+        foldable = pending[:MAX_FOLD_MESSAGES] if len(pending) == limit else pending[:-self.recent_messages or None]
+        if len(foldable) < self.fold_batch:
+            return False
+
+        previous = summary_doc["summary"] if summary_doc else ""
+        transcript = "\n".join(format_message(doc) for doc in foldable)
+        summary = await summarize_conversation(previous, transcript, max_words=int(self.summary_max_tokens * 0.75))
+        if summary is None:
+            self.counters["update_failures"] += 1
+            return False
+
+        last = foldable[-1]
+        saved = await summaries.save_summary(
+            user_id,
+            session_id,
+            truncate_to_tokens(summary, self.summary_max_tokens),
+            until=(last["timestamp"], last["_id"]),
+            turns_summarized=(summary_doc["turns_summarized"] if summary_doc else 0) + len(foldable) // 2,
+            expected_until_id=summary_doc["until_id"] if summary_doc else None,
+        )
+        if not saved:
+            self.counters["lost_races"] += 1
+            return False
+        self.counters["updates"] += 1
+        self.counters["messages_folded"] += len(foldable)
+        return True
+
+    async def stop(self):
+        """
+        Cancels running updates (on shutdown); they are redone after the session's next turn.
+        """
+        tasks = list(self._updates.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {**self.counters, "updates_running": len(self._updates)}
+
+
+conversation_memory = ConversationMemory(
+    recent_turns=MEMORY_RECENT_TURNS,
+    token_budget=MEMORY_TOKEN_BUDGET,
+    summary_max_tokens=MEMORY_SUMMARY_MAX_TOKENS,
+    summarize_after_turns=MEMORY_SUMMARIZE_AFTER_TURNS,
+)
@@ -0,0 +1,141 @@
+"""
+Prometheus metrics (prometheus_client), exposed on /metrics. Recording a sample
+is cheap enough to run on every stage and outbound call.
+
+Each worker process keeps its own registry; Prometheus scrapes them per
+instance and aggregates with sum().
+"""
+import asyncio
+import json
+import time
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, CONTENT_TYPE_LATEST, disable_created_metrics, generate_latest
+
+# Only the counter and histogram series themselves; the *_created timestamps would double the series count
+disable_created_metrics()
+
+# Seconds; covers a local cache hit up to a slow Gemini generation
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    The /metrics body and its content type.
+    """
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+REQUEST_DURATION = Histogram(
+    "mindnest_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status"),
+    buckets=DEFAULT_BUCKETS,
+)
+STAGE_DURATION = Histogram(
+    "mindnest_pipeline_stage_duration_seconds", "Duration of each request pipeline stage.", ("pipeline", "stage"),
+    buckets=DEFAULT_BUCKETS,
+)
+OUTBOUND_DURATION = Histogram(
+    "mindnest_outbound_call_duration_seconds", "Duration of calls to Gemini, Supabase and MongoDB.",
+    ("service", "operation", "outcome"), buckets=DEFAULT_BUCKETS,
+)
+FALLBACKS = Counter(
+    "mindnest_fallbacks", "Results served from a fallback path instead of the primary one.", ("component", "cause"),
+)
+ERRORS = Counter(
+    "mindnest_errors", "Errors by the component that caught them and their cause.", ("component", "cause"),
+)
+POOL_IN_FLIGHT = Gauge("mindnest_http_pool_in_flight", "Requests holding a slot of an outbound HTTP pool.", ("service",))
+POOL_WAITING = Gauge("mindnest_http_pool_waiting", "Requests waiting for a slot of an outbound HTTP pool.", ("service",))
+POOL_WAIT = Histogram(
+    "mindnest_http_pool_wait_seconds", "Time spent waiting for a slot of an outbound HTTP pool.", ("service",),
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+POOL_CONNECTIONS = Gauge(
+    "mindnest_http_pool_connections", "Open connections of an outbound HTTP pool, by state.", ("service", "state"),
+)
+
+
+def error_cause(error: BaseException) -> str:
+    """
+    A low-cardinality label for an exception: an upstream status class, or the exception type.
+    """
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)):
+        return "timeout"
+    code = getattr(error, "code", None)
+    if not isinstance(code, int):
+        code = getattr(error, "status_code", None)
+    if code == 429:
+        return "rate_limited"
+    if isinstance(code, int) and 400 <= code < 600:
+        return f"http_{code // 100}xx"
+    if isinstance(error, json.JSONDecodeError):
+        return "invalid_json"
+    return type(error).__name__
+
+
+class track_call:
+    """
+    Times an outbound call: `with track_call("gemini", "classify_severity"): ...`
+    The outcome label is "ok", "error" or "cancelled" (including a consumer abandoning a stream).
+    """
+    __slots__ = ("service", "operation", "start")
+
+    def __init__(self, service: str, operation: str):
+        self.service = service
+        self.operation = operation
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            outcome = "ok"
+        elif issubclass(exc_type, (asyncio.CancelledError, GeneratorExit)):
+            outcome = "cancelled"
+        else:
+            outcome = "error"
+        OUTBOUND_DURATION.labels(self.service, self.operation, outcome).observe(time.perf_counter() - self.start)
+        return False
+
+
+def format_server_timing(timings: dict) -> str:
+    """
+    Server-Timing header value for {stage: milliseconds}.
+    """
+    return ", ".join(f"{name};dur={ms}" for name, ms in timings.items())
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that records every request in REQUEST_DURATION and adds an
+    `app;dur=<ms>` Server-Timing entry (time until the response headers were ready).
+    Routes are labelled by their path template, so ids in URLs don't add series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", f"app;dur={elapsed_ms:.2f}".encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            route = scope.get("route")
+            REQUEST_DURATION.labels(scope["method"], getattr(route, "path", "unmatched"), str(status)).observe(
+                time.perf_counter() - start
+            )
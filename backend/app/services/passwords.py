@@ -0,0 +1,106 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from app.config import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_QUEUE
+
+
+class PasswordHasherBusy(Exception):
+    """
+    Raised when too many hash/verify jobs are already waiting for the worker pool.
+    """
+
+
+def _hash(password: str, rounds: int) -> str:
+    # Returns bytes, need to decode to utf-8 string for storage
+    salt = bcrypt.gensalt(rounds=rounds)
+    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+
+
+def _verify(password: str, hashed: str) -> bool:
+    # hashed_password from DB is string, needs to be bytes
+    try:
+        return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+    except ValueError:
+        # Not a bcrypt hash (e.g. a legacy plain-text value)
+        return False
+
+
+def hash_rounds(hashed: str) -> int | None:
+    """
+    Reads the work factor from a "$2b$12$..." bcrypt hash.
+    """
+    parts = hashed.split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt off the event loop on a dedicated thread pool. bcrypt releases the GIL
+    while hashing, so threads give real parallelism without process start-up costs.
+    At most `workers` jobs run at once and at most `max_queue` more may wait;
+    anything beyond that is rejected with PasswordHasherBusy instead of piling up.
+    """
+
+    def __init__(self, rounds: int = 12, workers: int = 4, max_queue: int = 32):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        # Only touched from the event loop thread, so a plain counter is enough
+        self._pending = 0
+        self.counters = {"hashed": 0, "verified": 0, "rehashed": 0, "rejected": 0}
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.workers + self.max_queue:
+            self.counters["rejected"] += 1
+            raise PasswordHasherBusy()
+
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+
+    async def hash(self, password: str) -> str:
+        self.counters["hashed"] += 1
+        return await self._run(_hash, password, self.rounds)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        self.counters["verified"] += 1
+        return await self._run(_verify, password, hashed)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """
+        True when a stored hash was made with a different work factor than the configured one.
+        """
+        return hash_rounds(hashed) != self.rounds
+
+    async def rehash_if_needed(self, password: str, hashed: str) -> str | None:
+        """
+        Returns a new hash of an already-verified password if the stored one is outdated, else None.
+        """
+        if not self.needs_rehash(hashed):
+            return None
+        new_hash = await self.hash(password)
+        self.counters["rehashed"] += 1
+        return new_hash
+
+    def stats(self) -> dict:
+        return {
+            **self.counters,
+            "rounds": self.rounds,
+            "workers": self.workers,
+            "in_flight": min(self._pending, self.workers),
+            "queued": max(self._pending - self.workers, 0),
+            "max_queue": self.max_queue,
+        }
+
+
+password_hasher = PasswordHasher(
+    rounds=BCRYPT_ROUNDS,
+    workers=PASSWORD_HASH_WORKERS or min(4, os.cpu_count() or 1),
+    max_queue=PASSWORD_HASH_MAX_QUEUE,
+)
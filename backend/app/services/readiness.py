@@ -0,0 +1,114 @@
+"""
+Startup warmup and readiness.
+
+The worker starts answering /healthz as soon as it is up. Warmup steps (opening
+the MongoDB pool, building the SDK clients, loading the technique index and the
+crisis resources) then run concurrently in the background, and /readyz only
+reports ready once every step has succeeded. Failed steps are retried, so an
+instance whose dependencies are briefly unavailable becomes ready on its own.
+"""
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class _Step:
+    __slots__ = ("name", "warm", "after", "done", "ms", "attempts", "error")
+
+    def __init__(self, name: str, warm, after: tuple):
+        self.name = name
+        self.warm = warm
+        self.after = after
+        self.reset()
+
+    def reset(self):
+        self.done = asyncio.Event()
+        self.ms = None
+        self.attempts = 0
+        self.error = None
+
+
+class Readiness:
+    """
+    Runs named async warmup steps concurrently. A step can wait `after` other steps,
+    e.g. loading the technique index after the Supabase client is built.
+    """
+
+    def __init__(self, retry_interval: float = 5.0, step_timeout: float = 30.0):
+        self.retry_interval = retry_interval
+        self.step_timeout = step_timeout
+        self.app_import_ms = None
+        self._steps = {}
+        self._task = None
+        self._started_at = None
+        self._ready_ms = None
+
+    def add(self, name: str, warm, after: tuple = ()):
+        """
+        Registers `warm`, an async callable with no arguments.
+        """
+        self._steps[name] = _Step(name, warm, tuple(after))
+
+    @property
+    def is_ready(self) -> bool:
+        return self._ready_ms is not None
+
+    def start(self):
+        if self._task is None:
+            for step in self._steps.values():
+                step.reset()
+            self._started_at = time.perf_counter()
+            self._ready_ms = None
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def wait(self):
+        """
+        Blocks until every step has succeeded (starting the warmup if needed).
+        """
+        self.start()
+        await asyncio.shield(self._task)
+
+    async def _run(self):
+        await asyncio.gather(*(self._run_step(step) for step in self._steps.values()))
+        self._ready_ms = round((time.perf_counter() - self._started_at) * 1000, 1)
+        logger.info("Ready", extra={"startup": self.stats()})
+
+    async def _run_step(self, step: _Step):
+        for name in step.after:
+            await self._steps[name].done.wait()
+        while True:
+            step.attempts += 1
+            start = time.perf_counter()
+            try:
+                await asyncio.wait_for(step.warm(), self.step_timeout)
+            except Exception as e:
+                step.error = str(e) or type(e).__name__
+                logger.warning("Warmup step %s failed, retrying in %ss: %s", step.name, self.retry_interval, step.error)
+                await asyncio.sleep(self.retry_interval)
+                continue
+            step.ms = round((time.perf_counter() - start) * 1000, 1)
+            step.error = None
+            step.done.set()
+            return
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.is_ready,
+            "app_import_ms": self.app_import_ms,
+            "ready_ms": self._ready_ms,
+            "steps": {
+                step.name: {"ok": step.done.is_set(), "ms": step.ms, "attempts": step.attempts, "error": step.error}
+                for step in self._steps.values()
+            },
+        }
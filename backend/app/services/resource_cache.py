@@ -0,0 +1,126 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from pathlib import Path
+from app.clients import get_supabase
+from app.config import RESOURCE_CACHE_TTL_SECONDS, RESOURCE_SNAPSHOT_PATH
+from app.services.logging_setup import error_fields
+
+logger = logging.getLogger(__name__)
+
+
+def is_24_7(resource: dict) -> bool:
+    hours = (resource.get('available_hours') or '').lower()
+    return '24/7' in hours or '24 ชั่วโมง' in hours
+
+
+class _LanguageResources:
+    """
+    One language's crisis resources, already in 24/7-first order, plus the ETag of that list.
+    """
+
+    def __init__(self, resources: list[dict]):
+        # sorted() is stable, so resources keep their table order within each group
+        self.resources = sorted(resources, key=lambda r: not is_24_7(r))
+        body = json.dumps(self.resources, sort_keys=True, ensure_ascii=False, default=str)
+        self.etag = '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+class ResourceCache:
+    """
+    Keeps the crisis_resources table in memory, grouped by language, and refreshes it
+    in the background once the TTL has passed. When Supabase can't be reached and
+    nothing has been loaded yet, the bundled resources_dump.json snapshot is served.
+    """
+
+    def __init__(self, ttl: float = 600.0, snapshot_path: str = None, retry_interval: float = 30.0):
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        # While serving the snapshot, Supabase is retried more often than the normal TTL
+        self.retry_interval = retry_interval
+        self._by_language = {}
+        self._loaded_at = 0.0
+        self._source = None
+        self._lock = asyncio.Lock()
+        self._refresh_task = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._source is not None
+
+    def load_rows(self, rows: list[dict], source: str):
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(row.get("language", "en"), []).append(row)
+        self._by_language = {language: _LanguageResources(resources) for language, resources in grouped.items()}
+        self._loaded_at = time.monotonic()
+        self._source = source
+
+    def load_snapshot(self) -> bool:
+        if not self.snapshot_path or not Path(self.snapshot_path).exists():
+            return False
+        with open(self.snapshot_path, "r", encoding="utf-8") as f:
+            self.load_rows(json.load(f), source="snapshot")
+        logger.warning("Serving crisis resources from snapshot", extra={"path": self.snapshot_path})
+        return True
+
+    async def _refresh_locked(self):
+        try:
+            response = await get_supabase().table("crisis_resources").select("*").execute()
+            self.load_rows(response.data or [], source="supabase")
+        except Exception as e:
+            logger.error("Error refreshing crisis resources", extra=error_fields(e))
+            if self.is_loaded:
+                # Keep serving what we have, and try again after the retry interval
+                self._loaded_at = time.monotonic() - self._max_age() + self.retry_interval
+            elif not self.load_snapshot():
+                raise
+
+    async def refresh(self):
+        async with self._lock:
+            await self._refresh_locked()
+
+    def _max_age(self) -> float:
+        return self.ttl if self._source == "supabase" else self.retry_interval
+
+    async def ensure_fresh(self):
+        """
+        Blocks only for the very first load; afterwards stale data is refreshed in the background.
+        """
+        if not self.is_loaded:
+            async with self._lock:
+                if not self.is_loaded:
+                    await self._refresh_locked()
+            return
+
+        if time.monotonic() - self._loaded_at > self._max_age():
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self._background_refresh())
+
+    async def _background_refresh(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.error("Error refreshing crisis resources", extra=error_fields(e))
+
+    async def get(self, language: str = 'en') -> tuple[list[dict], str]:
+        """
+        Returns (resources, etag) for a language, 24/7 resources first.
+        """
+        await self.ensure_fresh()
+        entry = self._by_language.get(language)
+        if entry is None:
+            entry = _LanguageResources([])
+        return list(entry.resources), entry.etag
+
+    def stats(self) -> dict:
+        return {
+            "source": self._source,
+            "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self.is_loaded else None,
+            "resources": {language: len(entry.resources) for language, entry in self._by_language.items()},
+        }
+
+
+resource_cache = ResourceCache(ttl=RESOURCE_CACHE_TTL_SECONDS, snapshot_path=RESOURCE_SNAPSHOT_PATH)
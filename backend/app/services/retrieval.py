@@ -1,6 +1,29 @@
-from app.config import supabase
+import logging
+from app.clients import get_supabase
+from app.config import RETRIEVAL_BACKEND
+from app.services.technique_index import technique_index
+from app.services.resource_cache import resource_cache
+from app.services.metrics import track_call, FALLBACKS, error_cause
+from app.services.logging_setup import error_fields
 
-def search_techniques(query_embedding: list[float], language: str = 'en', match_threshold: float = 0.35, match_count: int = 4):
+logger = logging.getLogger(__name__)
+
+async def search_techniques(query_embedding: list[float], language: str = 'en', match_threshold: float = 0.35, match_count: int = 4, backend: str = None):
+    """
+    Searches for relevant techniques, using the in-process technique index by default
+    or the match_techniques RPC function when the backend is "rpc".
+    """
+    if (backend or RETRIEVAL_BACKEND) == "local":
+        try:
+            await technique_index.ensure_fresh()
+            return technique_index.search(query_embedding, language=language, match_threshold=match_threshold, match_count=match_count)
+        except Exception as e:
+            logger.error("Error searching technique index, falling back to RPC", extra=error_fields(e))
+            FALLBACKS.labels("technique_index", error_cause(e)).inc()
+
+    return await search_techniques_rpc(query_embedding, language=language, match_threshold=match_threshold, match_count=match_count)
+
+async def search_techniques_rpc(query_embedding: list[float], language: str = 'en', match_threshold: float = 0.35, match_count: int = 4):
     """
     Searches for relevant techniques using the match_techniques RPC function.
     """
@@ -8,36 +31,30 @@ def search_techniques(query_embedding: list[float], language: str = 'en', match_
         # Convert embedding list to string format for Supabase
         embedding_str = f"[{','.join(str(x) for x in query_embedding)}]"
         
-        response = supabase.rpc(
-            "match_techniques",
-            {
-                "query_embedding": embedding_str,
-                "match_threshold": match_threshold,
-                "match_count": match_count,
-                "filter_language": language
-            }
-        ).execute()
+        with track_call("supabase", "match_techniques"):
+            response = await get_supabase().rpc(
+                "match_techniques",
+                {
+                    "query_embedding": embedding_str,
+                    "match_threshold": match_threshold,
+                    "match_count": match_count,
+                    "filter_language": language
+                }
+            ).execute()
         return response.data
     except Exception as e:
-        print(f"Error searching techniques: {e}")
+        logger.error("Error searching techniques", extra=error_fields(e))
+        FALLBACKS.labels("retrieval", error_cause(e)).inc()
         return []
 
-def get_crisis_resources(language: str = 'en'):
+async def get_crisis_resources(language: str = 'en'):
     """
-    Fetches crisis resources filtered by language, prioritizing 24/7 availability.
+    Returns crisis resources for a language, 24/7 resources first, from the resource cache.
     """
     try:
-        response = supabase.table("crisis_resources").select("*").eq("language", language).execute()
-        resources = response.data
-        
-        # Sort: 24/7 resources first
-        def is_24_7(res):
-            hours = res.get('available_hours', '').lower()
-            return '24/7' in hours or '24 ชั่วโมง' in hours
-
-        resources.sort(key=lambda x: not is_24_7(x)) # False (is_24_7) comes before True, so we negate
-        
+        resources, _ = await resource_cache.get(language)
         return resources
     except Exception as e:
-        print(f"Error fetching crisis resources: {e}")
-        return []
\ No newline at end of file
+        logger.error("Error fetching crisis resources", extra=error_fields(e))
+        FALLBACKS.labels("crisis_resources", error_cause(e)).inc()
+        return []
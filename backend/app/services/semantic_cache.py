@@ -0,0 +1,153 @@
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+import numpy as np
+from prometheus_client import Counter, Histogram
+from app.config import SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_TTL_SECONDS, SEMANTIC_CACHE_MAX_ENTRIES
+
+# Upper edges of the best-similarity histogram; the last bucket is everything above 0.98
+SIMILARITY_BUCKETS = (0.5, 0.7, 0.8, 0.85, 0.9, 0.95, 0.98)
+
+LOOKUPS = Counter("mindnest_semantic_cache_lookups", "Semantic cache lookups, by result.", ("result",))
+BEST_SIMILARITY = Histogram(
+    "mindnest_semantic_cache_best_similarity", "Best cosine similarity found by a semantic cache lookup.",
+    buckets=SIMILARITY_BUCKETS,
+)
+
+
+class SemanticHit(NamedTuple):
+    techniques: list
+    similarity: float
+
+
+class _LanguageSlots:
+    """
+    Fixed-size, preallocated (max_entries, dim) matrix of normalized query embeddings.
+    Lookups are one matmul; the LRU order lives in an OrderedDict of slot numbers.
+    """
+
+    def __init__(self, max_entries: int, dimensions: int):
+        self.vectors = np.zeros((max_entries, dimensions), dtype=np.float32)
+        self.valid = np.zeros(max_entries, dtype=bool)
+        self.entries = [None] * max_entries     # (techniques, stored_at) per slot
+        self.lru = OrderedDict()                # slot -> None, least recently used first
+
+    def free_slot(self) -> int | None:
+        free = np.flatnonzero(~self.valid)
+        return int(free[0]) if free.size else None
+
+
+class SemanticCache:
+    """
+    Reuses the technique list of a recent message when a new message's embedding is
+    within `threshold` cosine similarity of it, in the same language. Entries expire
+    after `ttl` seconds and the least recently used entry is evicted once a language
+    holds `max_entries`.
+
+    Only the retrieval is reused; severity is always classified for the new message,
+    so a near-duplicate never inherits another message's tier.
+    """
+
+    def __init__(self, threshold: float = 0.92, ttl: float = 600.0, max_entries: int = 2000, dimensions: int = 768):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.dimensions = dimensions
+        self._languages = {}
+        self.similarity_histogram = [0] * (len(SIMILARITY_BUCKETS) + 1)
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "stores": 0,
+        }
+
+    def _normalize(self, embedding) -> np.ndarray | None:
+        vector = np.asarray(embedding, dtype=np.float32)
+        if vector.shape != (self.dimensions,):
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _record_similarity(self, similarity: float):
+        bucket = int(np.searchsorted(SIMILARITY_BUCKETS, similarity, side="right"))
+        self.similarity_histogram[bucket] += 1
+        BEST_SIMILARITY.observe(similarity)
+
+    def _miss(self):
+        self.counters["misses"] += 1
+        LOOKUPS.labels("miss").inc()
+
+    def lookup(self, embedding, language: str = 'en') -> SemanticHit | None:
+        slots = self._languages.get(language)
+        query = self._normalize(embedding) if embedding else None
+        if slots is None or query is None or not slots.valid.any():
+            self._miss()
+            return None
+
+        similarities = slots.vectors @ query
+        similarities[~slots.valid] = -1.0
+        best = int(np.argmax(similarities))
+        similarity = float(similarities[best])
+        self._record_similarity(similarity)
+        if similarity < self.threshold:
+            self._miss()
+            return None
+
+        techniques, stored_at = slots.entries[best]
+        if time.monotonic() - stored_at > self.ttl:
+            self._drop(slots, best)
+            self.counters["expired"] += 1
+            self._miss()
+            return None
+
+        slots.lru.move_to_end(best)
+        self.counters["hits"] += 1
+        LOOKUPS.labels("hit").inc()
+        return SemanticHit(techniques, round(similarity, 4))
+
+    def store(self, embedding, techniques: list, language: str = 'en'):
+        vector = self._normalize(embedding) if embedding else None
+        if vector is None:
+            return
+        slots = self._languages.get(language)
+        if slots is None:
+            slots = self._languages[language] = _LanguageSlots(self.max_entries, self.dimensions)
+
+        slot = slots.free_slot()
+        if slot is None:
+            slot, _ = slots.lru.popitem(last=False)
+            self.counters["evictions"] += 1
+        slots.vectors[slot] = vector
+        slots.valid[slot] = True
+        slots.entries[slot] = (techniques, time.monotonic())
+        slots.lru[slot] = None
+        slots.lru.move_to_end(slot)
+        self.counters["stores"] += 1
+
+    def _drop(self, slots: _LanguageSlots, slot: int):
+        slots.valid[slot] = False
+        slots.entries[slot] = None
+        slots.lru.pop(slot, None)
+
+    def clear(self):
+        self._languages = {}
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        labels = [f"<{edge}" for edge in SIMILARITY_BUCKETS] + [f">={SIMILARITY_BUCKETS[-1]}"]
+        return {
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else None,
+            "entries": {language: int(slots.valid.sum()) for language, slots in self._languages.items()},
+            "threshold": self.threshold,
+            "best_similarity": dict(zip(labels, self.similarity_histogram)),
+        }
+
+
+semantic_cache = SemanticCache(
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    ttl=SEMANTIC_CACHE_TTL_SECONDS,
+    max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+)
@@ -0,0 +1,182 @@
+"""
+Local fast path for severity classification.
+Compiled EN/TH lexicons plus a small hand-weighted logistic score decide the
+unambiguous cases (explicit crisis language, clearly benign messages) without
+a Gemini round-trip; everything else is left to the LLM classifier.
+"""
+import math
+import re
+from typing import NamedTuple
+from app.config import SEVERITY_LOW_CONFIDENCE
+from app.services.fallback_responses import KEYWORD_RESPONSES_EN, KEYWORD_RESPONSES_TH
+from app.services.keyword_matcher import is_negated, normalize_message
+
+# ---------------------------------------------------------------------------
+# LEXICONS
+# ---------------------------------------------------------------------------
+
+CRISIS_TERMS_EN = [
+    r"suicid(?:e|al)", r"kill(?:ing)? myself", r"end(?:ing)? (?:my life|it all)", r"take my (?:own )?life",
+    r"want(?:ed)? to die", r"wanna die", r"wish i (?:was|were) dead", r"better off dead",
+    r"don'?t want to (?:live|be alive|exist|wake up)", r"no reason to live",
+    r"self[- ]?harm(?:ing)?", r"hurt(?:ing)? myself", r"cut(?:ting)? myself", r"overdos(?:e|ing)",
+    r"hang(?:ing)? myself", r"jump(?:ing)? off (?:a|the|this) (?:bridge|building|roof|cliff)",
+    r"(?:disappear|be gone) forever", r"not (?:be )?(?:here|around) anymore",
+]
+CRISIS_TERMS_TH = [
+    "ฆ่าตัวตาย", "อยากตาย", "ไม่อยากมีชีวิต", "ไม่อยากอยู่แล้ว", "ไม่อยากตื่น", "จบชีวิต",
+    "ทำร้ายตัวเอง", "กรีดข้อมือ", "กรีดแขน", "กินยาเกินขนาด", "ตายไปซะ", "อยากหายไปจากโลก",
+]
+
+HIGH_TERMS_EN = [
+    r"panic attacks?", r"hopeless(?:ness)?", r"can'?t breathe", r"can'?t function", r"can'?t go on",
+    r"can'?t take (?:it|this) anymore", r"falling apart", r"breaking down", r"worthless",
+    r"nothing matters", r"no way out", r"give up on everything", r"can'?t stop crying",
+    r"can'?t live like this",
+]
+HIGH_TERMS_TH = ["สิ้นหวัง", "หายใจไม่ออก", "แพนิค", "ไม่ไหวแล้ว", "ทนไม่ไหว", "ไร้ค่า", "หมดหวัง", "พังทลาย"]
+
+# Common distress words that the fallback keyword banks don't cover
+MODERATE_TERMS_EN = [r"upset", r"struggling", r"terrible", r"awful", r"bad", r"hurt(?:s|ing)?", r"hate (?:my|myself|this)"]
+MODERATE_TERMS_TH = ["แย่", "ไม่สบายใจ", "เหงา", "นอนไม่หลับ", "เจ็บปวด", "เกลียดตัวเอง"]
+
+# Greetings, thanks and general questions
+LOW_TERMS_EN = [
+    r"hi", r"hello", r"hey", r"thanks?", r"thank you", r"good (?:morning|afternoon|evening|night)",
+    r"how are you", r"what is", r"what are", r"how do i", r"tips?", r"ok(?:ay)?", r"bye",
+]
+LOW_TERMS_TH = ["สวัสดี", "หวัดดี", "ขอบคุณ", "คืออะไร", "ทำยังไง", "แนะนำ", "บาย"]
+
+# A message is only settled LOW when it is nothing but greetings, thanks and acknowledgements
+# (plus filler): "hi, what are painless ways to die" must still reach the LLM
+ACK_TERMS_EN = [
+    r"hi", r"hello", r"hey", r"thanks?", r"thank you", r"good (?:morning|afternoon|evening|night)",
+    r"how are you", r"ok(?:ay)?", r"bye",
+]
+ACK_TERMS_TH = ["สวัสดี", "หวัดดี", "ขอบคุณ", "บาย"]
+ACK_FILLERS_EN = {"so", "much", "very", "a", "lot", "there", "you", "all", "again", "too", "and", "oh", "yes", "yeah"}
+ACK_FILLERS_TH = ["ครับ", "คับ", "ค่ะ", "คะ", "จ้า", "จ้ะ", "นะ", "มากๆ", "มาก"]
+
+# The fallback keyword banks: positive categories read as LOW, the rest as MODERATE distress
+POSITIVE_CATEGORIES = {"happiness", "confidence"}
+
+
+def _bank_terms(bank: dict, positive: bool) -> list[str]:
+    terms = []
+    for name, category in bank.items():
+        if (name in POSITIVE_CATEGORIES) == positive:
+            terms.extend(category["keywords"])
+    return sorted(set(terms), key=len, reverse=True)
+
+
+def _compile_en(patterns: list[str]) -> re.Pattern:
+    return re.compile(r"(?<!\w)(?:" + "|".join(patterns) + r")(?!\w)", re.IGNORECASE)
+
+
+def _compile_th(terms: list[str]) -> re.Pattern:
+    # Thai is written without spaces between words, so there are no word boundaries to anchor on
+    return re.compile("|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True)))
+
+
+LEXICONS = {
+    "crisis": (_compile_en(CRISIS_TERMS_EN), _compile_th(CRISIS_TERMS_TH)),
+    "high": (_compile_en(HIGH_TERMS_EN), _compile_th(HIGH_TERMS_TH)),
+    "moderate": (
+        _compile_en(MODERATE_TERMS_EN + [re.escape(t) for t in _bank_terms(KEYWORD_RESPONSES_EN, positive=False)]),
+        _compile_th(MODERATE_TERMS_TH + _bank_terms(KEYWORD_RESPONSES_TH, positive=False)),
+    ),
+    "low": (
+        _compile_en(LOW_TERMS_EN + [re.escape(t) for t in _bank_terms(KEYWORD_RESPONSES_EN, positive=True)]),
+        _compile_th(LOW_TERMS_TH + _bank_terms(KEYWORD_RESPONSES_TH, positive=True)),
+    ),
+}
+ACK_PATTERNS = (_compile_en(ACK_TERMS_EN), _compile_th(ACK_TERMS_TH + ACK_FILLERS_TH))
+WORD = re.compile(r"\w+")
+
+# ---------------------------------------------------------------------------
+# SCORED MODEL
+# ---------------------------------------------------------------------------
+
+# Logistic model of P(distress); hand-set weights, checked with scripts/eval_severity.py
+WEIGHTS = {
+    "bias": -0.5,
+    "high": 3.0,
+    "moderate": 1.6,
+    "low": -2.0,
+    "negated_distress": 0.8,
+    "length": 0.6,    # per log(1 + words): longer messages tend to carry more distress
+    "question": -0.3,
+}
+
+
+class SeverityDecision(NamedTuple):
+    label: str | None       # Settled label, or None when the LLM should decide
+    confidence: float
+    guess: str              # Best local label, used if the LLM can't be reached
+    reason: str
+
+
+def match_lexicons(message: str) -> dict:
+    """
+    Returns {tier: (matched terms, negated terms)} for every lexicon tier.
+    """
+    text = normalize_message(message)
+    matches = {}
+    for tier, patterns in LEXICONS.items():
+        hits, negated = [], []
+        for pattern in patterns:
+            for m in pattern.finditer(text):
+                (negated if is_negated(text, m.start()) else hits).append(m.group(0))
+        matches[tier] = (hits, negated)
+    return matches
+
+
+def only_acknowledgements(message: str) -> bool:
+    """
+    True when every word of the message is a greeting, thanks, acknowledgement or filler.
+    """
+    text = normalize_message(message)
+    for pattern in ACK_PATTERNS:
+        text = pattern.sub(" ", text)
+    words = WORD.findall(text)
+    return len(words) < len(WORD.findall(normalize_message(message))) and all(w in ACK_FILLERS_EN for w in words)
+
+
+def classify_local(message: str, low_confidence: float = SEVERITY_LOW_CONFIDENCE) -> SeverityDecision:
+    matches = match_lexicons(message)
+    crisis, negated_crisis = matches["crisis"]
+    high, negated_high = matches["high"]
+    moderate, negated_moderate = matches["moderate"]
+    low, negated_low = matches["low"]
+
+    if crisis:
+        return SeverityDecision("CRISIS", 0.99, "CRISIS", f"crisis lexicon: {crisis[0]}")
+
+    # "not good" reads as distress, "not sad" as ambiguous
+    moderate_score = len(moderate) + len(negated_low)
+    # Thai has no spaces between words, so also estimate length from characters
+    words = max(len(message.split()), len(message) // 6)
+    z = (
+        WEIGHTS["bias"]
+        + WEIGHTS["high"] * len(high)
+        + WEIGHTS["moderate"] * moderate_score
+        + WEIGHTS["low"] * len(low)
+        + WEIGHTS["negated_distress"] * (len(negated_high) + len(negated_moderate))
+        + WEIGHTS["length"] * math.log1p(words)
+        + WEIGHTS["question"] * message.strip().endswith("?")
+    )
+    p_distress = 1 / (1 + math.exp(-z))
+    guess = "HIGH" if high else "MODERATE" if (moderate_score or negated_crisis) else "LOW"
+
+    if negated_crisis:
+        return SeverityDecision(None, 0.5, "MODERATE", f"negated crisis language: {negated_crisis[0]}")
+
+    low_conf = round(1 - p_distress, 3)
+    if (
+        not (high or moderate_score or negated_high or negated_moderate)
+        and low_conf >= low_confidence
+        and only_acknowledgements(message)
+    ):
+        return SeverityDecision("LOW", low_conf, "LOW", "greeting or acknowledgement only")
+
+    return SeverityDecision(None, round(max(p_distress, 1 - p_distress), 3), guess, "uncertain")
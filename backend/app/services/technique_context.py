@@ -0,0 +1,121 @@
+"""
+Compact technique context for generation prompts.
+
+Each technique is rendered once into a short prompt snippet (title, the gist of
+its description, when to use it) and cached by id. The step-by-step
+instructions are left out, because the model is told not to repeat them and the
+cards show them anyway. Snippets are rendered when the technique index loads or
+refreshes, and on first sight for rows that come back from the match_techniques RPC.
+
+Per request, the assembler drops duplicates, orders the techniques by similarity
+and adds snippets until the token budget is spent.
+"""
+import re
+from collections import OrderedDict
+from app.config import TECHNIQUE_CONTEXT_TOKEN_BUDGET, TECHNIQUE_SNIPPET_MAX_TOKENS
+from app.services.tokens import estimate_tokens, truncate_to_tokens
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+WHITESPACE = re.compile(r"\s+")
+
+
+def _text(value) -> str:
+    if isinstance(value, list):
+        value = "; ".join(str(item) for item in value)
+    return WHITESPACE.sub(" ", str(value or "")).strip()
+
+
+def render_snippet(row: dict, max_tokens: int = 90) -> str:
+    """
+    "<title>: <first two sentences of content> Use when: <when_to_use>", cut to max_tokens.
+    """
+    content = " ".join(SENTENCE_END.split(_text(row.get("content")))[:2])
+    snippet = f"{_text(row.get('title'))}: {content}"
+    when_to_use = _text(row.get("when_to_use"))
+    if when_to_use:
+        snippet += f" Use when: {when_to_use}"
+    return truncate_to_tokens(snippet, max_tokens)
+
+
+def _fingerprint(row: dict):
+    # updated_at changes whenever a row is edited; RPC rows may not carry it
+    return row.get("updated_at") or hash((row.get("title"), _text(row.get("content")), _text(row.get("when_to_use"))))
+
+
+class TechniqueContext:
+    """
+    Caches rendered snippets by technique id (re-rendered when the row changes)
+    and assembles the per-request technique context within `token_budget`.
+    """
+
+    def __init__(self, token_budget: int = 400, snippet_max_tokens: int = 90, max_entries: int = 5000):
+        self.token_budget = token_budget
+        self.snippet_max_tokens = snippet_max_tokens
+        self.max_entries = max_entries
+        self._snippets = OrderedDict()  # id -> (fingerprint, snippet, tokens)
+        self.counters = {"rendered": 0, "hits": 0, "deduplicated": 0, "over_budget": 0}
+
+    def snippet(self, row: dict) -> tuple[str, int]:
+        """
+        Returns (snippet, estimated tokens) for a technique row.
+        """
+        technique_id = row.get("id")
+        fingerprint = _fingerprint(row)
+        entry = self._snippets.get(technique_id) if technique_id is not None else None
+        if entry is not None and entry[0] == fingerprint:
+            self.counters["hits"] += 1
+            self._snippets.move_to_end(technique_id)
+            return entry[1], entry[2]
+
+        snippet = render_snippet(row, self.snippet_max_tokens)
+        tokens = estimate_tokens(snippet)
+        self.counters["rendered"] += 1
+        if technique_id is not None:
+            self._snippets[technique_id] = (fingerprint, snippet, tokens)
+            self._snippets.move_to_end(technique_id)
+            if len(self._snippets) > self.max_entries:
+                self._snippets.popitem(last=False)
+        return snippet, tokens
+
+    def warm(self, rows):
+        """
+        Renders snippets ahead of time (called when the technique index loads).
+        """
+        for row in rows:
+            self.snippet(row)
+
+    def assemble(self, techniques: list[dict], token_budget: int = None) -> str:
+        """
+        The technique context for a prompt: one snippet per distinct technique, most
+        similar first, skipping any that don't fit in what is left of the budget.
+        """
+        remaining = self.token_budget if token_budget is None else token_budget
+        # Rows without a similarity (e.g. from an older cache entry) keep their order
+        ranked = sorted(techniques, key=lambda row: row.get("similarity") or 0.0, reverse=True)
+        seen = set()
+        lines = []
+        for row in ranked:
+            keys = {("title", _text(row.get("title")).lower())}
+            if row.get("id") is not None:
+                keys.add(("id", row["id"]))
+            if keys & seen:
+                self.counters["deduplicated"] += 1
+                continue
+            seen |= keys
+
+            snippet, tokens = self.snippet(row)
+            if tokens > remaining:
+                self.counters["over_budget"] += 1
+                continue
+            lines.append(f"- {snippet}")
+            remaining -= tokens + 1
+        return "\n".join(lines)
+
+    def stats(self) -> dict:
+        return {**self.counters, "cached": len(self._snippets), "token_budget": self.token_budget}
+
+
+technique_context = TechniqueContext(
+    token_budget=TECHNIQUE_CONTEXT_TOKEN_BUDGET,
+    snippet_max_tokens=TECHNIQUE_SNIPPET_MAX_TOKENS,
+)
@@ -0,0 +1,284 @@
+import asyncio
+import json
+import logging
+import time
+import numpy as np
+from app.clients import get_supabase
+from app.config import TECHNIQUE_INDEX_REFRESH_SECONDS, TECHNIQUE_SNAPSHOT_DIR, TECHNIQUE_SNAPSHOT_CHECK_SECONDS
+from app.services import technique_snapshot
+from app.services.technique_context import technique_context
+from app.services.logging_setup import error_fields
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_DIM = 768
+# Rows scored per block when the matrix is stored narrower than float32 (float16 snapshots)
+SEARCH_BLOCK_ROWS = 4096
+# The columns the match_techniques RPC returns (plus similarity). Search results carry only
+# these, so both backends hand the same rows to the prompt, the cards and the saved chat.
+MATCH_COLUMNS = ("id", "title", "category", "content", "instructions", "when_to_use")
+
+
+def _parse_embedding(value) -> np.ndarray | None:
+    """
+    pgvector columns come back from PostgREST as a string like "[0.1,0.2,...]".
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = json.loads(value)
+    vector = np.asarray(value, dtype=np.float32)
+    if vector.shape != (EMBEDDING_DIM,):
+        return None
+    return vector
+
+
+def _match_row(row: dict) -> dict:
+    return {column: row[column] for column in MATCH_COLUMNS if column in row}
+
+
+class _LanguagePartition:
+    """
+    The techniques of one language: rows projected to MATCH_COLUMNS plus a contiguous (n, 768)
+    float32 matrix of L2-normalized embeddings, in the same order.
+    """
+
+    def __init__(self, rows: list[dict], vectors: list[np.ndarray]):
+        self.rows = rows
+        if vectors:
+            matrix = np.ascontiguousarray(np.vstack(vectors), dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix /= norms
+        else:
+            matrix = np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        self.matrix = matrix
+
+    @classmethod
+    def from_matrix(cls, rows: list[dict], matrix: np.ndarray) -> "_LanguagePartition":
+        """
+        Wraps an already-normalized matrix (e.g. a memory-mapped snapshot) without copying it.
+        """
+        partition = cls.__new__(cls)
+        partition.rows = rows
+        partition.matrix = matrix
+        return partition
+
+    def search(self, query: np.ndarray, match_threshold: float, match_count: int) -> list[dict]:
+        if not self.rows or match_count <= 0:
+            return []
+
+        similarities = self._similarities(query)
+        candidates = np.flatnonzero(similarities > match_threshold)
+        if candidates.size == 0:
+            return []
+
+        if candidates.size > match_count:
+            top = np.argpartition(-similarities[candidates], match_count - 1)[:match_count]
+            candidates = candidates[top]
+        order = candidates[np.argsort(-similarities[candidates], kind="stable")]
+
+        return [{**self.rows[i], "similarity": float(similarities[i])} for i in order]
+
+    def _similarities(self, query: np.ndarray) -> np.ndarray:
+        """
+        Cosine similarity against every technique. A float32 matrix takes one matmul; a float16
+        one is widened a block at a time, so no full-size float32 copy is made per query.
+        """
+        if self.matrix.dtype == np.float32:
+            return self.matrix @ query
+
+        similarities = np.empty(len(self.matrix), dtype=np.float32)
+        for start in range(0, len(self.matrix), SEARCH_BLOCK_ROWS):
+            block = self.matrix[start:start + SEARCH_BLOCK_ROWS]
+            np.matmul(block.astype(np.float32), query, out=similarities[start:start + len(block)])
+        return similarities
+
+
+class TechniqueIndex:
+    """
+    In-process cosine-similarity index over the techniques table, partitioned by language.
+    Mirrors the match_techniques RPC: similarity > match_threshold, top match_count, best first.
+    """
+
+    def __init__(self, refresh_interval: float = 300.0, full_reload_every: int = 12,
+                 snapshot_dir: str | None = None, snapshot_check_interval: float = 5.0):
+        self.refresh_interval = refresh_interval
+        # When a snapshot directory is configured, the index is served from its memory-mapped
+        # files and swapped whenever CURRENT changes; Supabase is only used if there is no snapshot
+        self.snapshot_dir = snapshot_dir
+        self.snapshot_check_interval = snapshot_check_interval
+        self.snapshot_version = None
+        self._snapshot_checked_at = 0.0
+        # Incremental refreshes can't see deleted rows, so every Nth refresh reloads the whole table
+        self.full_reload_every = full_reload_every
+        self._refresh_count = 0
+        self._rows_by_id = {}
+        self._vectors_by_id = {}
+        self._partitions = {}
+        self._watermark = None
+        self._loaded_at = 0.0
+        self._lock = asyncio.Lock()
+        self._refresh_task = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded_at > 0
+
+    def __len__(self):
+        return sum(len(partition.rows) for partition in self._partitions.values())
+
+    def load_rows(self, rows: list[dict], replace: bool = True):
+        """
+        Loads technique rows (with an 'embedding' column) into the index.
+        With replace=False the rows are merged into the existing ones by id.
+        """
+        if replace:
+            self._rows_by_id = {}
+            self._vectors_by_id = {}
+            self._watermark = None
+
+        for row in rows:
+            vector = _parse_embedding(row.get("embedding"))
+            if vector is None:
+                continue
+            metadata = {k: v for k, v in row.items() if k != "embedding"}
+            self._rows_by_id[row["id"]] = metadata
+            self._vectors_by_id[row["id"]] = vector
+
+            updated_at = row.get("updated_at")
+            if updated_at and (self._watermark is None or updated_at > self._watermark):
+                self._watermark = updated_at
+
+        self._rebuild()
+        # Prompt snippets are rendered here, once per row version, rather than per request.
+        # They are warmed from the projected rows so the fingerprints match what search returns
+        technique_context.warm(_match_row(row) for row in rows)
+        self._loaded_at = time.monotonic()
+
+    def _rebuild(self):
+        grouped = {}
+        for technique_id, row in self._rows_by_id.items():
+            rows, vectors = grouped.setdefault(row.get("language", "en"), ([], []))
+            rows.append(_match_row(row))
+            vectors.append(self._vectors_by_id[technique_id])
+
+        # Swap in the new partitions in one assignment so searches never see a half-built index
+        self._partitions = {language: _LanguagePartition(rows, vectors) for language, (rows, vectors) in grouped.items()}
+
+    def search(self, query_embedding: list[float], language: str = 'en', match_threshold: float = 0.35, match_count: int = 4) -> list[dict]:
+        partition = self._partitions.get(language)
+        if partition is None:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        return partition.search(query / norm, match_threshold, match_count)
+
+    def partitions(self) -> dict:
+        """
+        Returns {language: (rows, normalized matrix)}, the input for technique_snapshot.write_snapshot.
+        """
+        return {language: (p.rows, p.matrix) for language, p in self._partitions.items()}
+
+    def load_snapshot(self) -> bool:
+        """
+        Maps the current snapshot version if it differs from the one being served.
+        Returns True when a new version was swapped in.
+        """
+        self._snapshot_checked_at = time.monotonic()
+        version = technique_snapshot.current_version(self.snapshot_dir)
+        if version is None or version == self.snapshot_version:
+            return False
+
+        # Older snapshots stored whole rows; they are projected like freshly loaded ones
+        partitions = {
+            language: ([_match_row(row) for row in rows], matrix)
+            for language, (rows, matrix) in technique_snapshot.read_snapshot(self.snapshot_dir, version).items()
+        }
+        # Swap in one assignment, like _rebuild; searches in flight keep the old mapping
+        self._partitions = {language: _LanguagePartition.from_matrix(rows, matrix) for language, (rows, matrix) in partitions.items()}
+        for rows, _ in partitions.values():
+            technique_context.warm(rows)
+        self._rows_by_id = {}
+        self._vectors_by_id = {}
+        self.snapshot_version = version
+        self._loaded_at = time.monotonic()
+        logger.info("Technique snapshot mapped", extra={"version": version, "rows": len(self)})
+        return True
+
+    def _serve_snapshot(self) -> bool:
+        """
+        True when searches are (still) served from a snapshot; re-checks CURRENT at most every snapshot_check_interval.
+        """
+        if not self.snapshot_dir:
+            return False
+        if time.monotonic() - self._snapshot_checked_at >= self.snapshot_check_interval or self.snapshot_version is None:
+            try:
+                self.load_snapshot()
+            except Exception as e:
+                logger.error("Error loading technique snapshot", extra=error_fields(e))
+        return self.snapshot_version is not None
+
+    def stats(self) -> dict:
+        return {
+            "source": "snapshot" if self.snapshot_version else "supabase" if self.is_loaded else None,
+            "snapshot_version": self.snapshot_version,
+            "rows": len(self),
+            "languages": {language: len(p.rows) for language, p in self._partitions.items()},
+        }
+
+    async def refresh(self):
+        """
+        Loads the whole table on first use, then only rows whose updated_at is past the watermark.
+        """
+        async with self._lock:
+            await self._refresh_locked()
+
+    async def _refresh_locked(self):
+        query = get_supabase().table("techniques").select("*")
+        incremental = (
+            self.is_loaded
+            and self._watermark is not None
+            and self._refresh_count % self.full_reload_every != 0
+        )
+        if incremental:
+            query = query.gt("updated_at", self._watermark)
+
+        response = await query.execute()
+        rows = response.data or []
+        self.load_rows(rows, replace=not incremental)
+        self._refresh_count += 1
+        logger.info("Technique index %s", "refreshed" if incremental else "loaded", extra={"rows": len(rows), "total": len(self)})
+
+    async def ensure_fresh(self):
+        """
+        Blocks only for the very first load; afterwards stale indexes are refreshed in the background.
+        """
+        if self._serve_snapshot():
+            return
+
+        if not self.is_loaded:
+            async with self._lock:
+                if not self.is_loaded:
+                    await self._refresh_locked()
+            return
+
+        if time.monotonic() - self._loaded_at > self.refresh_interval:
+            if self._refresh_task is None or self._refresh_task.done():
+                self._refresh_task = asyncio.create_task(self._background_refresh())
+
+    async def _background_refresh(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.error("Error refreshing technique index", extra=error_fields(e))
+
+
+technique_index = TechniqueIndex(
+    refresh_interval=TECHNIQUE_INDEX_REFRESH_SECONDS,
+    snapshot_dir=TECHNIQUE_SNAPSHOT_DIR,
+    snapshot_check_interval=TECHNIQUE_SNAPSHOT_CHECK_SECONDS,
+)
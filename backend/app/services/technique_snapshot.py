@@ -0,0 +1,84 @@
+"""
+Versioned on-disk snapshots of the technique index.
+
+    <dir>/CURRENT                  name of the live version, replaced atomically
+    <dir>/<version>/manifest.json  version, dtype, dimensions, row counts
+    <dir>/<version>/<lang>.npy     (n, 768) L2-normalized embedding matrix
+    <dir>/<version>/<lang>.json    row metadata, in matrix order
+
+Workers memory-map the .npy files read-only, so every process on the host
+shares one page-cache copy and loading takes milliseconds.
+"""
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+import numpy as np
+
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+SNAPSHOT_DTYPES = ("float32", "float16")
+
+
+def write_snapshot(partitions: dict, directory: str, dtype: str = "float32", keep: int = 3) -> str:
+    """
+    Writes {language: (rows, normalized matrix)} as a new version and makes it current.
+    Older versions beyond `keep` are removed (workers still mapping them keep working).
+    """
+    if dtype not in SNAPSHOT_DTYPES:
+        raise ValueError(f"Unsupported snapshot dtype: {dtype}")
+
+    os.makedirs(directory, exist_ok=True)
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    tmp_dir = os.path.join(directory, f".tmp-{version}")
+    os.makedirs(tmp_dir)
+
+    manifest = {"version": version, "dtype": dtype, "dimensions": None, "languages": {}}
+    for language, (rows, matrix) in partitions.items():
+        np.save(os.path.join(tmp_dir, f"{language}.npy"), np.ascontiguousarray(matrix, dtype=dtype))
+        with open(os.path.join(tmp_dir, f"{language}.json"), "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, default=str)
+        manifest["dimensions"] = int(matrix.shape[1])
+        manifest["languages"][language] = len(rows)
+    with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    # Readers only ever see complete versions: the directory appears in one rename,
+    # then CURRENT is swapped to point at it
+    os.rename(tmp_dir, os.path.join(directory, version))
+    current_tmp = os.path.join(directory, f".{CURRENT_FILE}.tmp")
+    with open(current_tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(current_tmp, os.path.join(directory, CURRENT_FILE))
+
+    versions = sorted(name for name in os.listdir(directory) if not name.startswith(".") and name != CURRENT_FILE)
+    for old in versions[:-keep]:
+        shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+    return version
+
+
+def current_version(directory: str) -> str | None:
+    try:
+        with open(os.path.join(directory, CURRENT_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def read_snapshot(directory: str, version: str) -> dict:
+    """
+    Opens one version and returns {language: (rows, read-only memory-mapped matrix)}.
+    """
+    version_dir = os.path.join(directory, version)
+    with open(os.path.join(version_dir, MANIFEST_FILE), encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    partitions = {}
+    for language, count in manifest["languages"].items():
+        matrix = np.load(os.path.join(version_dir, f"{language}.npy"), mmap_mode="r")
+        with open(os.path.join(version_dir, f"{language}.json"), encoding="utf-8") as f:
+            rows = json.load(f)
+        if len(rows) != count or matrix.shape[0] != count:
+            raise ValueError(f"Snapshot {version} is inconsistent for language '{language}'")
+        partitions[language] = (rows, matrix)
+    return partitions
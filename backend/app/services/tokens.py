@@ -0,0 +1,31 @@
+"""
+Cheap token estimates for prompt budgeting, without a tokenizer round trip.
+
+Gemini averages about 4 characters per token for English. Thai packs less text
+into a token, so non-ASCII characters are counted at about 2 per token. The
+character mix is read off the UTF-8 length (ASCII is 1 byte, Thai 3), which
+keeps the estimate a couple of C-level passes over the string.
+"""
+import math
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    chars = len(text)
+    # Every non-ASCII character in the range we care about is 2-3 bytes; count it as 3
+    non_ascii = min(chars, (len(text.encode("utf-8")) - chars) // 2)
+    return math.ceil((chars - non_ascii) / 4 + non_ascii / 2)
+
+
+def truncate_to_tokens(text: str, budget: int, marker: str = "…") -> str:
+    """
+    Cuts `text` down to roughly `budget` tokens, keeping the beginning.
+    """
+    tokens = estimate_tokens(text)
+    if tokens <= budget:
+        return text
+    if budget <= 0:
+        return ""
+    keep = max(1, int(len(text) * budget / tokens) - len(marker))
+    return text[:keep].rstrip() + marker
@@ -0,0 +1,78 @@
+import asyncio
+import time
+from collections import OrderedDict
+from app.config import USER_CACHE_TTL_SECONDS, USER_CACHE_MAX_ENTRIES
+from app.repositories import users
+from app.services.metrics import track_call
+
+# What routes need of a user: that they exist, their profile, and the version their tokens must carry
+PROFILE_PROJECTION = {"_id": 1, "username": 1, "email": 1, "token_version": 1}
+
+
+class UserCache:
+    """
+    Per-worker TTL cache of user profiles, so authenticated requests that need the
+    user record don't read it from MongoDB every time. Misses are not cached, and
+    concurrent misses for the same user share one read.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # user id -> (user, stored_at)
+        self._loading = {}             # user id -> future of the read in flight
+        self.counters = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    async def get(self, user_id: str, fresh: bool = False) -> dict | None:
+        """
+        The user, or None if there is none. `fresh` skips the cached entry and reads it again.
+        """
+        key = str(user_id)
+        if fresh:
+            self._entries.pop(key, None)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if time.monotonic() - entry[1] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return entry[0]
+            del self._entries[key]
+            self.counters["expired"] += 1
+
+        self.counters["misses"] += 1
+        loading = self._loading.get(key)
+        if loading is not None:
+            return await asyncio.shield(loading)
+
+        loading = self._loading[key] = asyncio.ensure_future(self._load(key))
+        try:
+            return await asyncio.shield(loading)
+        finally:
+            self._loading.pop(key, None)
+
+    async def _load(self, key: str) -> dict | None:
+        with track_call("mongo", "find_user"):
+            user = await users.find_user_by_id(key, PROFILE_PROJECTION)
+        if user is not None:
+            self._entries[key] = (user, time.monotonic())
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+        return user
+
+    def invalidate(self, user_id):
+        self._entries.pop(str(user_id), None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else None,
+            "entries": len(self._entries),
+        }
+
+
+user_cache = UserCache(ttl=USER_CACHE_TTL_SECONDS, max_entries=USER_CACHE_MAX_ENTRIES)
@@ -0,0 +1,67 @@
+"""Micro-benchmark for the keyword fallback matcher.
+
+Usage: python scripts/bench_fallback.py [cases.jsonl] [--repeat N]
+
+Times the compiled regex scorer against the old nested substring scan
+over the fallback corpus, and reports how often each picks the expected category.
+"""
+import json
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.fallback_responses import KEYWORD_RESPONSES_EN, KEYWORD_RESPONSES_TH, FALLBACK_MATCHER, best_category
+
+DEFAULT_CASES = Path(__file__).parent / "fallback_cases.jsonl"
+
+
+def load_cases(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def legacy_category(message, language='en'):
+    """The previous first-hit substring scan, kept here for comparison."""
+    msg = message.lower()
+    if language == 'th':
+        for name, category in KEYWORD_RESPONSES_TH.items():
+            if any(kw in msg for kw in category["keywords"]):
+                return name
+    for name, category in KEYWORD_RESPONSES_EN.items():
+        if any(kw in msg for kw in category["keywords"]):
+            return name
+    return None
+
+
+def main():
+    args = sys.argv[1:]
+    repeat = 200
+    if "--repeat" in args:
+        i = args.index("--repeat")
+        repeat = int(args[i + 1])
+        del args[i:i + 2]
+    cases = load_cases(args[0] if args else DEFAULT_CASES)
+    # Long messages show how each approach scales with message length; the old scan could stop at
+    # its first hit, so the one without keywords is its worst case
+    long_message = " ".join(c["message"] for c in cases if c["language"] == "en") * 4
+    no_keywords = "we went to the market on saturday and walked home along the river " * 60
+
+    print(f"Keywords compiled: {len(FALLBACK_MATCHER)}")
+    print(f"Cases: {len(cases)}, repeat: {repeat}\n")
+    print(f"{'':<14}{'us/message':>12}{'long msg us':>14}{'no-kw long us':>15}{'accuracy':>10}")
+    for name, fn in (("legacy", legacy_category), ("regex", best_category)):
+        # Best of 5 runs, so a noisy machine doesn't skew the comparison
+        seconds = min(timeit.repeat(lambda: [fn(c["message"], c["language"]) for c in cases], number=repeat, repeat=5))
+        per_message = seconds / (repeat * len(cases)) * 1e6
+        long_us, no_keywords_us = (
+            min(timeit.repeat(lambda: fn(message, "en"), number=repeat, repeat=5)) / repeat * 1e6
+            for message in (long_message, no_keywords)
+        )
+        correct = sum(fn(c["message"], c["language"]) == c["category"] for c in cases)
+        print(f"{name:<14}{per_message:>12.1f}{long_us:>14.1f}{no_keywords_us:>15.1f}{correct / len(cases):>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
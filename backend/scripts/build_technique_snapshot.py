@@ -0,0 +1,47 @@
+"""Build a memory-mappable snapshot of the technique index.
+
+Usage: python scripts/build_technique_snapshot.py [--dir PATH] [--dtype float32|float16] [--keep N]
+
+Reads the techniques table, normalizes the embeddings per language and writes a
+new snapshot version (see app/services/technique_snapshot.py). Workers started
+with TECHNIQUE_SNAPSHOT_DIR pointing at the same directory map it read-only and
+switch to new versions on their own.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.config import TECHNIQUE_SNAPSHOT_DIR
+from app.services.catalog import fetch_techniques
+from app.services.technique_index import TechniqueIndex
+from app.services.technique_snapshot import write_snapshot, SNAPSHOT_DTYPES
+
+DEFAULT_DIR = Path(__file__).parent.parent / "snapshots"
+
+
+async def main(args):
+    started = time.perf_counter()
+    print("Fetching all techniques from Supabase...")
+    rows = await fetch_techniques()
+
+    index = TechniqueIndex()
+    index.load_rows(rows)
+    if not len(index):
+        print("No techniques with embeddings found!")
+        sys.exit(1)
+
+    version = write_snapshot(index.partitions(), args.dir, dtype=args.dtype, keep=args.keep)
+    print(f"Snapshot {version} written to {args.dir}: {index.stats()['languages']} "
+          f"({args.dtype}, {time.perf_counter() - started:.1f}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a technique index snapshot")
+    parser.add_argument("--dir", default=TECHNIQUE_SNAPSHOT_DIR or str(DEFAULT_DIR))
+    parser.add_argument("--dtype", choices=SNAPSHOT_DTYPES, default="float32")
+    parser.add_argument("--keep", type=int, default=3, help="versions to keep on disk")
+    asyncio.run(main(parser.parse_args()))
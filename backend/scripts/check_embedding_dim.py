@@ -1,7 +1,9 @@
 """Check the dimensions of embeddings stored in Supabase."""
 import sys
 sys.path.insert(0, '.')
-from app.config import supabase
+from app.clients import get_sync_supabase
+
+supabase = get_sync_supabase()
 
 print("Checking stored embedding dimensions...")
 response = supabase.table("techniques").select("id, title, embedding").limit(1).execute()
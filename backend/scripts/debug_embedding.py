@@ -1,4 +1,5 @@
 
+import asyncio
 import sys
 import os
 
@@ -17,7 +18,7 @@ try:
     text = "Hello world"
     print(f"Testing embedding generation for: '{text}'")
     
-    embedding = generate_embedding(text)
+    embedding = asyncio.run(generate_embedding(text))
     
     if embedding:
         print(f"Success! Embedding length: {len(embedding)}")
@@ -0,0 +1,79 @@
+"""Evaluate the local severity fast path against a labeled corpus.
+
+Usage: python scripts/eval_severity.py [cases.jsonl] [--llm]
+
+Reports how many messages the local classifier settles, its accuracy on those,
+and any unsafe decisions (HIGH/CRISIS messages settled as LOW). With --llm the
+messages it defers are also sent through the full classify_severity.
+"""
+import asyncio
+import json
+import sys
+from collections import Counter
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.severity import classify_local
+
+DEFAULT_CASES = Path(__file__).parent / "severity_eval_cases.jsonl"
+LABELS = ["LOW", "MODERATE", "HIGH", "CRISIS"]
+
+
+def load_cases(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def evaluate(cases, use_llm):
+    if use_llm:
+        from app.services.llm import classify_severity
+
+    settled = correct = unsafe = 0
+    crisis_total = crisis_caught = 0
+    confusion = Counter()
+    llm_correct = llm_total = 0
+
+    for case in cases:
+        decision = classify_local(case["message"])
+        expected = case["label"]
+        if expected == "CRISIS":
+            crisis_total += 1
+            crisis_caught += decision.label == "CRISIS"
+
+        if decision.label:
+            settled += 1
+            correct += decision.label == expected
+            confusion[(expected, decision.label)] += 1
+            if decision.label == "LOW" and expected in ("HIGH", "CRISIS"):
+                unsafe += 1
+                print(f"  UNSAFE: {case['message']!r} settled LOW, labeled {expected}")
+            elif decision.label != expected:
+                print(f"  miss: {case['message']!r} settled {decision.label}, labeled {expected}")
+        elif use_llm:
+            label = await classify_severity(case["message"])
+            llm_total += 1
+            llm_correct += label == expected
+
+    total = len(cases)
+    print("=" * 60)
+    print(f"Cases:               {total}")
+    print(f"Settled locally:     {settled} ({settled / total:.0%})")
+    print(f"Local accuracy:      {correct / settled:.0%}" if settled else "Local accuracy:      n/a")
+    print(f"Crisis caught fast:  {crisis_caught}/{crisis_total}")
+    print(f"Unsafe LOW decisions: {unsafe}")
+    if use_llm and llm_total:
+        print(f"LLM accuracy (deferred): {llm_correct / llm_total:.0%} of {llm_total}")
+    print("Confusion (expected -> settled):")
+    for expected in LABELS:
+        row = "  ".join(f"{confusion[(expected, got)]:>3}" for got in LABELS)
+        print(f"  {expected:<9} {row}")
+    print("=" * 60)
+    return unsafe
+
+
+if __name__ == "__main__":
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    cases = load_cases(args[0] if args else DEFAULT_CASES)
+    unsafe = asyncio.run(evaluate(cases, use_llm="--llm" in sys.argv))
+    sys.exit(1 if unsafe else 0)
@@ -0,0 +1,349 @@
+"""Offline load test for /chat, /chat/history and /auth/login.
+
+Usage: python scripts/loadtest.py [--scenarios chat,history,login] [--requests N] [--concurrency N]
+                                  [--gemini-latency-ms MS] [--embed-latency-ms MS] [--rate-429 P]
+                                  [--supabase-latency-ms MS] [--mongo-latency-ms MS]
+                                  [--bcrypt-rounds N] [--baseline FILE] [--out FILE]
+
+Drives the FastAPI app in-process (no network, no credentials) with Gemini,
+Supabase and MongoDB replaced by the seeded fakes in scripts/loadtest_fakes.py.
+Each scenario runs on its own, after a short warm-up, and reports latency
+percentiles, requests per second, status codes and the /chat pipeline's
+per-stage timings as JSON. Pass a previous run's JSON as --baseline to get the
+percentage change of each headline number.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+SCRIPTS_DIR = Path(__file__).parent
+MESSAGE_FILES = (SCRIPTS_DIR / "severity_eval_cases.jsonl", SCRIPTS_DIR / "fallback_cases.jsonl")
+SCENARIOS = ("chat", "history", "login")
+PASSWORD = "load-test-password"
+HEADLINE = ("p50", "p95", "p99")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load test against local fakes")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated: chat, history, login")
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests before each scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="requests in flight at once")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--history-size", type=int, default=200, help="stored chats per user")
+    parser.add_argument("--techniques", type=int, default=100, help="techniques per language")
+    parser.add_argument("--gemini-latency-ms", type=float, default=400.0)
+    parser.add_argument("--embed-latency-ms", type=float, default=60.0)
+    parser.add_argument("--rate-429", type=float, default=0.0, help="fraction of Gemini calls that get a 429")
+    parser.add_argument("--supabase-latency-ms", type=float, default=20.0)
+    parser.add_argument("--mongo-latency-ms", type=float, default=2.0)
+    parser.add_argument("--jitter", type=float, default=0.3, help="latency spread, as a fraction of the mean")
+    parser.add_argument("--bcrypt-rounds", type=int, help="override BCRYPT_ROUNDS (the app default is 12)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", help="previous JSON report to compare against")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's own log output")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args):
+    """
+    Must run before the app is imported: app.config refuses to load without these,
+    and the real quotas would throttle the fakes.
+    """
+    os.environ.setdefault("SUPABASE_URL", "https://loadtest.supabase.co")
+    os.environ.setdefault("SUPABASE_KEY", "loadtest")
+    os.environ.setdefault("GEMINI_API_KEY", "loadtest")
+    os.environ.setdefault("MONGO_URI", "mongodb://localhost:27017/loadtest")
+    os.environ.setdefault("AUTH_SECRET", "loadtest-secret-not-for-production-use")
+    os.environ.setdefault("GEMINI_RATE_LIMITS", json.dumps({
+        "gemini-2.0-flash": {"rpm": 1000000, "tpm": 1000000000},
+        "gemini-embedding-001": {"rpm": 1000000, "tpm": 1000000000},
+    }))
+    if args.bcrypt_rounds:
+        os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    if not args.verbose:
+        # The app logs from a background thread straight to stdout, which would mix with the report
+        os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+
+
+def load_messages() -> list[str]:
+    messages = []
+    for path in MESSAGE_FILES:
+        with open(path, encoding="utf-8") as f:
+            messages.extend(json.loads(line)["message"] for line in f if line.strip())
+    return messages
+
+
+def git_revision() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain"], capture_output=True, text=True, check=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def summarize(values: list[float]) -> dict:
+    import numpy as np
+
+    if not values:
+        return {}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "p50": round(float(p50), 2),
+        "p95": round(float(p95), 2),
+        "p99": round(float(p99), 2),
+        "mean": round(float(np.mean(values)), 2),
+        "max": round(float(np.max(values)), 2),
+    }
+
+
+def compare(report: dict, baseline: dict) -> dict:
+    """
+    Percentage change of latency percentiles and throughput per scenario (negative latency is better).
+    """
+    changes = {}
+    for name, result in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        pairs = {key: (before["latency_ms"].get(key), result["latency_ms"].get(key)) for key in HEADLINE}
+        pairs["rps"] = (before.get("rps"), result.get("rps"))
+        changes[name] = {
+            key: round((new - old) / old * 100, 1) if old and new is not None else None
+            for key, (old, new) in pairs.items()
+        }
+    return {"commit": baseline.get("git", {}).get("commit"), "change_pct": changes}
+
+
+class StageRecorder:
+    """
+    Collects the per-stage timings of every Pipeline.run while a scenario is measured.
+    """
+
+    def __init__(self):
+        self.samples = {}
+        self.recording = False
+
+    def wrap(self, run):
+        recorder = self
+
+        async def recording_run(pipeline, *args, **kwargs):
+            results, timings = await run(pipeline, *args, **kwargs)
+            if recorder.recording:
+                for stage, ms in timings.items():
+                    recorder.samples.setdefault(pipeline.name, {}).setdefault(stage, []).append(ms)
+            return results, timings
+
+        return recording_run
+
+    def take(self) -> dict:
+        samples, self.samples = self.samples, {}
+        return {
+            pipeline: {stage: summarize(values) for stage, values in stages.items()}
+            for pipeline, stages in samples.items()
+        }
+
+
+async def seed_users(args, messages: list[str]) -> list[dict]:
+    from datetime import datetime, timedelta, timezone
+    from app.config import BCRYPT_ROUNDS
+    from app.repositories import chats, users
+    from app.services.access_tokens import issue_access_token
+    from app.services.passwords import _hash
+
+    hashed = _hash(PASSWORD, BCRYPT_ROUNDS)
+    rng = random.Random(args.seed)
+    start = datetime.now(timezone.utc) - timedelta(days=30)
+    seeded = []
+    for i in range(args.users):
+        email = f"loadtest{i}@example.com"
+        user_id = await users.create_user(f"Load Test {i}", email, hashed, "q1", hashed, "q2", hashed)
+        docs = [
+            chats.new_chat(
+                user_id,
+                role=("user", "model")[n % 2],
+                message=rng.choice(messages),
+                timestamp=start + timedelta(minutes=n),
+                session_id=f"session-{n % 2}",
+            )
+            for n in range(args.history_size)
+        ]
+        if docs:
+            await chats.insert_chats(docs)
+        seeded.append({"id": str(user_id), "email": email, "token": issue_access_token(user_id)[0]})
+    return seeded
+
+
+def build_requests(name: str, users: list[dict], messages: list[str], rng: random.Random):
+    """
+    Returns a function that makes the i-th request of a scenario as (method, url, kwargs).
+    """
+    def auth(i):
+        return {"Authorization": f"Bearer {users[i % len(users)]['token']}"}
+
+    if name == "chat":
+        return lambda i: ("POST", "/chat", {"json": {"message": rng.choice(messages)}, "headers": auth(i)})
+    if name == "history":
+        return lambda i: ("GET", "/chat/history", {"params": {"limit": 50}, "headers": auth(i)})
+    if name == "login":
+        return lambda i: ("POST", "/auth/login", {
+            "json": {"email": users[i % len(users)]["email"], "password": PASSWORD},
+        })
+    raise ValueError(f"Unknown scenario: {name}")
+
+
+async def run_scenario(client, make_request, total: int, concurrency: int) -> dict:
+    latencies, statuses, errors = [], Counter(), Counter()
+    next_request = iter(range(total))
+
+    async def worker():
+        for i in next_request:
+            method, url, kwargs = make_request(i)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                statuses[response.status_code] += 1
+                if response.status_code >= 400:
+                    errors[f"HTTP {response.status_code}"] += 1
+            except Exception as e:
+                errors[type(e).__name__] += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": total,
+        "errors": sum(errors.values()),
+        "error_types": dict(errors),
+        "status_codes": {str(code): n for code, n in sorted(statuses.items())},
+        "duration_s": round(elapsed, 3),
+        "rps": round(total / elapsed, 1) if elapsed else None,
+        "latency_ms": summarize(latencies),
+    }
+
+
+async def run(args) -> dict:
+    import httpx
+    from app import clients, database
+    from app.main import app, readiness
+    from app.services import resource_cache
+    from app.services.gemini import gemini
+    from app.services.pipeline import Pipeline
+    from app.services.semantic_cache import semantic_cache
+    from loadtest_fakes import (
+        Latency, FakeGeminiModels, FakeMongoClient, FakeSupabase, fake_genai_client, synthetic_techniques, WORD,
+    )
+
+    rng = random.Random(args.seed)
+
+    def latency(ms):
+        return Latency(ms, args.jitter, random.Random(rng.random()))
+
+    messages = load_messages()
+    vocabulary = sorted({w for m in messages for w in WORD.findall(m.lower()) if len(w) > 3})
+    with open(resource_cache.RESOURCE_SNAPSHOT_PATH, encoding="utf-8") as f:
+        crisis_resources = json.load(f)
+
+    models = FakeGeminiModels(
+        latency(args.gemini_latency_ms), latency(args.embed_latency_ms), rate_429=args.rate_429, seed=args.seed,
+    )
+    supabase = FakeSupabase({
+        "techniques": synthetic_techniques(vocabulary, args.techniques, seed=args.seed),
+        "crisis_resources": crisis_resources,
+    }, latency(args.supabase_latency_ms))
+    mongo_latency = latency(args.mongo_latency_ms)
+    mongo = FakeMongoClient(mongo_latency)
+    recorder = StageRecorder()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    report = {
+        "git": git_revision(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": {
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "users": args.users,
+            "history_size": args.history_size,
+            "techniques_per_language": args.techniques,
+            "bcrypt_rounds": int(os.environ.get("BCRYPT_ROUNDS", "12")),
+            "rate_429": args.rate_429,
+            "seed": args.seed,
+            "latency": {
+                "gemini": models.generate_latency.describe(),
+                "embedding": models.embed_latency.describe(),
+                "supabase": supabase.latency.describe(),
+                "mongo": mongo_latency.describe(),
+            },
+        },
+        "scenarios": {},
+    }
+
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(patch.object(gemini, "_client", fake_genai_client(models)))
+        stack.enter_context(patch.object(database, "_client", mongo))
+        stack.enter_context(patch.object(clients, "_supabase", supabase))
+        stack.enter_context(patch.object(Pipeline, "run", recorder.wrap(Pipeline.run)))
+
+        # Runs the app's startup/shutdown handlers, as uvicorn would
+        async with app.router.lifespan_context(app):
+            # Traffic starts once the instance would report ready, as behind a load balancer
+            await readiness.wait()
+            report["startup"] = readiness.stats()
+            users = await seed_users(args, messages)
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+                for name in scenarios:
+                    make_request = build_requests(name, users, messages, rng)
+                    await run_scenario(client, make_request, args.warmup, args.concurrency)
+                    recorder.recording = True
+                    result = await run_scenario(client, make_request, args.requests, args.concurrency)
+                    recorder.recording = False
+                    stages = recorder.take()
+                    if stages:
+                        result["stages_ms"] = stages
+                    report["scenarios"][name] = result
+
+    report["gemini"] = {"fake": models.counters, "client": gemini.stats()}
+    report["semantic_cache"] = semantic_cache.stats()
+    return report
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_environment(args)
+
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    with quiet:
+        report = asyncio.run(run(args))
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["baseline"] = compare(report, json.load(f))
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
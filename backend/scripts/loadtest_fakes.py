@@ -0,0 +1,442 @@
+"""Deterministic local stand-ins for Gemini, Supabase and MongoDB, used by scripts/loadtest.py.
+
+Each fake implements only the slice of the client API the app calls, adds a
+configurable, seeded latency to every call, and keeps its data in memory.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import re
+from types import SimpleNamespace
+import numpy as np
+from bson import ObjectId
+from google.genai import errors
+from pymongo.errors import DuplicateKeyError
+
+WORD = re.compile(r"\w+")
+
+
+class Latency:
+    """
+    Sleeps for mean_ms, spread uniformly by ±jitter (a fraction of the mean).
+    """
+
+    def __init__(self, mean_ms: float = 0.0, jitter: float = 0.3, rng: random.Random = None):
+        self.mean_ms = mean_ms
+        self.jitter = jitter
+        self.rng = rng or random.Random(0)
+
+    async def wait(self):
+        if self.mean_ms <= 0:
+            await asyncio.sleep(0)
+            return
+        spread = self.rng.uniform(1 - self.jitter, 1 + self.jitter)
+        await asyncio.sleep(self.mean_ms * spread / 1000)
+
+    def describe(self) -> dict:
+        return {"mean_ms": self.mean_ms, "jitter": self.jitter}
+
+
+def fake_embedding(text: str, dimensions: int = 768) -> list[float]:
+    """
+    Hashed bag of words (plus character trigrams for unspaced scripts like Thai),
+    so identical texts get identical vectors and similar texts get similar ones.
+    """
+    vector = np.zeros(dimensions, dtype=np.float32)
+    for word in WORD.findall(text.lower()):
+        tokens = [word] if word.isascii() else [word[i:i + 3] for i in range(max(1, len(word) - 2))]
+        for token in tokens:
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % dimensions
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    if norm:
+        vector /= norm
+    return vector.tolist()
+
+
+# ---------------------------------------------------------------------------
+# GEMINI
+# ---------------------------------------------------------------------------
+
+SEVERITIES = ("LOW", "MODERATE", "MODERATE", "HIGH")
+
+
+class FakeGeminiModels:
+    """
+    Stands in for genai_client.aio.models. Answers are derived from a hash of the
+    prompt; `rate_429` of calls fail with the same ClientError a quota hit raises.
+    """
+
+    def __init__(self, generate_latency: Latency, embed_latency: Latency, rate_429: float = 0.0,
+                 response_chars: int = 600, seed: int = 0):
+        self.generate_latency = generate_latency
+        self.embed_latency = embed_latency
+        self.rate_429 = rate_429
+        self.response_chars = response_chars
+        self.rng = random.Random(seed)
+        self.counters = {"generate_content": 0, "embed_content": 0, "rate_limited": 0}
+
+    def _maybe_rate_limit(self):
+        if self.rate_429 and self.rng.random() < self.rate_429:
+            self.counters["rate_limited"] += 1
+            raise errors.ClientError(429, {"error": {
+                "code": 429, "message": "Resource has been exhausted (e.g. check quota).", "status": "RESOURCE_EXHAUSTED",
+            }})
+
+    def _answer(self, prompt: str, config) -> str:
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        schema = getattr(config, "response_schema", None)
+        properties = getattr(schema, "properties", None) or {}
+        if getattr(config, "response_mime_type", None) != "application/json":
+            return SEVERITIES[digest[0] % len(SEVERITIES)]
+
+        text = ("I hear you, and it makes sense to feel this way. " * 40)[:self.response_chars].strip()
+        answer = {"text": text, "quotes": ["You don't have to carry this alone."]}
+        if "severity" in properties:
+            answer = {"severity": SEVERITIES[digest[0] % len(SEVERITIES)], **answer}
+        return json.dumps(answer)
+
+    async def generate_content(self, model: str, contents, config=None):
+        self.counters["generate_content"] += 1
+        await self.generate_latency.wait()
+        self._maybe_rate_limit()
+        prompt = contents if isinstance(contents, str) else json.dumps(contents, default=str)
+        text = self._answer(prompt, config)
+        return SimpleNamespace(
+            text=text,
+            usage_metadata=SimpleNamespace(total_token_count=(len(prompt) + len(text)) // 4),
+        )
+
+    async def embed_content(self, model: str, contents, config=None):
+        self.counters["embed_content"] += 1
+        await self.embed_latency.wait()
+        self._maybe_rate_limit()
+        texts = [contents] if isinstance(contents, str) else contents
+        dimensions = getattr(config, "output_dimensionality", None) or 768
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=fake_embedding(t, dimensions)) for t in texts])
+
+
+def fake_genai_client(models: FakeGeminiModels):
+    return SimpleNamespace(aio=SimpleNamespace(models=models))
+
+
+# ---------------------------------------------------------------------------
+# SUPABASE
+# ---------------------------------------------------------------------------
+
+class FakeQuery:
+    """
+    The PostgREST query-builder calls the app makes: select/eq/gt/order/range and upsert.
+    """
+
+    def __init__(self, supabase: "FakeSupabase", table: str):
+        self.supabase = supabase
+        self.table = table
+        self.filters = []
+        self.order_by = None
+        self.window = None
+        self.rows_to_upsert = None
+        self.on_conflict = "id"
+
+    def select(self, columns: str = "*"):
+        self.columns = columns
+        return self
+
+    def eq(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def gt(self, column: str, value):
+        self.filters.append(lambda row: row.get(column) is not None and row[column] > value)
+        return self
+
+    def order(self, column: str, desc: bool = False):
+        self.order_by = (column, desc)
+        return self
+
+    def range(self, start: int, end: int):
+        self.window = (start, end)
+        return self
+
+    def upsert(self, rows, on_conflict: str = "id"):
+        self.rows_to_upsert = rows if isinstance(rows, list) else [rows]
+        self.on_conflict = on_conflict
+        return self
+
+    async def execute(self):
+        await self.supabase.latency.wait()
+        table = self.supabase.tables.setdefault(self.table, [])
+        if self.rows_to_upsert is not None:
+            keys = self.on_conflict.split(",")
+            by_key = {tuple(row.get(k) for k in keys): row for row in table}
+            for row in self.rows_to_upsert:
+                current = by_key.get(tuple(row.get(k) for k in keys))
+                if current is not None:
+                    current.update(row)
+                else:
+                    table.append(dict(row))
+            return SimpleNamespace(data=self.rows_to_upsert)
+
+        rows = [row for row in table if all(f(row) for f in self.filters)]
+        if self.order_by:
+            column, desc = self.order_by
+            rows.sort(key=lambda row: row.get(column), reverse=desc)
+        if self.window:
+            rows = rows[self.window[0]:self.window[1] + 1]
+        return SimpleNamespace(data=[dict(row) for row in rows])
+
+
+class FakeRpc:
+    def __init__(self, supabase: "FakeSupabase", name: str, params: dict):
+        self.supabase = supabase
+        self.name = name
+        self.params = params
+
+    async def execute(self):
+        await self.supabase.latency.wait()
+        if self.name != "match_techniques":
+            raise ValueError(f"Unknown RPC function: {self.name}")
+        # Imported here: the app is only importable once loadtest.py has set up the environment
+        from app.services.technique_index import MATCH_COLUMNS
+        query = np.asarray(json.loads(self.params["query_embedding"]), dtype=np.float32)
+        matches = []
+        for row in self.supabase.tables.get("techniques", []):
+            if row.get("language") != self.params["filter_language"]:
+                continue
+            vector = np.asarray(json.loads(row["embedding"]), dtype=np.float32)
+            similarity = float(vector @ query / ((np.linalg.norm(vector) * np.linalg.norm(query)) or 1.0))
+            if similarity > self.params["match_threshold"]:
+                matches.append({**{c: row[c] for c in MATCH_COLUMNS if c in row}, "similarity": similarity})
+        matches.sort(key=lambda row: -row["similarity"])
+        return SimpleNamespace(data=matches[:self.params["match_count"]])
+
+
+class FakeSupabase:
+    """
+    Stands in for the async Supabase client. Tables are lists of row dicts;
+    embeddings are stored as "[...]" strings, the way PostgREST returns pgvector columns.
+    """
+
+    def __init__(self, tables: dict, latency: Latency):
+        self.tables = tables
+        self.latency = latency
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: dict) -> FakeRpc:
+        return FakeRpc(self, name, params)
+
+
+def synthetic_techniques(vocabulary: list[str], per_language: int, seed: int = 0) -> list[dict]:
+    """
+    Techniques whose embedding_text is a random handful of words from the load-test messages,
+    so searches find plausible matches.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for language in ("en", "th"):
+        words = [w for w in vocabulary if w.isascii() == (language == "en")] or vocabulary
+        for i in range(per_language):
+            text = " ".join(rng.choice(words) for _ in range(8))
+            rows.append({
+                "id": len(rows) + 1,
+                "title": f"Technique {language}-{i}",
+                "category": "coping",
+                "content": text,
+                "instructions": "Breathe in for four counts, hold for four, breathe out for four.",
+                "when_to_use": "When you feel overwhelmed",
+                "embedding_text": text,
+                "embedding": json.dumps(fake_embedding(text)),
+                "language": language,
+                "updated_at": "2026-01-01T00:00:00+00:00",
+            })
+    return rows
+
+
+# ---------------------------------------------------------------------------
+# MONGODB
+# ---------------------------------------------------------------------------
+
+# Fields with a hash index, so equality lookups on them don't scan the collection
+INDEXED_FIELDS = ("_id", "user", "email")
+
+
+def _matches(doc: dict, query: dict) -> bool:
+    for key, expected in query.items():
+        if key == "$or":
+            if not any(_matches(doc, clause) for clause in expected):
+                return False
+            continue
+        value = doc.get(key)
+        if isinstance(expected, dict) and expected and all(op.startswith("$") for op in expected):
+            for op, operand in expected.items():
+                if value is None and op != "$ne":
+                    return False
+                if op == "$lt" and not value < operand:
+                    return False
+                if op == "$lte" and not value <= operand:
+                    return False
+                if op == "$gt" and not value > operand:
+                    return False
+                if op == "$gte" and not value >= operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$in" and value not in operand:
+                    return False
+        elif value != expected:
+            return False
+    return True
+
+
+def _project(doc: dict, projection: dict | None) -> dict:
+    if not projection:
+        return dict(doc)
+    return {k: v for k, v in doc.items() if k == "_id" or projection.get(k)}
+
+
+class FakeCursor:
+    def __init__(self, docs: list[dict], projection: dict | None):
+        self._docs = docs
+        self._projection = projection
+        self._limit = 0
+
+    def sort(self, keys: list[tuple]):
+        # Stable sorts, least significant key first
+        for field, direction in reversed(keys):
+            self._docs.sort(key=lambda doc: doc[field], reverse=direction == -1)
+        return self
+
+    def limit(self, n: int):
+        self._limit = n
+        return self
+
+    async def to_list(self, length: int = None):
+        docs = self._docs[:self._limit] if self._limit else self._docs
+        return [_project(doc, self._projection) for doc in docs]
+
+
+class FakeCollection:
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self._docs = {}
+        self._index = {field: {} for field in INDEXED_FIELDS}
+        self._unique = set()
+
+    def _add(self, doc: dict):
+        for field in INDEXED_FIELDS:
+            if field in doc:
+                self._index[field].setdefault(doc[field], {})[doc["_id"]] = doc
+        self._docs[doc["_id"]] = doc
+
+    def _remove(self, doc: dict):
+        for field in INDEXED_FIELDS:
+            if field in doc:
+                self._index[field].get(doc[field], {}).pop(doc["_id"], None)
+        del self._docs[doc["_id"]]
+
+    def _candidates(self, query: dict):
+        for field in INDEXED_FIELDS:
+            value = query.get(field)
+            if value is not None and not isinstance(value, dict):
+                return list(self._index[field].get(value, {}).values())
+        return list(self._docs.values())
+
+    def _find(self, query: dict) -> list[dict]:
+        return [doc for doc in self._candidates(query) if _matches(doc, query)]
+
+    def _insert(self, doc: dict) -> ObjectId:
+        doc = dict(doc)
+        doc.setdefault("_id", ObjectId())
+        if doc["_id"] in self._docs:
+            raise DuplicateKeyError(f"E11000 duplicate key error: _id {doc['_id']!r}")
+        for field in self._unique:
+            if field in doc and self._index[field].get(doc[field]):
+                raise DuplicateKeyError(f"E11000 duplicate key error: {field} {doc[field]!r}")
+        self._add(doc)
+        return doc["_id"]
+
+    async def create_index(self, keys, unique: bool = False, **options):
+        if unique and len(keys) == 1 and keys[0][0] in INDEXED_FIELDS:
+            self._unique.add(keys[0][0])
+        return options.get("name")
+
+    async def find_one(self, query: dict, projection: dict = None):
+        await self.latency.wait()
+        docs = self._find(query)
+        return _project(docs[0], projection) if docs else None
+
+    def find(self, query: dict, projection: dict = None) -> FakeCursor:
+        return FakeCursor(self._find(query), projection)
+
+    async def insert_one(self, doc: dict):
+        await self.latency.wait()
+        return SimpleNamespace(inserted_id=self._insert(doc))
+
+    async def insert_many(self, docs: list[dict], ordered: bool = True):
+        await self.latency.wait()
+        return SimpleNamespace(inserted_ids=[self._insert(doc) for doc in docs])
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False):
+        await self.latency.wait()
+        docs = self._find(query)
+        if docs:
+            self._remove(docs[0])
+            docs[0].update(update.get("$set", {}))
+            self._add(docs[0])
+        elif upsert:
+            # Like MongoDB, the new document starts from the query's equality fields
+            doc = {k: v for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+            doc.update(update.get("$set", {}))
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=self._insert(doc))
+        return SimpleNamespace(matched_count=len(docs[:1]), modified_count=len(docs[:1]), upserted_id=None)
+
+    async def delete_one(self, query: dict):
+        await self.latency.wait()
+        docs = self._find(query)[:1]
+        for doc in docs:
+            self._remove(doc)
+        return SimpleNamespace(deleted_count=len(docs))
+
+    async def delete_many(self, query: dict):
+        await self.latency.wait()
+        docs = self._find(query)
+        for doc in docs:
+            self._remove(doc)
+        return SimpleNamespace(deleted_count=len(docs))
+
+    def __len__(self):
+        return len(self._docs)
+
+
+class FakeDatabase:
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self._collections = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(self.latency)
+        return self._collections[name]
+
+
+class FakeMongoClient:
+    """
+    Stands in for the AsyncMongoClient held by app.database.
+    """
+
+    def __init__(self, latency: Latency):
+        self._database = FakeDatabase(latency)
+        self.admin = SimpleNamespace(command=self._command)
+
+    async def _command(self, name: str):
+        return {"ok": 1}
+
+    def get_default_database(self, default: str = None) -> FakeDatabase:
+        return self._database
+
+    async def close(self):
+        pass
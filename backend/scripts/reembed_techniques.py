@@ -1,61 +1,74 @@
-"""Re-embed all techniques in Supabase using the new gemini-embedding-001 model."""
+"""Re-embed techniques in Supabase using the gemini-embedding-001 model.
+
+Usage: python scripts/reembed_techniques.py [--force] [--batch-size N] [--concurrency N] [--checkpoint PATH]
+
+Only rows whose embedding_text changed since they were last embedded (per the
+stored embedding_hash) are re-embedded; --force re-embeds everything. Texts are
+embedded in batches, several batches at a time, and written back with bulk upserts.
+Progress is checkpointed after every batch, so re-running after a failure skips
+what was already written. The checkpoint is removed once a run completes.
+"""
+import argparse
+import asyncio
 import sys
 import time
-sys.path.insert(0, '.')
-
-from app.config import supabase, genai_client
-from google.genai import types
-
-def generate_embedding_768(text: str) -> list[float]:
-    """Generate a 768-dimensional embedding using gemini-embedding-001."""
-    result = genai_client.models.embed_content(
-        model="gemini-embedding-001",
-        contents=text,
-        config=types.EmbedContentConfig(
-            output_dimensionality=768,
-        ),
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.catalog import fetch_techniques, needs_embedding, reembed_rows, Checkpoint
+from app.services.embeddings import EMBEDDING_BATCH_SIZE, EMBEDDING_MODEL
+from app.services.gemini import gemini
+
+DEFAULT_CHECKPOINT = Path(__file__).parent / ".reembed_checkpoint.json"
+
+
+async def main(args):
+    started = time.perf_counter()
+    # A script can wait out the quota instead of failing fast like a request handler
+    gemini.max_queue_wait = float("inf")
+    checkpoint = Checkpoint(args.checkpoint)
+    if checkpoint.done:
+        print(f"Resuming: {len(checkpoint.done)} rows already done according to {args.checkpoint}")
+
+    print("Fetching all techniques from Supabase...")
+    techniques = await fetch_techniques()
+    if not techniques:
+        print("No techniques found!")
+        sys.exit(1)
+
+    missing_text = [t for t in techniques if not t.get("embedding_text")]
+    todo = [t for t in techniques if needs_embedding(t, force=args.force) and not checkpoint.is_done(t)]
+    for t in missing_text:
+        print(f"  ⚠️  {t.get('title', 'Unknown')} - No embedding_text, skipping")
+    print(f"Found {len(techniques)} techniques, {len(todo)} to re-embed with {EMBEDDING_MODEL} "
+          f"({len(techniques) - len(todo) - len(missing_text)} up to date)\n")
+
+    def on_batch_done(batch):
+        checkpoint.mark(batch)
+        print(f"  ✅ {len(batch)} rows written ({len(checkpoint.done)} done)")
+
+    written, failures = await reembed_rows(
+        todo, batch_size=args.batch_size, concurrency=args.concurrency, on_batch_done=on_batch_done,
     )
-    return result.embeddings[0].values
-
-# Fetch all techniques
-print("Fetching all techniques from Supabase...")
-response = supabase.table("techniques").select("id, title, embedding_text").execute()
-techniques = response.data
-
-if not techniques:
-    print("No techniques found!")
-    sys.exit(1)
-
-print(f"Found {len(techniques)} techniques. Re-embedding with gemini-embedding-001...\n")
-
-success = 0
-failed = 0
-
-for i, t in enumerate(techniques):
-    title = t.get('title', 'Unknown')
-    text = t.get('embedding_text', '')
-    
-    if not text:
-        print(f"  [{i+1}/{len(techniques)}] ⚠️  {title} - No embedding_text, skipping")
-        failed += 1
-        continue
-    
-    try:
-        embedding = generate_embedding_768(text)
-        
-        # Update the embedding in Supabase
-        supabase.table("techniques").update({
-            "embedding": embedding
-        }).eq("id", t["id"]).execute()
-        
-        print(f"  [{i+1}/{len(techniques)}] ✅ {title} ({len(embedding)} dims)")
-        success += 1
-        
-        # Small delay to respect rate limits (embedding model: 100 RPM)
-        time.sleep(0.7)
-        
-    except Exception as e:
-        print(f"  [{i+1}/{len(techniques)}] ❌ {title} - {str(e)[:80]}")
-        failed += 1
-
-print(f"\nDone! Success: {success}, Failed: {failed}")
+    for batch, error in failures:
+        print(f"  ❌ Batch of {len(batch)} ({batch[0].get('title', 'Unknown')}, ...) - {str(error)[:80]}")
+
+    elapsed = time.perf_counter() - started
+    print(f"\nDone in {elapsed:.1f}s! Written: {written}, Failed: {sum(len(b) for b, _ in failures)}, "
+          f"Skipped (no text): {len(missing_text)}")
+    print(f"Gemini limiter: {gemini.stats()}")
+
+    if failures:
+        print(f"Re-run to retry the failed rows; progress is kept in {args.checkpoint}")
+        sys.exit(1)
+    checkpoint.clear()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-embed changed techniques in Supabase")
+    parser.add_argument("--force", action="store_true", help="re-embed every row, even if its text is unchanged")
+    parser.add_argument("--batch-size", type=int, default=EMBEDDING_BATCH_SIZE, help="texts per embed_content call")
+    parser.add_argument("--concurrency", type=int, default=4, help="batches in flight at once")
+    parser.add_argument("--checkpoint", default=str(DEFAULT_CHECKPOINT), help="progress file for resuming")
+    asyncio.run(main(parser.parse_args()))
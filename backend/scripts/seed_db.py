@@ -1,3 +1,5 @@
+import argparse
+import asyncio
 import json
 import os
 import sys
@@ -6,60 +8,87 @@ from pathlib import Path
 # Add the parent directory to sys.path to import app modules
 sys.path.append(str(Path(__file__).parent.parent))
 
-from app.config import supabase
-from app.services.embeddings import generate_embedding
+from app.clients import get_sync_supabase
+from app.services.catalog import (
+    SEED_FIELDS, validate_techniques, find_duplicates, fetch_techniques, plan_seed, apply_seed,
+)
+from app.services.gemini import gemini
 
 
-def seed_techniques():
-    files = [
-        {'path': 'data/techniques.json', 'lang': 'en'},
-        {'path': 'data/techniques_th.json', 'lang': 'th'}
-    ]
+TECHNIQUE_FILES = [
+    {'path': 'data/techniques.json', 'lang': 'en'},
+    {'path': 'data/techniques_th.json', 'lang': 'th'}
+]
+
+EXISTING_COLUMNS = "id, " + ", ".join(SEED_FIELDS) + ", embedding, embedding_hash"
 
-    for file_info in files:
+
+def load_catalog():
+    """
+    Reads and validates every catalog file before anything is written.
+    """
+    rows, errors = [], []
+    for file_info in TECHNIQUE_FILES:
         file_path = file_info['path']
-        lang = file_info['lang']
-        
         if not os.path.exists(file_path):
             print(f"Skipping {file_path}: File not found")
             continue
 
-        print(f"Seeding from {file_path} ({lang})...")
-        
-        with open(file_path, 'r') as f:
-            techniques = json.load(f)
-
-        for technique in techniques:
-            print(f"Processing: {technique['title']}")
-            
-            # Generate embedding
-            embedding = generate_embedding(technique['embedding_text'])
-            
-            if not embedding:
-                print(f"Failed to generate embedding for {technique['title']}")
-                continue
-
-            # Prepare data for insertion
-            data = {
-                "title": technique['title'],
-                "category": technique['category'],
-                "target_symptoms": technique['target_symptoms'],
-                "content": technique['content'],
-                "instructions": technique['instructions'],
-                "when_to_use": technique['when_to_use'],
-                "embedding": embedding,
-                "embedding_text": technique['embedding_text'],
-                "source": technique.get('source', 'Unknown'),
-                "language": technique.get('language', lang) # Use file default if not in JSON
-            }
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                techniques = json.load(f)
+        except json.JSONDecodeError as e:
+            errors.append(f"{file_path}: invalid JSON ({e})")
+            continue
+
+        file_rows, file_errors = validate_techniques(techniques, file_info['lang'], file_path)
+        rows.extend(file_rows)
+        errors.extend(file_errors)
+
+    errors.extend(find_duplicates(rows))
+    return rows, errors
+
+
+def print_plan(plan):
+    print(f"Insert: {len(plan.inserts)}, Update: {len(plan.updates)}, Unchanged: {len(plan.unchanged)}, "
+          f"Embed: {len(plan.to_embed)}, Not in catalog: {len(plan.orphans)}")
+    embedding = {id(row) for row in plan.to_embed}
+    for label, rows in (("+", plan.inserts), ("~", plan.updates), ("?", plan.orphans)):
+        for row in rows:
+            note = " (re-embed)" if label == "~" and id(row) in embedding else ""
+            print(f"  {label} [{row['language']}] {row['title']}{note}")
 
-            try:
-                supabase.table("techniques").insert(data).execute()
-                print(f"Inserted: {technique['title']}")
-            except Exception as e:
-                print(f"Error inserting {technique['title']}: {e}")
+
+async def seed_techniques(dry_run: bool = False):
+    """
+    Idempotent seeding: rows are upserted on (title, language), and vectors are
+    reused whenever a technique's embedding_text is unchanged.
+    With dry_run, only the diff against the table is printed.
+    """
+    rows, errors = load_catalog()
+    if errors:
+        print("Catalog is invalid, nothing was written:")
+        for error in errors:
+            print(f"  - {error}")
+        sys.exit(1)
+
+    existing = await fetch_techniques(EXISTING_COLUMNS)
+    plan = plan_seed(rows, existing)
+    print_plan(plan)
+    if dry_run:
+        return
+
+    if not plan.inserts and not plan.updates:
+        print("Techniques are up to date")
+        return
+
+    # A script can wait out the embedding quota instead of failing fast like a request handler
+    gemini.max_queue_wait = float("inf")
+    await apply_seed(plan)
+    print(f"Upserted {len(plan.inserts) + len(plan.updates)} techniques ({len(plan.to_embed)} embedded)")
 
 def seed_crisis_resources():
+    supabase = get_sync_supabase()
     files = [
         'data/crisis_resources.json',
         'data/crisis_resources_th.json'
@@ -94,5 +123,12 @@ def seed_crisis_resources():
                 print(f"Error inserting {resource['name']}: {e}")
 
 if __name__ == "__main__":
-    # seed_techniques()
-    seed_crisis_resources()
+    parser = argparse.ArgumentParser(description="Seed Supabase from the data/ catalog files")
+    parser.add_argument("target", nargs="?", choices=["crisis", "techniques"], default="crisis")
+    parser.add_argument("--dry-run", action="store_true", help="print the techniques diff without writing")
+    args = parser.parse_args()
+
+    if args.target == "techniques":
+        asyncio.run(seed_techniques(dry_run=args.dry_run))
+    else:
+        seed_crisis_resources()
@@ -2,7 +2,9 @@
 import sys
 sys.path.insert(0, '.')
 
-from app.config import genai_client
+from app.clients import get_genai_client
+
+genai_client = get_genai_client()
 
 MODELS_TO_TEST = [
     "gemini-2.5-flash",
@@ -1,10 +1,13 @@
 """Test technique retrieval from Supabase to debug empty results."""
+import asyncio
 import sys
 sys.path.insert(0, '.')
 
 from app.services.embeddings import generate_embedding
 from app.services.retrieval import search_techniques
-from app.config import supabase
+from app.clients import get_sync_supabase
+
+supabase = get_sync_supabase()
 
 # Step 1: Check if techniques table has data
 print("=" * 60)
@@ -35,32 +38,35 @@ except Exception as e:
     print(f"  ❌ Error: {e}")
 
 # Step 3: Generate embedding and search
-print("\n" + "=" * 60)
-print("Step 3: Generate embedding for 'I am feeling anxious'")
-print("=" * 60)
-embedding = generate_embedding("I am feeling anxious")
-print(f"  Embedding length: {len(embedding)}")
-
-if embedding:
+async def search_demo():
     print("\n" + "=" * 60)
-    print("Step 4: Search techniques with embedding")
+    print("Step 3: Generate embedding for 'I am feeling anxious'")
     print("=" * 60)
-    techniques = search_techniques(embedding, language='en', match_count=5)
-    if techniques:
-        print(f"  Found {len(techniques)} matching techniques:")
-        for t in techniques:
-            print(f"    - {t.get('title', '?')} (similarity: {t.get('similarity', '?')})")
-    else:
-        print("  ⚠️  No techniques returned!")
-        
-        # Try with lower threshold  
-        print("\n  Retrying with lower threshold (0.1)...")
-        techniques2 = search_techniques(embedding, language='en', match_threshold=0.1, match_count=5)
-        if techniques2:
-            print(f"  Found {len(techniques2)} with lower threshold:")
-            for t in techniques2:
+    embedding = await generate_embedding("I am feeling anxious")
+    print(f"  Embedding length: {len(embedding)}")
+
+    if embedding:
+        print("\n" + "=" * 60)
+        print("Step 4: Search techniques with embedding")
+        print("=" * 60)
+        techniques = await search_techniques(embedding, language='en', match_count=5)
+        if techniques:
+            print(f"  Found {len(techniques)} matching techniques:")
+            for t in techniques:
                 print(f"    - {t.get('title', '?')} (similarity: {t.get('similarity', '?')})")
         else:
-            print("  ⚠️  Still no results. The RPC function or embedding column may be incompatible.")
+            print("  ⚠️  No techniques returned!")
+        
+            # Try with lower threshold  
+            print("\n  Retrying with lower threshold (0.1)...")
+            techniques2 = await search_techniques(embedding, language='en', match_threshold=0.1, match_count=5)
+            if techniques2:
+                print(f"  Found {len(techniques2)} with lower threshold:")
+                for t in techniques2:
+                    print(f"    - {t.get('title', '?')} (similarity: {t.get('similarity', '?')})")
+            else:
+                print("  ⚠️  Still no results. The RPC function or embedding column may be incompatible.")
+
+asyncio.run(search_demo())
 
 print("\n" + "=" * 60)
@@ -0,0 +1,4 @@
+import os
+
+# Tokens are signed with AUTH_SECRET, which the app only requires once it signs or verifies one
+os.environ.setdefault("AUTH_SECRET", "test-secret-for-the-test-suite-only-0123456789")
@@ -1,15 +1,51 @@
+import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
+import json
 import sys
 from pathlib import Path
+from datetime import datetime, timezone
+from bson import ObjectId
 
 # Add app to path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from app.main import app
+from app.services.access_tokens import issue_access_token
 
 client = TestClient(app)
 
+@pytest.fixture(autouse=True)
+def semantic_cache(monkeypatch):
+    """
+    A fresh semantic cache per test, so techniques cached by one test never answer another.
+    """
+    from app.services.semantic_cache import SemanticCache
+    cache = SemanticCache()
+    monkeypatch.setattr("app.routers.chat.semantic_cache", cache)
+    return cache
+
+@pytest.fixture(autouse=True)
+def known_users(monkeypatch):
+    """
+    Every user id exists, with token version 0 unless a test sets another, so signed
+    tokens pass the revocation check without MongoDB.
+    """
+    from app.services.user_cache import user_cache
+    versions = {}
+
+    async def find_user(user_id, projection=None):
+        return {"_id": ObjectId(user_id), "token_version": versions.get(str(user_id), 0)}
+
+    user_cache.clear()
+    monkeypatch.setattr("app.services.user_cache.users.find_user_by_id", find_user)
+    yield versions
+    user_cache.clear()
+
+def bearer(user_id) -> dict:
+    token, _ = issue_access_token(user_id)
+    return {"Authorization": f"Bearer {token}"}
+
 @patch("app.routers.chat.classify_severity")
 @patch("app.routers.chat.generate_embedding")
 @patch("app.routers.chat.search_techniques")
@@ -39,6 +75,30 @@ def test_chat_endpoint(mock_generate_response, mock_search_techniques, mock_gene
     assert len(data["techniques"]) == 1
     assert data["techniques"][0]["title"] == "Test Technique"
 
+@patch("app.routers.chat.classify_severity")
+@patch("app.routers.chat.generate_embedding")
+@patch("app.routers.chat.search_techniques")
+@patch("app.routers.chat.get_crisis_resources")
+@patch("app.routers.chat.generate_response")
+def test_semantic_hit_reuses_techniques_but_classifies_severity(mock_generate_response, mock_get_crisis_resources, mock_search_techniques, mock_generate_embedding, mock_classify_severity, semantic_cache):
+    mock_generate_embedding.return_value = [0.1] * 768
+    mock_search_techniques.return_value = [{"title": "Box Breathing", "content": "Breathe."}]
+    mock_get_crisis_resources.return_value = [{"name": "Hotline"}]
+    mock_generate_response.return_value = "I'm here with you."
+
+    mock_classify_severity.return_value = "MODERATE"
+    first = client.post("/chat", json={"message": "I feel anxious"}).json()
+    mock_classify_severity.return_value = "CRISIS"
+    second = client.post("/chat", json={"message": "I feel anxious and I want to die"}).json()
+
+    # The near-duplicate skips the technique search, but gets its own severity and crisis resources
+    assert mock_search_techniques.await_count == 1
+    assert second["techniques"] == first["techniques"]
+    assert mock_classify_severity.await_count == 2
+    assert (first["severity"], second["severity"]) == ("MODERATE", "CRISIS")
+    assert second["crisis_resources"] == [{"name": "Hotline"}]
+    assert semantic_cache.stats()["hits"] == 1
+
 @patch("app.routers.chat.classify_severity")
 @patch("app.routers.chat.generate_embedding")
 @patch("app.routers.chat.search_techniques")
@@ -66,3 +126,323 @@ def test_chat_endpoint_crisis(mock_generate_response, mock_get_crisis_resources,
     assert data["severity"] == "CRISIS"
     assert len(data["crisis_resources"]) == 1
     assert data["crisis_resources"][0]["name"] == "Crisis Line"
+
+@patch("app.routers.chat.classify_severity")
+@patch("app.routers.chat.generate_embedding")
+@patch("app.routers.chat.search_techniques")
+@patch("app.routers.chat.generate_response")
+def test_chat_server_timing_and_metrics(mock_generate_response, mock_search_techniques, mock_generate_embedding, mock_classify_severity):
+    mock_classify_severity.return_value = "LOW"
+    mock_generate_embedding.return_value = []
+    mock_search_techniques.return_value = []
+    mock_generate_response.return_value = {"text": "Take a slow breath.", "quotes": []}
+
+    response = client.post("/chat", json={"message": "Rough day at work"})
+
+    assert response.status_code == 200
+    server_timing = response.headers["Server-Timing"]
+    assert "embedding;dur=" in server_timing
+    assert "response;dur=" in server_timing
+    assert "app;dur=" in server_timing
+
+    metrics = client.get("/metrics")
+    assert metrics.status_code == 200
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert 'mindnest_pipeline_stage_duration_seconds_count{pipeline="chat",stage="response"}' in metrics.text
+    assert 'mindnest_http_request_duration_seconds_count{method="POST",route="/chat",status="200"}' in metrics.text
+
+def test_chat_pipeline_graph():
+    response = client.get("/chat/pipeline")
+
+    assert response.status_code == 200
+    stages = response.json()["stages"]
+    # Severity never comes from the semantic cache, so it starts right away; crisis resources only wait on it
+    assert stages["embedding"] == []
+    assert stages["semantic"] == ["embedding"]
+    assert stages["severity"] == []
+    assert stages["techniques"] == ["semantic"]
+    assert stages["crisis_resources"] == ["severity"]
+    # Conversation memory is read alongside everything else; only the response waits for it
+    assert stages["memory"] == []
+    assert set(stages["response"]) == {"memory", "severity", "techniques", "crisis_resources"}
+
+@patch("app.routers.chat.classify_severity")
+@patch("app.routers.chat.generate_embedding")
+@patch("app.routers.chat.search_techniques")
+@patch("app.routers.chat.generate_response")
+@patch("app.routers.chat.chat_writer")
+@patch("app.routers.chat.conversation_memory")
+@patch("app.routers.chat.user_cache")
+def test_chat_uses_session_memory(mock_user_cache, mock_memory, mock_chat_writer, mock_generate_response, mock_search_techniques, mock_generate_embedding, mock_classify_severity):
+    user_id = ObjectId()
+    mock_user_cache.get = AsyncMock(return_value={"_id": user_id})
+    mock_memory.context = AsyncMock(return_value="Recent messages:\nUser: I failed my exam")
+    mock_chat_writer.enqueue = AsyncMock()
+    mock_classify_severity.return_value = "MODERATE"
+    mock_generate_embedding.return_value = [0.1] * 768
+    mock_search_techniques.return_value = []
+    mock_generate_response.return_value = {"text": "That sounds hard.", "quotes": []}
+
+    response = client.post(
+        "/chat",
+        json={"message": "I still feel bad about it", "session_id": "s1"},
+        headers=bearer(user_id),
+    )
+
+    assert response.status_code == 200
+    mock_memory.context.assert_awaited_once_with(user_id, "s1")
+    assert mock_generate_response.call_args.kwargs["history"] == "Recent messages:\nUser: I failed my exam"
+    # Both messages are stored in the session, and its summary is updated in the background
+    # once the writer has stored them
+    user_chat, bot_chat = mock_chat_writer.enqueue.await_args.args
+    assert user_chat["session_id"] == bot_chat["session_id"] == "s1"
+    mock_memory.schedule_update.assert_not_called()
+
+    from app.routers.chat import _update_memory
+    _update_memory([user_chat, bot_chat])
+    mock_memory.schedule_update.assert_called_once_with(user_id, "s1")
+
+@patch("app.routers.chat.CHAT_LLM_MODE", "single_call")
+@patch("app.routers.chat.generate_embedding")
+@patch("app.routers.chat.search_techniques")
+@patch("app.routers.chat.get_crisis_resources")
+@patch("app.routers.chat.classify_and_respond")
+def test_chat_endpoint_single_call(mock_classify_and_respond, mock_get_crisis_resources, mock_search_techniques, mock_generate_embedding):
+    mock_generate_embedding.return_value = [0.1] * 768
+    mock_search_techniques.return_value = []
+    mock_get_crisis_resources.return_value = [{"name": "Crisis Line", "phone": "123-456"}]
+    mock_classify_and_respond.return_value = {"severity": "HIGH", "text": "I'm here with you.", "quotes": []}
+
+    response = client.post("/chat", json={"message": "Everything feels hopeless"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["severity"] == "HIGH"
+    assert data["response"] == "I'm here with you."
+    # Crisis resources are attached after the single LLM call
+    assert data["crisis_resources"][0]["name"] == "Crisis Line"
+    assert mock_classify_and_respond.await_count == 1
+
+    graph = client.get("/chat/pipeline").json()
+    assert graph["pipeline"] == "chat_single_call"
+    assert graph["stages"]["severity"] == ["turn"]
+
+@patch("app.services.llm.classify_local")
+@patch("app.services.llm.gemini")
+def test_classify_and_respond_structured_output(mock_gemini, mock_classify_local):
+    import asyncio
+    from app.services.llm import classify_and_respond
+    from app.services.severity import SeverityDecision
+
+    mock_classify_local.return_value = SeverityDecision(None, 0.6, "MODERATE", "uncertain")
+    mock_gemini.generate_content = AsyncMock(return_value=MagicMock(
+        text='{"severity": "MODERATE", "text": "That sounds stressful.", "quotes": []}'
+    ))
+
+    turn = asyncio.run(classify_and_respond("Work has been a lot lately", "", language="en"))
+
+    assert turn == {"severity": "MODERATE", "text": "That sounds stressful.", "quotes": []}
+    config = mock_gemini.generate_content.await_args.kwargs["config"]
+    assert config.response_mime_type == "application/json"
+    assert config.response_schema.required == ["severity", "text", "quotes"]
+
+@pytest.fixture
+def resource_cache():
+    """
+    The module-global resource cache, with whatever it held restored after the test.
+    """
+    from app.services.resource_cache import resource_cache
+    saved = vars(resource_cache).copy()
+    yield resource_cache
+    vars(resource_cache).clear()
+    vars(resource_cache).update(saved)
+
+def test_resources_etag(resource_cache):
+    resource_cache.load_rows([
+        {"id": 1, "name": "Daytime Line", "available_hours": "9:00 AM - 5:00 PM", "language": "en"},
+        {"id": 2, "name": "Night Line", "available_hours": "24/7", "language": "en"},
+    ], source="supabase")
+
+    response = client.get("/resources/", params={"language": "en"})
+    assert response.status_code == 200
+    assert [r["name"] for r in response.json()] == ["Night Line", "Daytime Line"]
+    etag = response.headers["ETag"]
+
+    cached = client.get("/resources/", params={"language": "en"}, headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+
+@patch("app.routers.chat.classify_severity")
+@patch("app.routers.chat.generate_embedding")
+@patch("app.routers.chat.search_techniques")
+@patch("app.routers.chat.get_crisis_resources")
+def test_chat_stream_endpoint(mock_get_crisis_resources, mock_search_techniques, mock_generate_embedding, mock_classify_severity):
+    mock_classify_severity.return_value = "CRISIS"
+    mock_generate_embedding.return_value = [0.1] * 768
+    mock_search_techniques.return_value = []
+    mock_get_crisis_resources.return_value = [{"name": "Crisis Line", "phone": "123-456"}]
+
+    async def fake_stream(*args, **kwargs):
+        yield "text", "You are "
+        yield "text", "not alone."
+        yield "quotes", ["This too shall pass."]
+
+    with patch("app.routers.chat.generate_response_stream", new=fake_stream):
+        response = client.post("/chat/stream", json={"message": "I want to hurt myself"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        (block.split("\n")[0][len("event: "):], json.loads(block.split("\n")[1][len("data: "):]))
+        for block in response.text.strip().split("\n\n")
+    ]
+    names = [name for name, _ in events]
+    # Early events come before any text, quotes come after the text, done is last
+    assert names.index("severity") < names.index("text")
+    assert names.index("crisis_resources") < names.index("text")
+    assert names[-2:] == ["quotes", "done"]
+    assert "".join(data["delta"] for name, data in events if name == "text") == "You are not alone."
+    assert dict(events)["crisis_resources"]["crisis_resources"][0]["name"] == "Crisis Line"
+
+@patch("app.routers.chat.classify_severity")
+@patch("app.routers.chat.generate_embedding")
+@patch("app.routers.chat.search_techniques")
+@patch("app.routers.chat.generate_response")
+def test_chat_logs_carry_the_body_session_id(mock_generate_response, mock_search_techniques, mock_generate_embedding, mock_classify_severity):
+    from app.services.logging_setup import session_id_var
+
+    sessions = []
+
+    def embed(message):
+        sessions.append(session_id_var.get())
+        return [0.1] * 768
+
+    mock_classify_severity.return_value = "LOW"
+    mock_generate_embedding.side_effect = embed
+    mock_search_techniques.return_value = []
+    mock_generate_response.return_value = "Noted."
+
+    async def fake_stream(*args, **kwargs):
+        yield "text", "Noted."
+
+    client.post("/chat", json={"message": "Rough day", "session_id": "s-body"}, headers={"X-Session-ID": "s-header"})
+    with patch("app.routers.chat.generate_response_stream", new=fake_stream):
+        client.post("/chat/stream", json={"message": "Rough day", "session_id": "s-stream"})
+
+    assert sessions == ["s-body", "s-stream"]
+
+@patch("app.repositories.chats.chats_collection")
+def test_chat_history_keyset_pagination(mock_chats_collection):
+    from app.routers.chat import encode_cursor
+
+    user_id = ObjectId()
+    older, newer = ObjectId(), ObjectId()
+    # Newest-first, as Mongo returns them for a backwards page
+    docs = [
+        {"_id": newer, "role": "model", "message": "Hi there", "timestamp": datetime(2025, 1, 1, 9, 0, 1)},
+        {"_id": older, "role": "user", "message": "Hello", "timestamp": datetime(2025, 1, 1, 9, 0, 0)},
+    ]
+    find = mock_chats_collection.return_value.find
+    find.return_value.sort.return_value.limit.return_value.to_list = AsyncMock(return_value=list(docs))
+
+    cursor = encode_cursor(datetime(2025, 1, 2), ObjectId())
+    response = client.get(
+        "/chat/history",
+        params={"before": cursor, "session_id": "s1", "limit": 2},
+        headers=bearer(user_id),
+    )
+
+    assert response.status_code == 200
+    assert [m["text"] for m in response.json()] == ["Hello", "Hi there"]
+    query, projection = find.call_args[0]
+    assert query["user"] == user_id
+    assert query["session_id"] == "s1"
+    assert query["$or"][0]["timestamp"]["$lt"] == datetime(2025, 1, 2, tzinfo=timezone.utc)
+    assert "message" in projection and "techniques" not in projection
+    find.return_value.sort.assert_called_with([("timestamp", -1), ("_id", -1)])
+    assert response.headers["X-Before-Cursor"] == encode_cursor(docs[1]["timestamp"], older)
+    assert response.headers["X-After-Cursor"] == encode_cursor(docs[0]["timestamp"], newer)
+
+def test_chat_history_rejects_bad_cursor():
+    response = client.get("/chat/history", params={"before": "nope"}, headers=bearer(ObjectId()))
+    assert response.status_code == 400
+
+def test_healthz_and_readyz_before_warmup():
+    # TestClient without a `with` block doesn't run startup, so the warmup never started
+    assert client.get("/healthz").json() == {"status": "ok"}
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    body = response.json()
+    assert body["ready"] is False
+    assert body["app_import_ms"] > 0
+    assert {"mongo", "supabase", "gemini", "crisis_resources"} <= set(body["steps"])
+
+@patch("app.routers.auth.password_hasher")
+@patch("app.routers.auth.users.find_user_by_email")
+def test_login_issues_a_token_that_authenticates_requests(mock_find_user, mock_hasher):
+    user_id = ObjectId()
+    mock_find_user.return_value = {"_id": user_id, "username": "Ann", "email": "ann@example.com", "password": "hash"}
+    mock_hasher.verify = AsyncMock(return_value=True)
+    mock_hasher.rehash_if_needed = AsyncMock(return_value=None)
+
+    login = client.post("/auth/login", json={"email": "ann@example.com", "password": "pw"}).json()
+    assert login["token_type"] == "bearer" and login["expires_in"] > 0
+
+    with patch("app.repositories.chats.find_history_page", AsyncMock(return_value=[])) as find_page:
+        response = client.get("/chat/history", headers={"Authorization": f"Bearer {login['access_token']}"})
+    assert response.status_code == 200
+    assert find_page.await_args.args[0] == user_id
+
+def test_unsigned_and_expired_tokens_are_rejected():
+    # The old scheme sent the raw user id, which anyone could forge
+    forged = client.get("/chat/history", headers={"Authorization": f"Bearer {ObjectId()}"})
+    assert forged.status_code == 401
+    assert forged.headers["WWW-Authenticate"] == "Bearer"
+
+    expired, _ = issue_access_token(ObjectId(), ttl=-10)
+    response = client.delete("/chat/history", headers={"Authorization": f"Bearer {expired}"})
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token expired"
+
+    # No Authorization header at all is still an anonymous request
+    assert client.get("/chat/history").json() == []
+
+@patch("app.routers.auth.get_password_hash", AsyncMock(return_value="new-hash"))
+@patch("app.routers.auth.password_hasher")
+@patch("app.routers.auth.users")
+def test_password_change_revokes_issued_tokens(mock_users, mock_hasher, known_users):
+    user_id = ObjectId()
+    headers = bearer(user_id)
+    mock_users.find_user_by_id = AsyncMock(return_value={"_id": user_id, "password": "hash"})
+    mock_users.update_user_password = AsyncMock()
+    mock_hasher.verify = AsyncMock(return_value=True)
+
+    with patch("app.repositories.chats.find_history_page", AsyncMock(return_value=[])):
+        assert client.get("/chat/history", headers=headers).status_code == 200
+        changed = client.post("/auth/change-password", json={"user_id": str(user_id), "old_password": "a", "new_password": "b"})
+        assert changed.status_code == 200
+        # The stored version went up with the new password
+        mock_users.update_user_password.assert_awaited_once_with(user_id, "new-hash")
+        known_users[str(user_id)] = 1
+
+        response = client.get("/chat/history", headers=headers)
+        assert response.status_code == 401 and response.json()["detail"] == "Token revoked"
+        assert client.get("/chat/history", headers={"Authorization": f"Bearer {issue_access_token(user_id, version=1)[0]}"}).status_code == 200
+
+def test_deleted_accounts_tokens_are_rejected(monkeypatch):
+    monkeypatch.setattr("app.services.user_cache.users.find_user_by_id", AsyncMock(return_value=None))
+    response = client.delete("/chat/history", headers=bearer(ObjectId()))
+    assert response.status_code == 401 and response.json()["detail"] == "Token revoked"
+
+def test_missing_auth_secret_is_refused_on_first_use(monkeypatch):
+    from app.services import access_tokens
+    monkeypatch.setattr(access_tokens, "_secret", None)
+    monkeypatch.setattr(access_tokens, "AUTH_SECRET", None)
+    monkeypatch.setattr(access_tokens, "AUTH_DEV_EPHEMERAL_SECRET", False)
+
+    with pytest.raises(RuntimeError, match="AUTH_SECRET is not set"):
+        issue_access_token(ObjectId())
+
+    monkeypatch.setattr(access_tokens, "AUTH_DEV_EPHEMERAL_SECRET", True)
+    token, _ = issue_access_token("6650f0c2a1b2c3d4e5f60718")
+    assert access_tokens.verify_access_token(token) == "6650f0c2a1b2c3d4e5f60718"
@@ -0,0 +1,132 @@
+import asyncio
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add app to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.catalog import (
+    needs_embedding, reembed_rows, Checkpoint, validate_techniques, find_duplicates, plan_seed, apply_seed,
+)
+from app.services.embeddings import content_hash
+
+
+class FakeTable:
+    """Records bulk upserts; the call chain mirrors supabase's async query builder."""
+
+    def __init__(self, fail_titles=()):
+        self.upserts = []
+        self.fail_titles = set(fail_titles)
+        self._rows = None
+
+    def table(self, name):
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        self._rows = rows
+        self.on_conflict = on_conflict
+        return self
+
+    async def execute(self):
+        if any(row["title"] in self.fail_titles for row in self._rows):
+            raise ConnectionError("supabase unavailable")
+        self.upserts.append([row["title"] for row in self._rows])
+
+
+async def fake_embeddings(texts):
+    return [[float(len(text))] * 3 for text in texts]
+
+
+def make_rows(n):
+    return [{"id": i, "title": f"t{i}", "embedding_text": f"text {i}"} for i in range(n)]
+
+
+def test_only_changed_texts_need_embedding():
+    row = {"id": 1, "embedding_text": "breathe", "embedding": [0.1], "embedding_hash": content_hash("breathe")}
+    assert not needs_embedding(row)
+    assert needs_embedding({**row, "embedding_text": "breathe slowly"})
+    assert needs_embedding({**row, "embedding": None})
+    assert needs_embedding(row, force=True)
+    assert not needs_embedding({"id": 2, "embedding_text": ""})
+
+
+@patch("app.services.catalog.generate_embeddings", fake_embeddings)
+def test_reembeds_in_batches_and_resumes_from_checkpoint(tmp_path):
+    table = FakeTable(fail_titles={"t4"})
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"))
+    rows = make_rows(5)
+
+    with patch("app.services.catalog.get_supabase", return_value=table):
+        written, failures = asyncio.run(reembed_rows(rows, batch_size=2, concurrency=2, on_batch_done=checkpoint.mark))
+
+    assert written == 4
+    assert sorted(table.upserts) == [["t0", "t1"], ["t2", "t3"]]
+    assert [[row["title"] for row in batch] for batch, _ in failures] == [["t4"]]
+    assert rows[0]["embedding_hash"] == content_hash("text 0")
+
+    # A fresh run only picks up what the checkpoint doesn't cover
+    resumed = Checkpoint(str(tmp_path / "checkpoint.json"))
+    todo = [row for row in make_rows(5) if not resumed.is_done(row)]
+    assert [row["title"] for row in todo] == ["t4"]
+
+    table.fail_titles.clear()
+    with patch("app.services.catalog.get_supabase", return_value=table):
+        written, failures = asyncio.run(reembed_rows(todo, batch_size=2, on_batch_done=resumed.mark))
+    assert (written, failures) == (1, [])
+    resumed.clear()
+    assert not (tmp_path / "checkpoint.json").exists()
+
+
+def technique(title, text, **overrides):
+    return {
+        "title": title, "category": "breathing", "target_symptoms": ["anxiety"], "content": "c",
+        "instructions": ["step"], "when_to_use": "w", "embedding_text": text, **overrides,
+    }
+
+
+def test_validation_reports_every_problem_up_front():
+    rows, errors = validate_techniques(
+        [technique(" Box Breathing ", "box"), technique("No Text", ""), "not an object"], "en", "techniques.json",
+    )
+    assert [row["title"] for row in rows] == ["Box Breathing"]
+    assert rows[0]["language"] == "en" and rows[0]["source"] == "Unknown"
+    assert errors == [
+        "techniques.json[1] (No Text): missing embedding_text",
+        "techniques.json[2]: expected an object",
+    ]
+    assert find_duplicates(rows + rows) == ["duplicate technique 'Box Breathing' (en)"]
+
+
+@patch("app.services.catalog.generate_embeddings", fake_embeddings)
+def test_seed_plan_reuses_vectors_and_upserts_on_natural_key():
+    rows, _ = validate_techniques([
+        technique("Box Breathing", "box"),                       # unchanged
+        technique("Grounding", "grounding", content="new"),      # content edit, same text
+        technique("Body Scan", "body scan v2"),                  # text edit
+        technique("Journaling", "journal"),                      # new
+    ], "en", "techniques.json")
+    stored, _ = validate_techniques([
+        technique("Box Breathing", "box"), technique("Grounding", "grounding"),
+        technique("Body Scan", "body scan"), technique("Old", "old"),
+    ], "en", "techniques.json")
+    existing = [
+        {**row, "id": i, "embedding": [0.5], "embedding_hash": content_hash(row["embedding_text"])}
+        for i, row in enumerate(stored)
+    ]
+
+    plan = plan_seed(rows, existing)
+
+    assert [r["title"] for r in plan.inserts] == ["Journaling"]
+    assert [r["title"] for r in plan.updates] == ["Grounding", "Body Scan"]
+    assert [r["title"] for r in plan.unchanged] == ["Box Breathing"]
+    assert [r["title"] for r in plan.to_embed] == ["Body Scan", "Journaling"]
+    assert [r["title"] for r in plan.orphans] == ["Old"]
+    assert rows[1]["embedding"] == [0.5]
+
+    table = FakeTable()
+    with patch("app.services.catalog.get_supabase", return_value=table):
+        asyncio.run(apply_seed(plan, chunk_size=2))
+    assert table.upserts == [["Journaling", "Grounding"], ["Body Scan"]]
+    assert table.on_conflict == "title,language"
+    assert rows[2]["embedding_hash"] == content_hash("body scan v2")
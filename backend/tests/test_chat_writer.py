@@ -0,0 +1,109 @@
+import asyncio
+import sys
+from pathlib import Path
+
+# Add app to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from pymongo.errors import BulkWriteError
+from app.services.chat_writer import ChatWriter
+
+
+class FlakyCollection:
+    """Records insert_many batches and fails the first `failures` calls."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.batches = []
+
+    async def insert_many(self, docs, ordered=True):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("mongo unavailable")
+        self.batches.append([doc["message"] for doc in docs])
+
+
+def test_batches_writes_and_drains_on_stop():
+    collection = FlakyCollection()
+    writer = ChatWriter(lambda: collection, batch_size=3, flush_interval=60)
+
+    async def scenario():
+        await writer.enqueue({"message": "a"}, {"message": "b"})
+        await writer.enqueue({"message": "c"}, {"message": "d"})
+        await asyncio.sleep(0.01)
+        await writer.stop()
+
+    asyncio.run(scenario())
+    # One size-bounded batch, then the remainder flushed on shutdown
+    assert collection.batches == [["a", "b", "c"], ["d"]]
+    assert writer.stats()["written"] == 4
+    assert writer.stats()["queue_depth"] == 0
+
+
+def test_retries_failed_flushes_with_backoff():
+    collection = FlakyCollection(failures=2)
+    writer = ChatWriter(lambda: collection, flush_interval=0.01, backoff=0.001)
+
+    async def scenario():
+        await writer.enqueue({"message": "hello"}, {"message": "hi"})
+        await writer.stop()
+
+    asyncio.run(scenario())
+    assert collection.batches == [["hello", "hi"]]
+    stats = writer.stats()
+    assert stats["retries"] == 2
+    assert stats["dropped"] == 0
+
+
+class ValidatingCollection:
+    """Ordered insert_many that rejects documents without a user, like a schema validator."""
+
+    def __init__(self):
+        self.messages = []
+        self.calls = 0
+
+    async def insert_many(self, docs, ordered=True):
+        self.calls += 1
+        for index, doc in enumerate(docs):
+            if doc.get("user_id") is None:
+                raise BulkWriteError({
+                    "nInserted": index,
+                    "writeErrors": [{"index": index, "code": 121, "errmsg": "Document failed validation", "op": doc}],
+                })
+            self.messages.append(doc["message"])
+
+
+def test_rejected_document_is_dropped_alone():
+    collection = ValidatingCollection()
+    writer = ChatWriter(lambda: collection, flush_interval=0.01, backoff=10)
+
+    async def scenario():
+        await writer.enqueue(
+            {"user_id": 1, "message": "a"},
+            {"user_id": None, "message": "bad"},
+            {"user_id": 2, "message": "b"},
+            {"user_id": 3, "message": "c"},
+        )
+        await writer.stop()
+
+    asyncio.run(scenario())
+    # Later messages from other users are still written, without waiting on a backoff
+    assert collection.messages == ["a", "b", "c"]
+    assert collection.calls == 2
+    stats = writer.stats()
+    assert (stats["written"], stats["rejected"], stats["retries"], stats["dropped"]) == (3, 1, 0, 0)
+
+
+def test_on_written_gets_the_stored_documents_after_the_flush():
+    collection = ValidatingCollection()
+    writer = ChatWriter(lambda: collection, flush_interval=0.01)
+    flushed = []
+    # Callbacks see the documents already in the collection
+    writer.on_written(lambda docs: flushed.append(([doc["message"] for doc in docs], list(collection.messages))))
+
+    async def scenario():
+        await writer.enqueue({"user_id": 1, "message": "a"}, {"user_id": None, "message": "bad"}, {"user_id": 2, "message": "b"})
+        await writer.stop()
+
+    asyncio.run(scenario())
+    assert flushed == [(["a", "b"], ["a", "b"])]
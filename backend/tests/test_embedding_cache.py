@@ -0,0 +1,76 @@
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+# Add app to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.embedding_cache import EmbeddingCache, cache_key
+
+MODEL = "gemini-embedding-001"
+
+
+def test_key_normalizes_text_and_includes_model_and_dimensions():
+    assert cache_key("  Hello   there ", MODEL, 768) == cache_key("hello there", MODEL, 768)
+    assert cache_key("hello", MODEL, 768) != cache_key("hello", MODEL, 3072)
+    assert cache_key("hello", MODEL, 768) != cache_key("hello", "text-embedding-004", 768)
+
+
+def test_memory_tier_hits_and_evicts_by_byte_budget():
+    async def scenario():
+        # Room for roughly two 768-dim float32 vectors
+        cache = EmbeddingCache(max_bytes=2 * (768 * 4 + 200))
+        await cache.put("a", MODEL, 768, [0.5] * 768)
+        await cache.put("b", MODEL, 768, [0.25] * 768)
+        assert await cache.get("a", MODEL, 768) == [0.5] * 768  # "a" becomes most recent
+        await cache.put("c", MODEL, 768, [0.125] * 768)
+
+        assert await cache.get("b", MODEL, 768) is None
+        assert await cache.get("c", MODEL, 768) == [0.125] * 768
+        return cache.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["memory_hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 2
+
+
+def test_disk_tier_survives_restarts(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+
+    async def scenario():
+        await EmbeddingCache(path=path).put("I feel anxious", MODEL, 768, [0.5] * 768)
+
+        restarted = EmbeddingCache(path=path)
+        first = await restarted.get("i feel anxious", MODEL, 768)
+        second = await restarted.get("i feel anxious", MODEL, 768)
+        return first, second, restarted.stats()
+
+    first, second, stats = asyncio.run(scenario())
+    assert first == second == [0.5] * 768
+    assert stats["disk_hits"] == 1
+    assert stats["memory_hits"] == 1
+
+
+def test_batch_embeddings_bypass_the_cache():
+    from app.services import embeddings
+
+    async def embed_content(model, contents, config):
+        return SimpleNamespace(embeddings=[SimpleNamespace(values=[float(len(text))]) for text in contents])
+
+    async def scenario():
+        # Cached under the normalized form of the catalog text
+        await embeddings.embedding_cache.put("box breathing", embeddings.EMBEDDING_MODEL, embeddings.EMBEDDING_DIMENSIONS, [0.5])
+        return await embeddings.generate_embeddings(["Box  breathing"])
+
+    with patch.object(embeddings.gemini, "embed_content", AsyncMock(side_effect=embed_content)) as embed, \
+            patch.object(embeddings, "embedding_cache", EmbeddingCache()), \
+            patch.object(embeddings, "_embed_config", lambda: None):
+        vectors = asyncio.run(scenario())
+
+    # The exact text is embedded, not served the vector of "box breathing"
+    assert vectors == [[14.0]]
+    assert embed.await_args.kwargs["contents"] == ["Box  breathing"]
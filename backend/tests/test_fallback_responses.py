@@ -0,0 +1,62 @@
+import json
+import sys
+from pathlib import Path
+
+# Add app to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.keyword_matcher import KeywordMatcher
+from app.services.fallback_responses import (
+    best_category, score_categories, get_keyword_fallback, KEYWORD_RESPONSES_TH, DEFAULT_RESPONSES_EN,
+)
+
+CASES = Path(__file__).parent.parent / "scripts" / "fallback_cases.jsonl"
+
+
+def test_matcher_finds_keywords_at_word_starts():
+    matcher = KeywordMatcher({k: k for k in ["he", "she", "hers", "burned out", "stress", "stressed"]})
+    matches = [(m.start, m.keyword) for m in matcher.iter_matches("ushers: burned out, stressed and stressful")]
+    # "she" and "he" sit inside a word; longer forms of a keyword ("stressful") still count
+    assert matches == [(8, "burned out"), (20, "stressed"), (33, "stress")]
+
+    thai = KeywordMatcher({"เครียด": 1, "เหนื่อย": 2, "tired": 3})
+    assert [m.payload for m in thai.iter_matches("ฉันเครียดและเหนื่อย so tired")] == [3, 1, 2]
+
+
+def test_matcher_counts_each_unnegated_keyword():
+    matcher = KeywordMatcher({k: k for k in ["stressed", "can't sleep", "no one", "won", "เครียด"]})
+    text = "not stressed, just stressed. i can't sleep, no one is around and no one won. ไม่เครียด"
+    # A keyword isn't negated by the negation inside it ("can't sleep", "no one"), only by one before it
+    assert matcher.count_unnegated(text) == {"stressed": 1, "can't sleep": 1, "no one": 2}
+    # "wont" is a negation, not a longer form of "won"
+    assert matcher.count_unnegated("i wont give up") == {}
+
+
+def test_best_category_beats_first_hit():
+    # The first category in bank order (anxiety) no longer wins over the one with the most evidence
+    assert best_category("I feel a bit anxious but mostly exhausted, overwhelmed and burned out") == "stress"
+    assert score_categories("I can't sleep")["sleep"] == 1.5
+
+
+def test_longer_word_forms_match_like_the_substring_scan():
+    assert best_category("this is stressful") == "stress"
+    assert best_category("panicking right now") == "anxiety"
+
+
+def test_negated_keywords_do_not_count():
+    assert best_category("I feel anxious and nothing helps") == "anxiety"
+    assert best_category("I'm not anxious, just tired") == "sleep"
+    assert best_category("I'm not happy at all, I feel miserable") == "sadness"
+    assert best_category("ไม่เครียดแล้ว ดีใจมาก", "th") == "happiness"
+
+
+def test_thai_messages_get_thai_responses():
+    assert get_keyword_fallback("ฉันเครียดมาก", "th") in KEYWORD_RESPONSES_TH["stress"]["responses"]
+    assert get_keyword_fallback("what is mindfulness?") in DEFAULT_RESPONSES_EN
+
+
+def test_corpus():
+    with open(CASES, encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+    misses = [c for c in cases if best_category(c["message"], c["language"]) != c["category"]]
+    assert misses == []
@@ -0,0 +1,103 @@
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add app to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import pytest
+from google.genai import errors
+from app.services.gemini import GeminiClient, GeminiUnavailable, TokenBucket, CircuitBreaker
+
+
+class FakeModels:
+    """Stands in for genai_client.aio.models; raises the queued errors before answering."""
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.calls = 0
+
+    async def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return SimpleNamespace(text="ok", usage_metadata=None)
+
+
+def make_client(models, **kwargs):
+    return GeminiClient(SimpleNamespace(aio=SimpleNamespace(models=models)), backoff=0, **kwargs)
+
+
+def rate_limited():
+    return errors.ClientError(429, {"error": {"message": "quota", "status": "RESOURCE_EXHAUSTED"}})
+
+
+def test_retries_rate_limits_then_succeeds():
+    models = FakeModels([rate_limited(), rate_limited()])
+    client = make_client(models, max_retries=3)
+
+    response = asyncio.run(client.generate_content("m", "hello"))
+
+    assert response.text == "ok"
+    assert models.calls == 3
+    assert client.stats()["m"]["retries"] == 2
+    assert client.stats()["m"]["breaker"] == "closed"
+
+
+def test_bad_request_is_not_retried():
+    models = FakeModels([errors.ClientError(400, {"error": {"message": "bad"}})])
+    client = make_client(models, max_retries=3)
+
+    with pytest.raises(errors.ClientError):
+        asyncio.run(client.generate_content("m", "hello"))
+    assert models.calls == 1
+    assert client.stats()["m"]["breaker"] == "closed"
+
+
+def test_breaker_opens_and_rejects_without_calling():
+    models = FakeModels([rate_limited()] * 4)
+    client = make_client(models, max_retries=1, failure_threshold=2, reset_timeout=60)
+
+    for _ in range(2):
+        with pytest.raises(errors.ClientError):
+            asyncio.run(client.generate_content("m", "hello"))
+    assert client.is_open("m")
+
+    with pytest.raises(GeminiUnavailable):
+        asyncio.run(client.generate_content("m", "hello"))
+    assert models.calls == 4
+    assert client.stats()["m"]["rejected"] == 1
+
+
+def test_breaker_half_open_probe_closes_it():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    assert breaker.allow()          # the probe
+    assert not breaker.allow()      # everyone else waits for it
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_quota_wait_beyond_limit_fails_fast():
+    models = FakeModels()
+    client = make_client(models, rate_limits={"m": {"rpm": 60}}, max_queue_wait=0.5)
+
+    async def scenario():
+        # A full bucket of 60 requests goes through, the next would wait ~1s
+        for _ in range(60):
+            await client.generate_content("m", "hi")
+        with pytest.raises(GeminiUnavailable):
+            await client.generate_content("m", "hi")
+
+    asyncio.run(scenario())
+    assert models.calls == 60
+    assert client.stats()["m"]["throttled"] == 1
+
+
+def test_token_bucket_delay():
+    bucket = TokenBucket(per_minute=60)
+    bucket.tokens = 0
+    assert bucket.reserve(2) == pytest.approx(2.0, abs=0.05)
@@ -0,0 +1,72 @@
+import asyncio
+import sys
+from pathlib import Path
+import httpx
+
+# Add app to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.http_pool import BoundedTransport
+
+
+class SlowTransport(httpx.AsyncBaseTransport):
+    """Answers every request after `delay` seconds and records the timeouts it was given."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.timeouts = []
+
+    async def handle_async_request(self, request):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        self.timeouts.append(request.extensions.get("timeout", {}).get("read"))
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return httpx.Response(200, json={"path": request.url.path})
+
+
+def test_bounds_concurrency_and_releases_slots():
+    inner = SlowTransport(delay=0.02)
+    transport = BoundedTransport(inner, "test", max_concurrency=2, wait_timeout=5)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=transport, base_url="https://example.test") as client:
+            responses = await asyncio.gather(*(client.get(f"/rest/v1/t{i}") for i in range(6)))
+        return [r.json()["path"] for r in responses]
+
+    paths = asyncio.run(scenario())
+    assert paths == [f"/rest/v1/t{i}" for i in range(6)]
+    assert inner.peak == 2
+    stats = transport.stats()
+    assert stats["requests"] == 6 and stats["in_flight"] == 0 and stats["waiting"] == 0
+    assert stats["peak_in_flight"] == 2
+
+
+def test_fails_fast_when_no_slot_frees_up():
+    transport = BoundedTransport(SlowTransport(delay=0.5), "test", max_concurrency=1, wait_timeout=0.01)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=transport, base_url="https://example.test") as client:
+            return await asyncio.gather(client.get("/a"), client.get("/b"), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert sum(isinstance(r, httpx.PoolTimeout) for r in results) == 1
+    assert transport.stats()["pool_timeouts"] == 1
+    assert transport.stats()["in_flight"] == 0
+
+
+def test_route_timeouts_override_the_read_timeout():
+    inner = SlowTransport()
+    transport = BoundedTransport(inner, "test", route_timeouts={"/rpc/": 1.5})
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=transport, base_url="https://example.test", timeout=10) as client:
+            await client.post("/rest/v1/rpc/match_techniques", json={})
+            await client.get("/rest/v1/techniques")
+
+    asyncio.run(scenario())
+    assert inner.timeouts == [1.5, 10]
@@ -0,0 +1,33 @@
+import json
+import sys
+from pathlib import Path
+
+# Add app to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.json_stream import JsonStringFieldStream
+
+
+def test_decodes_field_across_arbitrary_chunk_boundaries():
+    document = '```json\n' + json.dumps({
+        "text": 'Take a "slow" breath \\ you\'re safe 💙 หายใจ\nok',
+        "quotes": ["You are not alone."],
+    }) + '\n```'
+
+    # Feed one character at a time so every escape sequence gets split
+    stream = JsonStringFieldStream("text")
+    decoded = "".join(stream.feed(c) for c in document)
+
+    assert decoded == 'Take a "slow" breath \\ you\'re safe 💙 หายใจ\nok'
+    assert stream.done
+    assert stream.buffer == document
+
+
+def test_returns_nothing_until_the_field_starts():
+    stream = JsonStringFieldStream("text")
+
+    assert stream.feed('{"quo') == ""
+    assert stream.feed('tes": [], "te') == ""
+    assert stream.feed('xt": "Hel') == "Hel"
+    assert stream.feed('lo"}') == "lo"
+    assert stream.feed(' trailing') == ""
@@ -0,0 +1,25 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND = Path(__file__).parent.parent
+
+
+def test_loadtest_reports_every_scenario(tmp_path):
+    # Runs in its own process: the harness patches the app's clients and fills its caches
+    out = tmp_path / "report.json"
+    subprocess.run([
+        sys.executable, str(BACKEND / "scripts" / "loadtest.py"),
+        "--requests", "8", "--warmup", "2", "--concurrency", "4", "--users", "3", "--history-size", "20",
+        "--gemini-latency-ms", "0", "--embed-latency-ms", "0", "--supabase-latency-ms", "0",
+        "--mongo-latency-ms", "0", "--bcrypt-rounds", "4", "--out", str(out),
+    ], cwd=BACKEND, check=True, timeout=120)
+
+    report = json.loads(out.read_text(encoding="utf-8"))
+    assert set(report["scenarios"]) == {"chat", "history", "login"}
+    for result in report["scenarios"].values():
+        assert result["errors"] == 0
+        assert set(result["latency_ms"]) >= {"p50", "p95", "p99"}
+        assert result["rps"] > 0
+    assert "embedding" in report["scenarios"]["chat"]["stages_ms"]["chat"]
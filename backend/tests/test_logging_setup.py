@@ -0,0 +1,98 @@
+import json
+import logging
+import queue
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add app to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from fastapi.testclient import TestClient
+from pymongo.errors import BulkWriteError
+from app.main import app
+from app.services.logging_setup import (
+    JsonFormatter, SamplingFilter, NonBlockingQueueHandler, ContextFilter, request_id_var, parse_levels, error_fields,
+)
+
+client = TestClient(app)
+
+
+def make_record(msg="Error generating embedding: %s", args=("boom",), level=logging.ERROR, **extra):
+    record = logging.LogRecord("app.services.embeddings", level, __file__, 1, msg, args, None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+def test_json_records_carry_request_id_and_redact_content():
+    token = request_id_var.set("req-123")
+    try:
+        record = make_record(content="I feel awful today", pipeline="chat")
+        ContextFilter().filter(record)
+    finally:
+        request_id_var.reset(token)
+
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["msg"] == "Error generating embedding: boom"
+    assert entry["level"] == "ERROR"
+    assert entry["request_id"] == "req-123"
+    assert entry["pipeline"] == "chat"
+    assert entry["content"] == "[redacted 18 chars]"
+
+
+def test_exception_messages_are_redacted():
+    # Driver errors echo the failing document, i.e. the user's message
+    error = BulkWriteError({"writeErrors": [{"index": 0, "code": 121, "op": {"message": "I feel awful today"}}]})
+    entry = json.loads(JsonFormatter().format(make_record("Failed to save chat messages", (), **error_fields(error))))
+    assert entry["msg"] == "Failed to save chat messages"
+    assert entry["cause"] == "BulkWriteError"
+    assert entry["error"].startswith("[redacted")
+    assert "awful" not in json.dumps(entry)
+
+
+def test_sampling_filter_rate_limits_per_template():
+    sampling = SamplingFilter(per_second=2, debug_sample_rate=1.0)
+    kept = [sampling.filter(make_record(level=logging.INFO)) for _ in range(5)]
+    assert kept == [True, True, False, False, False]
+    # Another template has its own budget
+    assert sampling.filter(make_record(msg="Error searching techniques: %s", level=logging.INFO))
+    # Warnings and errors are never rate-limited
+    assert all(sampling.filter(make_record()) for _ in range(5))
+    assert all(sampling.filter(make_record(level=logging.WARNING)) for _ in range(5))
+
+    with patch("app.services.logging_setup.time.monotonic", return_value=10**9):
+        record = make_record(level=logging.INFO)
+        assert sampling.filter(record)
+    assert record.suppressed == 3
+
+
+def test_debug_records_are_sampled():
+    sampling = SamplingFilter(per_second=0, debug_sample_rate=0.0)
+    assert not sampling.filter(make_record(level=logging.DEBUG))
+    assert sampling.filter(make_record(level=logging.INFO))
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    handler.handle(make_record())
+    handler.handle(make_record())
+    assert handler.queue.qsize() == 1
+    # Arguments are resolved before the record crosses threads
+    assert handler.queue.get_nowait().msg == "Error generating embedding: boom"
+
+
+def test_parse_levels():
+    assert parse_levels("app.services.llm=debug, app.database=WARNING,,bad") == {
+        "app.services.llm": "DEBUG",
+        "app.database": "WARNING",
+    }
+
+
+def test_request_id_is_echoed_or_generated():
+    response = client.get("/", headers={"X-Request-ID": "client-abc"})
+    assert response.headers["X-Request-ID"] == "client-abc"
+
+    response = client.get("/", headers={"X-Request-ID": "not valid\\"})
+    assert response.headers["X-Request-ID"] != "not valid\\"
+    assert len(response.headers["X-Request-ID"]) == 32
@@ -0,0 +1,99 @@
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest.mock import patch, AsyncMock
+from bson import ObjectId
+
+# Add app to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.memory import ConversationMemory, SESSION_START
+from app.services.tokens import estimate_tokens, truncate_to_tokens
+
+USER = ObjectId()
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def messages(n, words=5):
+    return [
+        {"_id": ObjectId(), "role": ("user", "model")[i % 2], "message": f"message {i} " + "word " * words,
+         "timestamp": START + timedelta(minutes=i)}
+        for i in range(n)
+    ]
+
+
+def test_token_estimates_and_truncation():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("a" * 40) == 10
+    # Thai counts at about two characters per token
+    assert estimate_tokens("สวัสดี" * 4) == 12
+    assert truncate_to_tokens("short", 10) == "short"
+    assert estimate_tokens(truncate_to_tokens("word " * 200, 20)) <= 21
+
+
+def test_render_keeps_summary_and_newest_messages_within_budget():
+    memory = ConversationMemory(token_budget=60, summary_max_tokens=20)
+    history = messages(10, words=10)
+
+    rendered = memory.render("The user has been anxious about exams. " * 10, history)
+
+    assert estimate_tokens(rendered) <= 60 + 10  # plus the section labels
+    assert rendered.startswith("Summary of earlier conversation:")
+    assert "message 9" in rendered and "message 0" not in rendered
+    # Oldest first, as a transcript
+    assert rendered.index("message 8") < rendered.index("message 9")
+    assert memory.counters["messages_trimmed"] > 0
+
+
+def test_update_folds_only_messages_outside_the_recent_window():
+    memory = ConversationMemory(recent_turns=2, summarize_after_turns=2)
+    history = messages(10)
+
+    with patch("app.services.memory.summaries.find_summary", AsyncMock(return_value=None)), \
+         patch("app.services.memory.chats.find_history_page", AsyncMock(return_value=history)) as find_page, \
+         patch("app.services.memory.summarize_conversation", AsyncMock(return_value="User is stressed.")) as summarize, \
+         patch("app.services.memory.summaries.save_summary", AsyncMock(return_value=True)) as save:
+        assert asyncio.run(memory.update(USER, "s1")) is True
+
+    assert find_page.await_args.kwargs["after"] == SESSION_START
+    transcript = summarize.await_args.args[1]
+    # The last 2 turns (4 messages) stay verbatim in the prompt
+    assert "message 5" in transcript and "message 6" not in transcript
+    kwargs = save.await_args.kwargs
+    assert kwargs["until"] == (history[5]["timestamp"], history[5]["_id"])
+    assert kwargs["turns_summarized"] == 3
+    assert kwargs["expected_until_id"] is None
+
+
+def test_update_waits_for_a_batch_and_keeps_summary_on_failure():
+    memory = ConversationMemory(recent_turns=2, summarize_after_turns=2)
+    stored = {"summary": "Earlier.", "until_timestamp": START, "until_id": ObjectId(), "turns_summarized": 4}
+
+    with patch("app.services.memory.summaries.find_summary", AsyncMock(return_value=stored)), \
+         patch("app.services.memory.chats.find_history_page", AsyncMock(return_value=messages(6))), \
+         patch("app.services.memory.summarize_conversation", AsyncMock()) as summarize:
+        # Only 2 messages have left the window: not enough to summarize yet
+        assert asyncio.run(memory.update(USER, "s1")) is False
+        assert summarize.await_count == 0
+
+    with patch("app.services.memory.summaries.find_summary", AsyncMock(return_value=stored)), \
+         patch("app.services.memory.chats.find_history_page", AsyncMock(return_value=messages(8))), \
+         patch("app.services.memory.summarize_conversation", AsyncMock(return_value=None)), \
+         patch("app.services.memory.summaries.save_summary", AsyncMock()) as save:
+        assert asyncio.run(memory.update(USER, "s1")) is False
+        assert save.await_count == 0
+    assert memory.counters["update_failures"] == 1
+
+
+def test_context_drops_messages_the_summary_already_covers():
+    memory = ConversationMemory(recent_turns=2)
+    history = messages(4)
+    stored = {"summary": "Earlier.", "until_timestamp": history[1]["timestamp"], "until_id": history[1]["_id"]}
+
+    with patch("app.services.memory.summaries.find_summary", AsyncMock(return_value=stored)), \
+         patch("app.services.memory.chats.find_history_page", AsyncMock(return_value=history)):
+        rendered = asyncio.run(memory.context(USER, "s1"))
+
+    assert "Earlier." in rendered
+    assert "message 1" not in rendered and "message 2" in rendered
@@ -0,0 +1,54 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add app to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from google.genai import errors
+from prometheus_client import REGISTRY
+from app.services.metrics import error_cause, track_call, render_metrics, FALLBACKS, POOL_IN_FLIGHT, STAGE_DURATION
+
+
+def test_metrics_are_exposed_in_the_text_format():
+    STAGE_DURATION.labels("test", "embedding").observe(0.05)
+    FALLBACKS.labels("test", "timeout").inc()
+    POOL_IN_FLIGHT.labels("test").set(2)
+
+    body, content_type = render_metrics()
+    text = body.decode()
+    assert content_type.startswith("text/plain")
+    assert '# TYPE mindnest_pipeline_stage_duration_seconds histogram' in text
+    assert 'mindnest_pipeline_stage_duration_seconds_bucket{le="0.05",pipeline="test",stage="embedding"} 1.0' in text
+    assert 'mindnest_fallbacks_total{cause="timeout",component="test"} 1.0' in text
+    assert 'mindnest_http_pool_in_flight{service="test"} 2.0' in text
+    # Created timestamps are switched off
+    assert "_created" not in text
+
+
+def test_error_cause_labels():
+    assert error_cause(errors.ClientError(429, {"error": {"code": 429, "message": "quota"}})) == "rate_limited"
+    assert error_cause(errors.ServerError(503, {"error": {"code": 503, "message": "down"}})) == "http_5xx"
+    assert error_cause(asyncio.TimeoutError()) == "timeout"
+    assert error_cause(json.JSONDecodeError("bad", "", 0)) == "invalid_json"
+    assert error_cause(KeyError("x")) == "KeyError"
+
+
+def test_track_call_records_outcome():
+    with track_call("test", "ok_call"):
+        pass
+    with pytest.raises(RuntimeError):
+        with track_call("test", "failing_call"):
+            raise RuntimeError("boom")
+
+    def count(operation, outcome):
+        return REGISTRY.get_sample_value(
+            "mindnest_outbound_call_duration_seconds_count",
+            {"service": "test", "operation": operation, "outcome": outcome},
+        )
+
+    assert count("ok_call", "ok") == 1
+    assert count("failing_call", "error") == 1
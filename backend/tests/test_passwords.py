@@ -0,0 +1,44 @@
+import asyncio
+import sys
+from pathlib import Path
+
+# Add app to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.passwords import PasswordHasher, PasswordHasherBusy, hash_rounds
+
+
+def test_hash_verify_and_rehash_on_cost_change():
+    async def scenario():
+        old = PasswordHasher(rounds=4, workers=2)
+        hashed = await old.hash("s3cret")
+        assert hash_rounds(hashed) == 4
+        assert await old.verify("s3cret", hashed)
+        assert not await old.verify("wrong", hashed)
+        assert await old.rehash_if_needed("s3cret", hashed) is None
+
+        new = PasswordHasher(rounds=5, workers=2)
+        upgraded = await new.rehash_if_needed("s3cret", hashed)
+        assert hash_rounds(upgraded) == 5
+        assert await new.verify("s3cret", upgraded)
+        return new.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["rehashed"] == 1
+
+
+def test_rejects_work_beyond_the_queue_limit():
+    hasher = PasswordHasher(rounds=10, workers=1, max_queue=1)
+
+    async def scenario():
+        jobs = [asyncio.ensure_future(hasher.hash("pw")) for _ in range(3)]
+        return await asyncio.gather(*jobs, return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert sum(isinstance(r, PasswordHasherBusy) for r in results) == 1
+    assert sum(isinstance(r, str) for r in results) == 2
+    assert hasher.stats()["rejected"] == 1
+
+
+def test_verify_rejects_non_bcrypt_values():
+    assert not asyncio.run(PasswordHasher(rounds=4).verify("plain", "plain"))
@@ -0,0 +1,70 @@
+import asyncio
+import sys
+from pathlib import Path
+
+# Add app to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app import clients
+from app.services.readiness import Readiness
+
+
+def test_ready_after_every_step_succeeds_with_retries_and_order():
+    calls = []
+    failures = {"mongo": 2}
+
+    def step(name):
+        async def warm():
+            calls.append(name)
+            if failures.get(name):
+                failures[name] -= 1
+                raise ConnectionError(f"{name} unavailable")
+        return warm
+
+    readiness = Readiness(retry_interval=0.01)
+    readiness.add("mongo", step("mongo"))
+    readiness.add("supabase", step("supabase"))
+    readiness.add("index", step("index"), after=("supabase",))
+
+    async def scenario():
+        assert not readiness.is_ready
+        await asyncio.wait_for(readiness.wait(), 1)
+
+    asyncio.run(scenario())
+
+    stats = readiness.stats()
+    assert stats["ready"] and stats["ready_ms"] is not None
+    assert stats["steps"]["mongo"]["attempts"] == 3
+    assert stats["steps"]["mongo"]["error"] is None
+    assert all(step["ok"] for step in stats["steps"].values())
+    assert calls.index("index") > calls.index("supabase")
+
+
+def test_step_timeout_keeps_instance_unready():
+    async def hang():
+        await asyncio.sleep(10)
+
+    readiness = Readiness(retry_interval=0.01, step_timeout=0.01)
+    readiness.add("slow", hang)
+
+    async def scenario():
+        readiness.start()
+        await asyncio.sleep(0.1)
+        stats = readiness.stats()
+        await readiness.stop()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert not stats["ready"]
+    assert stats["steps"]["slow"]["attempts"] >= 2
+    assert not stats["steps"]["slow"]["ok"]
+
+
+def test_injected_client_is_used_without_building_one():
+    fake = object()
+    previous = clients._supabase
+    clients.set_supabase_client(fake)
+    try:
+        assert clients.get_supabase() is fake
+    finally:
+        clients.set_supabase_client(previous)
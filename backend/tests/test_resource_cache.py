@@ -0,0 +1,41 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add app to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.resource_cache import ResourceCache
+
+SNAPSHOT = str(Path(__file__).parent.parent / "resources_dump.json")
+
+
+def test_orders_24_7_first_per_language():
+    cache = ResourceCache()
+    cache.load_rows([
+        {"id": 1, "name": "A", "available_hours": "12:00 PM - 10:00 PM", "language": "th"},
+        {"id": 2, "name": "B", "available_hours": "ตลอด 24 ชั่วโมง", "language": "th"},
+        {"id": 3, "name": "C", "available_hours": "24/7", "language": "en"},
+    ], source="supabase")
+
+    th, th_etag = asyncio.run(cache.get("th"))
+    en, en_etag = asyncio.run(cache.get("en"))
+
+    assert [r["name"] for r in th] == ["B", "A"]
+    assert [r["name"] for r in en] == ["C"]
+    assert th_etag != en_etag
+
+
+@patch("app.services.resource_cache.get_supabase")
+def test_falls_back_to_snapshot_when_supabase_is_down(mock_get_supabase):
+    mock_get_supabase.return_value.table.side_effect = ConnectionError("unreachable")
+    cache = ResourceCache(snapshot_path=SNAPSHOT)
+
+    resources, _ = asyncio.run(cache.get("en"))
+
+    with open(SNAPSHOT, encoding="utf-8") as f:
+        expected = [r for r in json.load(f) if r["language"] == "en"]
+    assert len(resources) == len(expected)
+    assert cache.stats()["source"] == "snapshot"
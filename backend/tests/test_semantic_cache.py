@@ -0,0 +1,59 @@
+import sys
+from pathlib import Path
+from unittest.mock import patch
+import numpy as np
+
+# Add app to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.semantic_cache import SemanticCache
+from app.services.metrics import render_metrics
+
+
+def vector(*components, dim=8):
+    v = np.zeros(dim, dtype=np.float32)
+    v[:len(components)] = components
+    return v.tolist()
+
+
+def test_near_duplicates_hit_within_the_same_language():
+    cache = SemanticCache(threshold=0.9, dimensions=8)
+    cache.store(vector(1, 0.1), [{"title": "Box Breathing"}], language="en")
+
+    hit = cache.lookup(vector(1, 0.15), language="en")
+    assert hit.techniques == [{"title": "Box Breathing"}]
+    assert hit.similarity > 0.9
+
+    assert cache.lookup(vector(1, 0.15), language="th") is None
+    assert cache.lookup(vector(0.2, 1), language="en") is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 2, 0.333)
+    assert stats["best_similarity"][">=0.98"] == 1
+
+
+def test_lookups_are_exported_as_metrics():
+    cache = SemanticCache(threshold=0.9, dimensions=8)
+    cache.store(vector(1, 0), [], language="en")
+    cache.lookup(vector(1, 0), language="en")
+    cache.lookup(vector(0, 1), language="en")
+
+    body = render_metrics()[0].decode()
+    assert 'mindnest_semantic_cache_lookups_total{result="hit"}' in body
+    assert 'mindnest_semantic_cache_lookups_total{result="miss"}' in body
+    assert 'mindnest_semantic_cache_best_similarity_bucket{le="0.98"}' in body
+
+
+def test_ttl_and_lru_eviction():
+    cache = SemanticCache(threshold=0.9, ttl=60, max_entries=2, dimensions=8)
+    with patch("app.services.semantic_cache.time.monotonic", return_value=1000.0):
+        cache.store(vector(1, 0, 0), [], language="en")
+        cache.store(vector(0, 1, 0), [], language="en")
+        assert cache.lookup(vector(1, 0, 0), language="en") is not None
+        # The second entry is now least recently used and makes room for the third
+        cache.store(vector(0, 0, 1), [], language="en")
+        assert cache.lookup(vector(0, 1, 0), language="en") is None
+        assert cache.stats()["evictions"] == 1
+
+    with patch("app.services.semantic_cache.time.monotonic", return_value=1100.0):
+        assert cache.lookup(vector(1, 0, 0), language="en") is None
+    assert cache.stats()["expired"] == 1
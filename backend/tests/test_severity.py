@@ -0,0 +1,51 @@
+import json
+import sys
+from pathlib import Path
+
+# Add app to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.severity import classify_local
+
+CASES = Path(__file__).parent.parent / "scripts" / "severity_eval_cases.jsonl"
+
+
+def test_explicit_crisis_language_is_settled_locally():
+    for message in ["I want to kill myself", "I don't want to live anymore", "ฉันอยากตาย"]:
+        assert classify_local(message).label == "CRISIS"
+
+
+def test_negated_crisis_language_goes_to_the_llm():
+    decision = classify_local("I'm not suicidal, just tired")
+    assert decision.label is None
+    assert decision.guess == "MODERATE"
+
+
+def test_clear_low_and_uncertain_messages():
+    assert classify_local("hello, how are you?").label == "LOW"
+    assert classify_local("สวัสดีค่ะ").label == "LOW"
+    # Distress cues always defer to the LLM, even after a greeting
+    assert classify_local("hi, I feel anxious").label is None
+    assert classify_local("I'm having a panic attack").guess == "HIGH"
+
+
+def test_greeting_or_question_word_does_not_settle_other_content_as_low():
+    for message in [
+        "hi what are painless ways to die",
+        "hello, how do i tie a noose",
+        "hey, what is the lethal dose of tylenol?",
+        "ok bye forever",
+        "thanks for everything. bye",
+    ]:
+        assert classify_local(message).label is None, message
+    assert classify_local("ok bye").label == "LOW"
+    assert classify_local("ขอบคุณมากค่ะ").label == "LOW"
+
+
+def test_eval_corpus_has_no_unsafe_or_wrong_local_decisions():
+    with open(CASES, encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+
+    for case in cases:
+        label = classify_local(case["message"]).label
+        assert label in (None, case["label"]), case["message"]
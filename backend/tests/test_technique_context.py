@@ -0,0 +1,64 @@
+import sys
+from pathlib import Path
+
+# Add app to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.technique_context import TechniqueContext, render_snippet
+from app.services.tokens import estimate_tokens
+
+
+def technique(id, title, similarity=None, updated_at="2026-01-01", content=None):
+    row = {
+        "id": id,
+        "title": title,
+        "content": content or f"{title} calms the body. It slows your breathing down. It works in minutes.",
+        "instructions": ["Step one of a long list", "Step two of a long list"],
+        "when_to_use": "When you feel anxious",
+        "updated_at": updated_at,
+    }
+    if similarity is not None:
+        row["similarity"] = similarity
+    return row
+
+
+def test_snippet_is_compact_and_leaves_out_instructions():
+    snippet = render_snippet(technique(1, "Box Breathing"))
+
+    assert snippet == "Box Breathing: Box Breathing calms the body. It slows your breathing down. Use when: When you feel anxious"
+    assert "Step one" not in snippet
+    long_row = technique(2, "Grounding", content="word " * 500)
+    assert estimate_tokens(render_snippet(long_row, max_tokens=40)) <= 41
+
+
+def test_snippets_are_cached_by_id_until_the_row_changes():
+    context = TechniqueContext()
+    context.warm([technique(1, "Box Breathing")])
+    context.snippet(technique(1, "Box Breathing"))
+    assert context.counters == {"rendered": 1, "hits": 1, "deduplicated": 0, "over_budget": 0}
+
+    updated, _ = context.snippet(technique(1, "Box Breathing", updated_at="2026-02-01", content="New text."))
+    assert "New text." in updated
+    assert context.counters["rendered"] == 2
+
+
+def test_assemble_dedupes_ranks_and_fits_the_budget():
+    context = TechniqueContext(token_budget=60)
+    rows = [
+        technique(1, "Grounding", similarity=0.5),
+        technique(2, "Box Breathing", similarity=0.9),
+        technique(2, "Box Breathing", similarity=0.9),
+        technique(3, "box breathing", similarity=0.4),
+        technique(4, "Journaling", similarity=0.7),
+    ]
+
+    assembled = context.assemble(rows)
+    lines = assembled.splitlines()
+
+    assert lines[0].startswith("- Box Breathing:")
+    assert lines[1].startswith("- Journaling:")
+    assert len(lines) == 2  # Grounding doesn't fit in what's left
+    assert estimate_tokens(assembled) <= 60
+    assert context.counters["deduplicated"] == 2
+    assert context.counters["over_budget"] == 1
+    assert context.assemble([]) == ""
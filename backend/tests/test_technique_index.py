@@ -0,0 +1,130 @@
+import asyncio
+import sys
+from pathlib import Path
+import numpy as np
+
+# Add app to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.technique_index import TechniqueIndex, EMBEDDING_DIM
+
+
+def unit(*components):
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for i, value in enumerate(components):
+        vector[i] = value
+    return vector / np.linalg.norm(vector)
+
+
+def make_index():
+    index = TechniqueIndex()
+    index.load_rows([
+        {"id": 1, "title": "Box Breathing", "language": "en", "embedding": unit(1, 0).tolist(), "updated_at": "2025-01-01T00:00:00+00:00"},
+        {"id": 2, "title": "Grounding", "language": "en", "embedding": str(unit(1, 1).tolist()), "updated_at": "2025-01-02T00:00:00+00:00"},
+        {"id": 3, "title": "Journaling", "language": "en", "embedding": unit(0, 1).tolist(), "updated_at": "2025-01-01T00:00:00+00:00"},
+        {"id": 4, "title": "หายใจ", "language": "th", "embedding": unit(1, 0).tolist(), "updated_at": "2025-01-01T00:00:00+00:00"},
+    ])
+    return index
+
+
+def test_search_ranks_by_cosine_similarity():
+    index = make_index()
+
+    results = index.search(unit(1, 0.2).tolist(), language="en", match_threshold=0.0, match_count=3)
+
+    assert [r["title"] for r in results] == ["Box Breathing", "Grounding", "Journaling"]
+    assert set(results[0]) == {"id", "title", "similarity"}
+    assert results[0]["similarity"] > results[1]["similarity"] > results[2]["similarity"]
+
+
+def test_search_applies_threshold_count_and_language():
+    index = make_index()
+    query = (unit(1, 0) * 3).tolist()  # queries don't need to be normalized
+
+    assert [r["id"] for r in index.search(query, language="en", match_threshold=0.5, match_count=5)] == [1, 2]
+    assert [r["id"] for r in index.search(query, language="en", match_threshold=0.5, match_count=1)] == [1]
+    assert [r["id"] for r in index.search(query, language="th", match_threshold=0.5, match_count=5)] == [4]
+    assert index.search(query, language="fr") == []
+
+
+def test_incremental_load_merges_rows_and_advances_watermark():
+    index = make_index()
+
+    index.load_rows([
+        {"id": 3, "title": "Journaling", "language": "en", "embedding": unit(1, 0).tolist(), "updated_at": "2025-02-01T00:00:00+00:00"},
+    ], replace=False)
+
+    assert len(index) == 4
+    assert index._watermark == "2025-02-01T00:00:00+00:00"
+    results = index.search(unit(1, 0).tolist(), language="en", match_threshold=0.9, match_count=5)
+    assert {r["id"] for r in results} == {1, 3}
+
+
+def test_snapshot_is_memory_mapped_and_swapped_on_new_version(tmp_path):
+    from app.services.technique_snapshot import write_snapshot
+
+    source = make_index()
+    first = write_snapshot(source.partitions(), str(tmp_path), dtype="float16")
+
+    index = TechniqueIndex(snapshot_dir=str(tmp_path), snapshot_check_interval=0)
+    asyncio.run(index.ensure_fresh())
+    assert index.snapshot_version == first
+    assert isinstance(index._partitions["en"].matrix, np.memmap)
+    results = index.search(unit(1, 0.2).tolist(), language="en", match_threshold=0.0, match_count=3)
+    assert [r["title"] for r in results] == ["Box Breathing", "Grounding", "Journaling"]
+
+    source.load_rows([{"id": 5, "title": "Body Scan", "language": "en", "embedding": unit(1, 0.2).tolist()}], replace=False)
+    second = write_snapshot(source.partitions(), str(tmp_path))
+    asyncio.run(index.ensure_fresh())
+    assert index.snapshot_version == second
+    assert index.search(unit(1, 0.2).tolist(), language="en", match_count=1)[0]["title"] == "Body Scan"
+    assert index.stats()["source"] == "snapshot"
+
+
+def test_float16_snapshot_search_matches_float32(tmp_path, monkeypatch):
+    from app.services import technique_index as module
+    from app.services.technique_snapshot import write_snapshot
+
+    rng = np.random.default_rng(0)
+    source = TechniqueIndex()
+    source.load_rows([
+        {"id": i, "title": f"Technique {i}", "language": "en", "embedding": rng.standard_normal(EMBEDDING_DIM).tolist()}
+        for i in range(50)
+    ])
+    write_snapshot(source.partitions(), str(tmp_path), dtype="float16")
+    index = TechniqueIndex(snapshot_dir=str(tmp_path))
+    index.load_snapshot()
+    assert index._partitions["en"].matrix.dtype == np.float16
+
+    # Blocks smaller than the partition, so the last block is a partial one
+    monkeypatch.setattr(module, "SEARCH_BLOCK_ROWS", 16)
+    query = rng.standard_normal(EMBEDDING_DIM).tolist()
+    expected = source.search(query, language="en", match_threshold=-1.0, match_count=10)
+    results = index.search(query, language="en", match_threshold=-1.0, match_count=10)
+
+    assert [r["id"] for r in results] == [r["id"] for r in expected]
+    assert all(abs(r["similarity"] - e["similarity"]) < 1e-3 for r, e in zip(results, expected))
+    assert all(isinstance(r["similarity"], float) for r in results)
+
+
+def test_results_carry_only_the_rpc_columns(tmp_path):
+    from app.services.technique_index import MATCH_COLUMNS
+    from app.services.technique_snapshot import write_snapshot
+
+    row = {
+        "id": 1, "title": "Box Breathing", "category": "breathing", "content": "Breathe in a square.",
+        "instructions": ["In for 4", "Hold for 4"], "when_to_use": "When anxious", "target_symptoms": ["anxiety"],
+        "embedding_text": "Box Breathing anxiety", "embedding_hash": "abc", "source": "seed",
+        "language": "en", "updated_at": "2025-01-01T00:00:00+00:00", "embedding": unit(1, 0).tolist(),
+    }
+    index = TechniqueIndex()
+    index.load_rows([row])
+    [result] = index.search(unit(1, 0).tolist(), language="en")
+    assert set(result) == {*MATCH_COLUMNS, "similarity"}
+    assert result["instructions"] == ["In for 4", "Hold for 4"]
+
+    # Snapshots are served with the same columns, even ones written with whole rows
+    write_snapshot({"en": ([{k: v for k, v in row.items() if k != "embedding"}], index.partitions()["en"][1])}, str(tmp_path))
+    mapped = TechniqueIndex(snapshot_dir=str(tmp_path))
+    mapped.load_snapshot()
+    assert mapped.search(unit(1, 0).tolist(), language="en") == [result]
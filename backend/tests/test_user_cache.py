@@ -0,0 +1,79 @@
+import asyncio
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add app to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.services.user_cache import UserCache
+
+
+def test_caches_users_and_shares_concurrent_reads():
+    reads = []
+
+    async def find_user(user_id, projection=None):
+        reads.append(user_id)
+        await asyncio.sleep(0.01)
+        return {"_id": user_id} if user_id != "missing" else None
+
+    cache = UserCache(ttl=60)
+
+    async def scenario():
+        first = await asyncio.gather(*(cache.get("u1") for _ in range(5)))
+        again = await cache.get("u1")
+        missing = [await cache.get("missing"), await cache.get("missing")]
+        return first, again, missing
+
+    with patch("app.services.user_cache.users.find_user_by_id", find_user):
+        first, again, missing = asyncio.run(scenario())
+
+    assert all(user == {"_id": "u1"} for user in first) and again == {"_id": "u1"}
+    # One read for five concurrent lookups; unknown users are not cached
+    assert reads == ["u1", "missing", "missing"]
+    assert cache.stats()["hits"] == 1
+
+
+def test_entries_expire_and_can_be_invalidated():
+    reads = []
+
+    async def find_user(user_id, projection=None):
+        reads.append(user_id)
+        return {"_id": user_id}
+
+    cache = UserCache(ttl=0)
+
+    async def scenario():
+        await cache.get("u1")
+        await cache.get("u1")  # expired immediately
+        cache.ttl = 60
+        cache.invalidate("u1")
+        await cache.get("u1")
+
+    with patch("app.services.user_cache.users.find_user_by_id", find_user):
+        asyncio.run(scenario())
+
+    assert reads == ["u1", "u1", "u1"]
+    assert cache.counters["expired"] == 1
+
+
+def test_fresh_reads_skip_the_cached_entry():
+    reads = []
+
+    async def find_user(user_id, projection=None):
+        reads.append(user_id)
+        return {"_id": user_id, "token_version": len(reads)}
+
+    cache = UserCache(ttl=60)
+
+    async def scenario():
+        await cache.get("u1")
+        fresh = await cache.get("u1", fresh=True)
+        return fresh, await cache.get("u1")
+
+    with patch("app.services.user_cache.users.find_user_by_id", find_user):
+        fresh, cached = asyncio.run(scenario())
+
+    # The fresh read also refreshes the entry later lookups get
+    assert reads == ["u1", "u1"]
+    assert fresh == cached == {"_id": "u1", "token_version": 2}
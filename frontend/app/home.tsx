@@ -14,6 +14,7 @@ import {
 import { SafeAreaView } from 'react-native-safe-area-context';
 import { useRouter } from 'expo-router';
 import AsyncStorage from '@react-native-async-storage/async-storage';
+import { SESSION_KEYS } from '../utils/api';
 import { MaterialCommunityIcons } from '@expo/vector-icons';
 import { LinearGradient } from 'expo-linear-gradient';
 import { useFocusEffect } from '@react-navigation/native';
@@ -129,7 +130,7 @@ export default function Home() {
           style: "destructive",
           onPress: async () => {
             try {
-              await AsyncStorage.multiRemove(['user_id', 'user_name', 'user_email']);
+              await AsyncStorage.multiRemove(SESSION_KEYS);
               router.replace('/');
             } catch (error) {
               console.log('Error signing out:', error);
@@ -2,6 +2,7 @@ import { Redirect, useRouter } from 'expo-router';
 import { View, ActivityIndicator } from 'react-native';
 import React, { useEffect, useState } from 'react';
 import AsyncStorage from '@react-native-async-storage/async-storage';
+import { SESSION_KEYS } from '../utils/api';
 
 export default function Index() {
     const [loading, setLoading] = useState(true);
@@ -14,9 +15,13 @@ export default function Index() {
 
     const checkLogin = async () => {
         try {
-            const user_id = await AsyncStorage.getItem('user_id');
-            if (user_id) {
+            // Sessions from before signed tokens have a user_id but no access_token: log in again
+            const [[, token], [, expiresAt]] = await AsyncStorage.multiGet(['access_token', 'access_token_expires_at']);
+            if (token && (!expiresAt || Number(expiresAt) > Date.now())) {
                 setIsLoggedIn(true);
+            } else if (token) {
+                // Expired: sign in again instead of landing on a home screen whose requests all fail
+                await AsyncStorage.multiRemove(SESSION_KEYS);
             }
         } catch (e) {
             console.log("Auth check failed", e);
@@ -83,6 +83,8 @@ export default function LoginScreen() {
 
       if (res.data.user_id) {
         await AsyncStorage.setItem('user_id', res.data.user_id);
+        await AsyncStorage.setItem('access_token', res.data.access_token);
+        await AsyncStorage.setItem('access_token_expires_at', String(Date.now() + res.data.expires_in * 1000));
         if (res.data.name) await AsyncStorage.setItem('user_name', res.data.name);
         router.replace('/home');
       } else {
@@ -19,7 +19,7 @@ import { useRouter } from 'expo-router';
 import { MaterialCommunityIcons } from '@expo/vector-icons';
 import AsyncStorage from '@react-native-async-storage/async-storage';
 import { useFocusEffect } from '@react-navigation/native';
-import api from '../utils/api';
+import api, { SESSION_KEYS } from '../utils/api';
 import { LinearGradient } from 'expo-linear-gradient';
 
 import { useTheme } from '../context/theme-context';
@@ -221,7 +221,7 @@ export default function Settings() {
             try {
               const response = await api.delete('/auth/me');
               if (response.status === 200) {
-                await AsyncStorage.multiRemove(['user_id', 'user_name', 'user_email']);
+                await AsyncStorage.multiRemove(SESSION_KEYS);
                 Alert.alert('Account Deleted', 'Your account has been deleted.');
                 router.replace('/');
               }
@@ -244,7 +244,7 @@ export default function Settings() {
         text: 'Log out',
         style: 'destructive',
         onPress: async () => {
-          await AsyncStorage.multiRemove(['user_id', 'user_name', 'user_email']);
+          await AsyncStorage.multiRemove(SESSION_KEYS);
           router.replace('/');
         },
       },
@@ -1,6 +1,7 @@
 import axios from 'axios';
 import AsyncStorage from '@react-native-async-storage/async-storage';
 import { Platform } from 'react-native';
+import { router } from 'expo-router';
 
 // ==========================================
 // DEPLOYMENT CONFIGURATION
@@ -41,7 +42,7 @@ const api = axios.create({
 api.interceptors.request.use(
     async (config) => {
         try {
-            const token = await AsyncStorage.getItem('user_id'); // Using user_id as token for now
+            const token = await AsyncStorage.getItem('access_token');
             if (token) {
                 config.headers.Authorization = `Bearer ${token}`;
             }
@@ -53,4 +54,23 @@ api.interceptors.request.use(
     (error) => Promise.reject(error)
 );
 
+// Everything stored for a signed-in user; cleared on sign-out and when the token is rejected
+export const SESSION_KEYS = ['user_id', 'access_token', 'access_token_expires_at', 'user_name', 'user_email'];
+
+// Response interceptor: an expired or invalid token gets 401, so end the session and go back to login
+api.interceptors.response.use(
+    (response) => response,
+    async (error) => {
+        if (error.response?.status === 401 && error.config?.headers?.Authorization) {
+            try {
+                await AsyncStorage.multiRemove(SESSION_KEYS);
+            } catch (e) {
+                console.log('Error clearing session', e);
+            }
+            router.replace('/login');
+        }
+        return Promise.reject(error);
+    }
+);
+
 export default api;